@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Alert pipeline benchmark
+
+Run the script's OBS-side hot paths against in-memory stand-ins for OBS and
+Cocorum (see fakes/), over synthetic scene collections and alert backlogs:
+building the scene index, refreshing the alert source lists, setting texts,
+and draining a backlog through the alert scheduler on a simulated clock.
+Reports per call latency and throughput, and any OBS references left held.
+
+Needs neither OBS, Cocorum, nor a network connection.
+S.D.G."""
+
+import argparse
+import contextlib
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+sys.path.insert(0, os.path.join(HERE, "fakes"))
+
+# Keep the seen alerts store and journal away from the real ones
+os.environ["HOME"] = tempfile.mkdtemp(prefix="rla-benchmark-")
+
+import obspython as obs
+import rum_live_alerts
+
+# Alert scene name: the text sources in it, from the script's default settings
+ALERT_SCENES = {
+    getattr(rum_live_alerts.DefaultSettings, f"{name}_alert_scene_source"): [
+        value
+        for key, value in vars(rum_live_alerts.DefaultSettings).items()
+        if key.startswith(f"{name}_alert_") and key.endswith("_source") and not key.endswith("scene_source")
+        ]
+    for name in rum_live_alerts.ALERT_NAMES
+    }
+
+# The script logs a lot, so our results go to where stdout was before we silence it
+REPORT = sys.stdout
+
+alert_ids = itertools.count()
+
+
+class FakeClock():
+    """Stands in for the time module in the script, with a monotonic clock we move by hand"""
+
+    def __init__(self):
+        self.now = time.monotonic()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def __getattr__(self, name: str):
+        return getattr(time, name)
+
+
+def summarize(latencies: list[float]) -> str:
+    """Summarize call latencies as mean, median, 99th percentile, and max, in microseconds"""
+    ordered = sorted(latencies)
+    pick = lambda fraction: ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1e6
+    return (
+        f"mean {sum(ordered) / len(ordered) * 1e6:9.1f}  p50 {pick(0.5):9.1f}  "
+        f"p99 {pick(0.99):9.1f}  max {ordered[-1] * 1e6:9.1f} us"
+        )
+
+
+def time_calls(function: callable, repeat: int) -> list[float]:
+    """Call a function some times, and return how long each call took"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(*args):
+    """Print a result line"""
+    print(*args, file=REPORT, flush=True)
+
+
+def report_leaks():
+    """Say if the script left anything held in OBS"""
+    leaks = {kind: held for kind, held in obs.leaks().items() if held}
+    if leaks:
+        report("  LEAKED:", leaks)
+
+
+def build_collection(num_sources: int) -> list[str]:
+    """Build a synthetic scene collection with the alert scenes nested at the bottom of it"""
+    obs.reset()
+    scene_names = obs.build_collection(num_sources)
+    for alert_scene, text_sources in ALERT_SCENES.items():
+        obs.create_scene(alert_scene)
+        for source_name in text_sources:
+            obs.create_source(source_name)
+            obs.add_scene_item(alert_scene, source_name)
+        obs.add_scene_item(scene_names[-1], alert_scene)
+    return scene_names
+
+
+def make_backlog(size: int) -> list[tuple[str, rum_live_alerts.AlertRecord]]:
+    """Make alertables of every kind, round robin"""
+    backlog = []
+    for i, name in zip(range(size), itertools.cycle(rum_live_alerts.ALERT_NAMES)):
+        backlog.append((name, rum_live_alerts.AlertRecord(
+            f"user{i}",
+            alert_id=f"benchmark{next(alert_ids)}",
+            text=f"Rant number {i}" if name == "rant" else "",
+            amount_cents=500 + i % 1000,
+            count=1 + i % 5,
+            )))
+    return backlog
+
+
+def start_alerts(max_queued: int = 0, coalesce_threshold: int = None) -> rum_live_alerts.OBSRumLiveAlerts:
+    """Load and configure a fresh alerts system like OBS would, without any API URL"""
+    alerts = rum_live_alerts.OBSRumLiveAlerts()
+    settings = obs.make_settings()
+    alerts.script_defaults(settings)
+    for name in rum_live_alerts.ALERT_NAMES:
+        settings.values[f"{name}_alert_max_queued"] = max_queued
+    if coalesce_threshold is not None:
+        settings.values["coalesce_threshold"] = coalesce_threshold
+    alerts.script_load(settings)
+    alerts.script_update(settings)
+    alerts.props = alerts.script_properties()
+    return alerts
+
+
+def bench_collection(num_sources: int, repeat: int):
+    """Time indexing a scene collection, refreshing the source lists, and setting texts"""
+    build_collection(num_sources)
+    alerts = start_alerts()
+    scene_index = alerts.scene_index
+
+    def rebuild():
+        scene_index.dirty = True
+        alerts.get_scenes_and_sources()
+
+    def update_source_lists():
+        for name in rum_live_alerts.ALERT_NAMES:
+            getattr(alerts, f"update_{name}_source_lists")(selected_scene=getattr(alerts, f"{name}_alert_scene_source"))
+
+    texts = [
+        {source_name: f"{source_name} {i}" for source_name in itertools.chain.from_iterable(ALERT_SCENES.values())}
+        for i in range(repeat)
+        ]
+    texts_iter = iter(texts)
+
+    report(f"\n{num_sources} sources in {len(obs.scenes)} scenes:")
+    report(f"  Index build:        {summarize(time_calls(rebuild, repeat))}")
+    report(f"  Source list update: {summarize(time_calls(update_source_lists, repeat))}")
+    report(f"  Set alert texts:    {summarize(time_calls(lambda: alerts.set_texts_by_source_names(next(texts_iter)), repeat))}")
+
+    alerts.script_unload()
+    report_leaks()
+
+
+def bench_backlog(size: int, coalesce_threshold: int):
+    """Time queueing a backlog and draining it through the alert scheduler"""
+    build_collection(100)
+    alerts = start_alerts(coalesce_threshold=coalesce_threshold)
+    backlog = make_backlog(size)
+
+    start = time.perf_counter()
+    for name, alertable in backlog:
+        alerts.queue_alertable(name, alertable)
+    queue_time = time.perf_counter() - start
+
+    # Jump the clock straight to each alert's hide time, there is nothing to do in between
+    clock = rum_live_alerts.time = FakeClock()
+    tick = rum_live_alerts.ALERT_SCHEDULER_TICK / 1000
+    inboxes = [getattr(alerts, f"{name}_inbox") for name in rum_live_alerts.ALERT_NAMES]
+    latencies = []
+    start = time.perf_counter()
+    try:
+        while True:
+            deadline = alerts._OBSRumLiveAlerts__alert_scheduler_deadline
+            if deadline == float("inf") and all(inbox.empty() for inbox in inboxes) and latencies:
+                break
+            clock.now = max(clock.now + tick, deadline if deadline != float("inf") else 0)
+            tick_start = time.perf_counter()
+            alerts.alert_scheduler_tick()
+            latencies.append(time.perf_counter() - tick_start)
+        drain_time = time.perf_counter() - start
+
+        idle = time_calls(alerts.alert_scheduler_tick, 10000)
+    finally:
+        rum_live_alerts.time = time
+
+    report(f"\nBacklog of {size} alerts, coalescing {'at ' + str(coalesce_threshold) if coalesce_threshold else 'off'}:")
+    report(f"  Queueing:   {size / queue_time:12.0f} alerts/sec")
+    report(f"  Draining:   {size / drain_time:12.0f} alerts/sec over {len(latencies)} ticks")
+    report(f"  Busy tick:  {summarize(latencies)}")
+    report(f"  Idle tick:  {summarize(idle)}")
+
+    alerts.script_unload()
+    report_leaks()
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-s", "--sources", type=int, nargs="+", default=[10, 100, 1000, 10000], help="scene collection sizes")
+    parser.add_argument("-a", "--alerts", type=int, nargs="+", default=[1, 100, 10000, 100000], help="alert backlog sizes")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="how many times to time each collection operation")
+    parser.add_argument("-c", "--coalesce", type=int, default=0, help="coalescing threshold for the backlogs, 0 for off")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for num_sources in args.sources:
+            bench_collection(num_sources, args.repeat)
+        for size in args.alerts:
+            bench_backlog(size, args.coalesce)
+
+
+if __name__ == "__main__":
+    main()
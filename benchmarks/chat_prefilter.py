@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Chat pre-filter benchmark
+
+Feed synthetic chat SSE traffic through Cocorum's chat API, once with every
+event parsed and once with ChatAlertReceiver's raw pre-filter in front, and
+compare how many messages per second each can get through.
+
+Needs Cocorum installed, but not OBS or a network connection.
+S.D.G."""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import cocorum.chatapi
+import rum_live_alerts
+
+STREAM_ID = "6abcde"  # Base 36, any will do
+NUM_USERS = 500
+
+
+def make_user(user_id: int) -> dict:
+    """Make the JSON of a chat user"""
+    return {"id": str(user_id), "username": f"user{user_id}", "badges": [], "color": "#ffffff"}
+
+
+def make_message(message_id: int, user_id: int, kind: str = None) -> dict:
+    """Make the JSON of a chat message, optionally an alert of some kind"""
+    message = {
+        "id": str(message_id),
+        "time": "2025-01-01T00:00:00+00:00",
+        "user_id": str(user_id),
+        "text": f"Message number {message_id}, just chatting along with everyone else.",
+        "blocks": [{"type": "text.1", "data": {"text": "..."}}],
+        }
+    if kind == "rant":
+        message["rant"] = {"price_cents": 500, "duration": 120, "expires_on": "2025-01-01T00:02:00+00:00"}
+    elif kind == "raid":
+        message["raid_notification"] = {"start_ts": 0, "target_url": "https://rumble.com/"}
+    elif kind == "gift":
+        message["gift_purchase_notification"] = {"total_gifts": 5, "gift_type": "subs"}
+    return message
+
+
+def make_events(num_messages: int, alert_ratio: float, batch: int, seed: int = 0) -> list[str]:
+    """Make raw SSE event data for a busy chat
+
+    Args:
+        num_messages (int): How many messages in total.
+        alert_ratio (float): The fraction of messages that are alerts.
+        batch (int): How many messages go in each event.
+        seed (int): Random seed, so runs are comparable.
+            Defaults to 0.
+
+    Returns:
+        Events (list[str]): The data of each SSE event, init event first."""
+
+    rng = random.Random(seed)
+    init = {
+        "type": "init",
+        "data": {
+            "messages": [],
+            "users": [],
+            "channels": [],
+            "config": {"rants": {"enable": True}, "message_length_max": 200, "badges": {}},
+            },
+        }
+    events = [json.dumps(init, separators=(",", ":"))]
+
+    for first_id in range(1, num_messages + 1, batch):
+        messages = []
+        users = {}
+        for message_id in range(first_id, min(first_id + batch, num_messages + 1)):
+            user_id = rng.randrange(NUM_USERS)
+            kind = rng.choice(("rant", "raid", "gift")) if rng.random() < alert_ratio else None
+            messages.append(make_message(message_id, user_id, kind))
+            users[user_id] = make_user(user_id)
+        event = {"type": "messages", "data": {"messages": messages, "users": list(users.values()), "channels": []}}
+        events.append(json.dumps(event, separators=(",", ":")))
+
+    return events
+
+
+def connect_offline(events: list[str]) -> cocorum.chatapi.ChatAPI:
+    """Make a Cocorum chat API object that reads the given events instead of Rumble"""
+    client = types.SimpleNamespace(
+        events=lambda: (types.SimpleNamespace(data=data) for data in events),
+        close=lambda: None,
+        )
+
+    # Swap out the network for the duration of the connection
+    real_get, real_sseclient = cocorum.chatapi.requests.get, cocorum.chatapi.sseclient.SSEClient
+    cocorum.chatapi.requests.get = lambda *args, **kwargs: None
+    cocorum.chatapi.sseclient.SSEClient = lambda response: client
+    try:
+        return cocorum.chatapi.ChatAPI(STREAM_ID)
+    finally:
+        cocorum.chatapi.requests.get, cocorum.chatapi.sseclient.SSEClient = real_get, real_sseclient
+
+
+def receive_all(chat: cocorum.chatapi.ChatAPI) -> list[int]:
+    """Get every message out of a chat like ChatAlertReceiver does, and return the IDs of the alerts"""
+    alerts = []
+    while message := chat.get_message():
+        if message.is_rant or message.raid_notification or message.gift_purchase_notification:
+            alerts.append(message.message_id)
+    return alerts
+
+
+def run(events: list[str], prefilter: bool) -> tuple[float, list[int], int]:
+    """Time receiving all the events
+
+    Returns:
+        Elapsed (float): Seconds taken.
+        Alerts (list[int]): The IDs of the alert messages found.
+        Skipped (int): How many events the pre-filter skipped."""
+
+    chat = connect_offline(events)
+    receiver = rum_live_alerts.ChatAlertReceiver(STREAM_ID, None)
+    if prefilter:
+        chat.event_generator = receiver.prefilter_events(chat.event_generator)
+
+    start = time.perf_counter()
+    alerts = receive_all(chat)
+    return time.perf_counter() - start, alerts, receiver.events_skipped
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--messages", type=int, default=2000, help="how many chat messages to send")
+    parser.add_argument("-a", "--alert-ratio", type=float, default=0.01, help="fraction of messages that are alerts")
+    parser.add_argument("-b", "--batch", type=int, default=1, help="messages per SSE event")
+    args = parser.parse_args()
+
+    events = make_events(args.messages, args.alert_ratio, args.batch)
+    print(f"{args.messages} messages in {len(events) - 1} events, {args.alert_ratio:.1%} alerts")
+
+    full_time, full_alerts, _ = run(events, prefilter=False)
+    fast_time, fast_alerts, skipped = run(events, prefilter=True)
+
+    assert fast_alerts == full_alerts, "The pre-filter lost alerts"
+
+    print(f"Full parse: {args.messages / full_time:12.0f} messages/sec")
+    print(f"Pre-filter: {args.messages / fast_time:12.0f} messages/sec ({skipped} events skipped)")
+    print(f"Speedup:    {full_time / fast_time:12.1f}x, {len(fast_alerts)} alerts found by both")
+
+
+if __name__ == "__main__":
+    main()
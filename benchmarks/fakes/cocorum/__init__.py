@@ -0,0 +1,155 @@
+"""In-memory stand-in for the Cocorum Rumble API library
+
+RumbleAPI reads account data from the accounts dictionary instead of Rumble,
+and chatapi.ChatAPI reads from chats that the harness posts messages to, so
+the Rumble Live Alerts script can be driven without a network.
+S.D.G."""
+
+import time
+
+from . import static, utils, requests, chatapi
+
+# API URL: the JSON the Rumble Live Stream API would return for it
+accounts = {}
+
+
+def make_account(username: str = "benchmark") -> dict:
+    """Make the JSON of an account with no followers, subscribers, or livestreams"""
+    return {
+        "now": int(time.time()),
+        "type": "user",
+        "user_id": "1a",
+        "username": username,
+        "followers": {"num_followers": 0, "num_followers_total": 0, "latest_follower": None, "recent_followers": []},
+        "subscribers": {"num_subscribers": 0, "num_subscribers_total": 0, "latest_subscriber": None, "recent_subscribers": []},
+        "livestreams": [],
+        }
+
+
+class Follower():
+    """A follower"""
+
+    def __init__(self, jsondata: dict):
+        self._jsondata = jsondata
+        self.username = jsondata["username"]
+        self.followed_on = utils.parse_timestamp(jsondata["followed_on"])
+
+    def __str__(self):
+        return self.username
+
+
+class Subscriber():
+    """A subscriber"""
+
+    def __init__(self, jsondata: dict):
+        self._jsondata = jsondata
+        self.username = jsondata["username"]
+        self.amount_cents = jsondata["amount_cents"]
+        self.subscribed_on = utils.parse_timestamp(jsondata["subscribed_on"])
+
+    def __str__(self):
+        return self.username
+
+
+class Livestream():
+    """A livestream"""
+
+    def __init__(self, jsondata: dict, api):
+        self._jsondata = jsondata
+        self.api = api
+        self.is_disappeared = False
+
+    @property
+    def stream_id(self) -> str:
+        return self._jsondata["id"]
+
+    @property
+    def title(self) -> str:
+        return self._jsondata["title"]
+
+    @property
+    def created_on(self) -> float:
+        return utils.parse_timestamp(self._jsondata["created_on"])
+
+    @property
+    def is_live(self) -> bool:
+        return self._jsondata["is_live"]
+
+
+class RumbleAPI():
+    """Rumble Live Stream API wrapper, reading from the accounts dictionary"""
+
+    def __init__(self, api_url: str, refresh_rate: int = static.Delays.api_refresh_default):
+        self.refresh_rate = refresh_rate
+        self.last_refresh_time = 0
+        self.last_newfollower_time = time.time()
+        self.last_newsubscriber_time = time.time()
+        self.__livestreams = {}
+        self._jsondata = {}
+        self.api_url = api_url
+
+    @property
+    def api_url(self) -> str:
+        return self.__api_url
+
+    @api_url.setter
+    def api_url(self, url: str):
+        self.__api_url = url
+        self.refresh()
+
+    def __getitem__(self, key: str):
+        self.check_refresh()
+        return self._jsondata[key]
+
+    def check_refresh(self):
+        """Refresh only if we are past the refresh rate"""
+        if time.time() - self.last_refresh_time > self.refresh_rate:
+            self.refresh()
+
+    def refresh(self):
+        """Reload data from the accounts dictionary"""
+        self.last_refresh_time = time.time()
+        if self.api_url not in accounts:
+            raise requests.RequestException(f"No such account: {self.api_url}")
+        self._jsondata = accounts[self.api_url]
+
+        listed_ids = [jsondata["id"] for jsondata in self._jsondata["livestreams"]]
+        for stream_id in tuple(self.__livestreams):
+            if stream_id not in listed_ids:
+                self.__livestreams.pop(stream_id).is_disappeared = True
+        for jsondata in self._jsondata["livestreams"]:
+            if jsondata["id"] in self.__livestreams:
+                self.__livestreams[jsondata["id"]]._jsondata = jsondata
+            else:
+                self.__livestreams[jsondata["id"]] = Livestream(jsondata, self)
+
+    @property
+    def recent_followers(self) -> list[Follower]:
+        return [Follower(jsondata) for jsondata in self["followers"]["recent_followers"]]
+
+    @property
+    def new_followers(self) -> list[Follower]:
+        new = sorted((f for f in self.recent_followers if f.followed_on > self.last_newfollower_time), key=lambda f: f.followed_on)
+        self.last_newfollower_time = time.time()
+        return new
+
+    @property
+    def recent_subscribers(self) -> list[Subscriber]:
+        return [Subscriber(jsondata) for jsondata in self["subscribers"]["recent_subscribers"]]
+
+    @property
+    def new_subscribers(self) -> list[Subscriber]:
+        new = sorted((s for s in self.recent_subscribers if s.subscribed_on > self.last_newsubscriber_time), key=lambda s: s.subscribed_on)
+        self.last_newsubscriber_time = time.time()
+        return new
+
+    @property
+    def livestreams(self) -> dict:
+        self.check_refresh()
+        return self.__livestreams
+
+    @property
+    def latest_livestream(self) -> Livestream:
+        if not self.livestreams:
+            return None
+        return max(self.livestreams.values(), key=lambda livestream: livestream.created_on)
@@ -0,0 +1,189 @@
+"""In-memory stand-in for Cocorum's chat API
+
+The harness opens a chat with open_chat() and posts raw SSE event data to it,
+and ChatAPI reads those events the way the real one reads Rumble's SSE stream.
+Like Rumble, every new connection starts with the recent chat history, which
+ChatAPI puts in its mailbox before it returns.
+
+Its client is built like the real one: sseclient over a requests response over
+a urllib3 response over a socket. Closing the client waits for any read in
+progress to finish, as http.client does, while shutting down the socket ends
+the read straight away.
+S.D.G."""
+
+from collections import deque
+import json
+import queue
+import socket
+import threading
+import time
+import types
+
+from . import utils, requests
+
+# Stream ID in base 36: the queue of raw SSE event data that chat connections read
+chats = {}
+
+# Stream ID in base 36: the recent messages and their users, that a new connection gets first
+histories = {}
+
+# How many recent messages a new connection gets
+HISTORY_LENGTH = 50
+
+# How long opening a chat takes, in seconds, like a slow server with no timeout set
+connect_delay = 0
+
+# How often a blocked read checks if its socket was shut down, in seconds
+READ_POLL_INTERVAL = 0.05
+
+
+def open_chat(stream_id) -> queue.Queue:
+    """Make a chat available to connect to, and return its event queue"""
+    stream_id = utils.ensure_b36(stream_id)
+    histories.setdefault(stream_id, (deque(maxlen=HISTORY_LENGTH), {}))
+    return chats.setdefault(stream_id, queue.Queue())
+
+
+def post_event(stream_id, data: str):
+    """Send raw SSE event data to a chat, and keep its messages in the history"""
+    stream_id = utils.ensure_b36(stream_id)
+    chats[stream_id].put(data)
+    jsondata = json.loads(data) if data else {}
+    if jsondata.get("type") == "messages":
+        messages, users = histories[stream_id]
+        messages.extend(jsondata["data"]["messages"])
+        users.update((user["id"], user) for user in jsondata["data"]["users"])
+
+
+def close_chat(stream_id):
+    """End the chat stream, as Rumble does when a stream ends"""
+    stream_id = utils.ensure_b36(stream_id)
+    histories.pop(stream_id, None)
+    chats.pop(stream_id).put(None)
+
+
+class User():
+    """A chat user"""
+
+    def __init__(self, jsondata: dict):
+        self.username = jsondata["username"]
+
+
+class GiftPurchaseNotification():
+    """A subscription gift under a message"""
+
+    def __init__(self, jsondata: dict):
+        self.total_gifts = jsondata["total_gifts"]
+
+
+class Message():
+    """A chat message"""
+
+    def __init__(self, jsondata: dict, chat):
+        self.message_id = int(jsondata["id"])
+        self.text = jsondata.get("text", "")
+        self.user = chat.users.get(int(jsondata["user_id"]))
+        rant = jsondata.get("rant")
+        self.is_rant = bool(rant)
+        self.rant_price_cents = rant["price_cents"] if rant else 0
+        self.raid_notification = jsondata.get("raid_notification")
+        gift = jsondata.get("gift_purchase_notification")
+        self.gift_purchase_notification = GiftPurchaseNotification(gift) if gift else None
+
+
+class Socket():
+    """The socket under a chat stream"""
+
+    def __init__(self):
+        self.is_shut_down = False
+        self.closed = False
+
+    def shutdown(self, how: int = socket.SHUT_RDWR):
+        """End reads and writes, without waiting for a read in progress"""
+        self.is_shut_down = True
+
+    def close(self):
+        self.is_shut_down = True
+        self.closed = True
+
+
+class Response():
+    """A streaming requests response, with its urllib3 response and connection"""
+
+    def __init__(self, events: queue.Queue):
+        self.events = events
+        self.sock = Socket()
+        self.raw = types.SimpleNamespace(_connection=types.SimpleNamespace(sock=self.sock))
+
+        # Held for every read, like the BufferedReader lock in http.client
+        self.read_lock = threading.Lock()
+
+    def read_event(self) -> str | None:
+        """Block until the next raw SSE event data, or None once the stream ends"""
+        with self.read_lock:
+            while not self.sock.is_shut_down:
+                try:
+                    return self.events.get(timeout=READ_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            return None
+
+    def close(self):
+        """Close the connection, which waits for a read in progress to finish first"""
+        with self.read_lock:
+            self.sock.close()
+
+
+class SSEClient():
+    """sseclient's client, over a streaming response"""
+
+    def __init__(self, event_source: Response):
+        self._event_source = event_source
+
+    def events(self):
+        """Yield events until the stream ends"""
+        while (data := self._event_source.read_event()) is not None:
+            yield types.SimpleNamespace(data=data)
+
+    def close(self):
+        self._event_source.close()
+
+
+class ChatAPI():
+    """The Rumble internal chat API, reading from an open chat's event queue"""
+
+    def __init__(self, stream_id):
+        self.stream_id = utils.ensure_b36(stream_id)
+        time.sleep(connect_delay)
+        if self.stream_id not in chats:
+            raise requests.RequestException(f"No chat for stream {self.stream_id}")
+        self.__mailbox = []
+        self.users = {}
+        self.client = SSEClient(Response(chats[self.stream_id]))
+        self.event_generator = self.client.events()
+
+        # Rumble starts with the recent history, which goes straight in the mailbox
+        messages, users = histories[self.stream_id]
+        self.__receive({"users": list(users.values()), "messages": list(messages)})
+
+    def clear_mailbox(self):
+        """Delete anything in the mailbox"""
+        self.__mailbox.clear()
+
+    def get_message(self) -> Message:
+        """Return the next chat message, or None if the chat closed"""
+        while not self.__mailbox:
+            event = next(self.event_generator, None)
+            if not event:
+                return None
+            jsondata = json.loads(event.data)
+            if jsondata["type"] not in ("init", "messages"):
+                continue
+            self.__receive(jsondata["data"])
+        return self.__mailbox.pop(0)
+
+    def __receive(self, data: dict):
+        """Put the users and messages of an init or messages event in the mailbox"""
+        for user in data["users"]:
+            self.users[int(user["id"])] = User(user)
+        self.__mailbox.extend(Message(message, self) for message in data["messages"])
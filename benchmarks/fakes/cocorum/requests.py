@@ -0,0 +1,11 @@
+"""Stand-in for the requests library, as Cocorum exposes it to the script
+S.D.G."""
+
+import types
+
+
+class RequestException(OSError):
+    """A request could not be made"""
+
+
+exceptions = types.SimpleNamespace(RequestException=RequestException)
@@ -0,0 +1,30 @@
+"""Stand-in for Cocorum's static definitions, with the values the script reads
+S.D.G."""
+
+
+class RequestHeaders:
+    """Headers for various HTTP requests"""
+    user_agent = {"User-Agent": "rum-live-alerts-benchmark"}
+    sse_api = {"Accept": "text/event-stream"}
+
+
+class URI:
+    """URIs of the APIs"""
+
+    class ChatAPI:
+        """URIs of the chat API"""
+        base = "https://web7.rumble.com/chat/api/chat/{stream_id_b10}"
+        sse_stream = base + "/stream"
+
+
+class Delays:
+    """Various times for delays and waits"""
+    request_timeout = 20
+    api_refresh_default = 10
+    api_refresh_minimum = 5
+
+
+class Misc:
+    """No-one knows where to put these"""
+    base36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+    timestamp_format = "%Y-%m-%dT%H:%M:%S"
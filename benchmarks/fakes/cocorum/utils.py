@@ -0,0 +1,46 @@
+"""Stand-in for Cocorum's utilities, with the base conversions the script uses
+S.D.G."""
+
+import calendar
+import time
+
+from . import static
+
+
+def parse_timestamp(timestamp: str) -> float:
+    """Parse a Rumble timestamp into seconds since the Epoch, UTC"""
+    return calendar.timegm(time.strptime(timestamp[:-6], static.Misc.timestamp_format))
+
+
+def form_timestamp(seconds: float, suffix: str = "+00:00") -> str:
+    """Form a Rumble timestamp from seconds since the Epoch, UTC"""
+    return time.strftime(static.Misc.timestamp_format, time.gmtime(seconds)) + suffix
+
+
+def base_10_to_36(b10) -> str:
+    """Convert a base 10 number to base 36"""
+    b10 = int(b10)
+    b36 = ""
+    while b10:
+        b36 = static.Misc.base36[b10 % 36] + b36
+        b10 //= 36
+    return b36
+
+
+def base_36_to_10(b36) -> int:
+    """Convert a base 36 number to base 10"""
+    return int(str(b36), 36)
+
+
+def ensure_b36(num, assume_10: bool = False) -> str:
+    """No matter whether a number is base 36 or 10, return 36"""
+    if isinstance(num, int) or (isinstance(num, str) and num.isnumeric() and assume_10):
+        return base_10_to_36(num)
+    return str(num)
+
+
+def ensure_b10(num, assume_10: bool = False) -> int:
+    """No matter whether a number is base 36 or 10, return 10"""
+    if isinstance(num, int) or (isinstance(num, str) and num.isnumeric() and assume_10):
+        return int(num)
+    return base_36_to_10(num)
@@ -0,0 +1,556 @@
+"""In-memory stand-in for OBS Studio's obspython module
+
+Implements just the parts of the OBS API that the Rumble Live Alerts script
+uses, over a synthetic scene collection, so the script can be driven and
+measured on plain Linux. Handles count the references the script takes and
+releases, and signal, frontend and timer callbacks are tracked, so leaks show
+up in leaks().
+
+Unknown OBS functions raise AttributeError rather than silently doing nothing.
+S.D.G."""
+
+# Property and combo types
+OBS_TEXT_DEFAULT = 0
+OBS_TEXT_PASSWORD = 1
+OBS_TEXT_MULTILINE = 2
+OBS_TEXT_INFO = 3
+OBS_COMBO_TYPE_EDITABLE = 1
+OBS_COMBO_TYPE_LIST = 2
+OBS_COMBO_FORMAT_INT = 1
+OBS_COMBO_FORMAT_FLOAT = 2
+OBS_COMBO_FORMAT_STRING = 3
+
+# Frontend events, the whole enum obs_frontend_event from obs-frontend-api.h, in order
+OBS_FRONTEND_EVENT_STREAMING_STARTING = 0
+OBS_FRONTEND_EVENT_STREAMING_STARTED = 1
+OBS_FRONTEND_EVENT_STREAMING_STOPPING = 2
+OBS_FRONTEND_EVENT_STREAMING_STOPPED = 3
+OBS_FRONTEND_EVENT_RECORDING_STARTING = 4
+OBS_FRONTEND_EVENT_RECORDING_STARTED = 5
+OBS_FRONTEND_EVENT_RECORDING_STOPPING = 6
+OBS_FRONTEND_EVENT_RECORDING_STOPPED = 7
+OBS_FRONTEND_EVENT_SCENE_CHANGED = 8
+OBS_FRONTEND_EVENT_SCENE_LIST_CHANGED = 9
+OBS_FRONTEND_EVENT_TRANSITION_CHANGED = 10
+OBS_FRONTEND_EVENT_TRANSITION_STOPPED = 11
+OBS_FRONTEND_EVENT_TRANSITION_LIST_CHANGED = 12
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED = 13
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_LIST_CHANGED = 14
+OBS_FRONTEND_EVENT_PROFILE_CHANGED = 15
+OBS_FRONTEND_EVENT_PROFILE_LIST_CHANGED = 16
+OBS_FRONTEND_EVENT_EXIT = 17
+OBS_FRONTEND_EVENT_REPLAY_BUFFER_STARTING = 18
+OBS_FRONTEND_EVENT_REPLAY_BUFFER_STARTED = 19
+OBS_FRONTEND_EVENT_REPLAY_BUFFER_STOPPING = 20
+OBS_FRONTEND_EVENT_REPLAY_BUFFER_STOPPED = 21
+OBS_FRONTEND_EVENT_STUDIO_MODE_ENABLED = 22
+OBS_FRONTEND_EVENT_STUDIO_MODE_DISABLED = 23
+OBS_FRONTEND_EVENT_PREVIEW_SCENE_CHANGED = 24
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_CLEANUP = 25
+OBS_FRONTEND_EVENT_FINISHED_LOADING = 26
+OBS_FRONTEND_EVENT_RECORDING_PAUSED = 27
+OBS_FRONTEND_EVENT_RECORDING_UNPAUSED = 28
+OBS_FRONTEND_EVENT_TRANSITION_DURATION_CHANGED = 29
+OBS_FRONTEND_EVENT_REPLAY_BUFFER_SAVED = 30
+OBS_FRONTEND_EVENT_VIRTUALCAM_STARTED = 31
+OBS_FRONTEND_EVENT_VIRTUALCAM_STOPPED = 32
+OBS_FRONTEND_EVENT_TBAR_VALUE_CHANGED = 33
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGING = 34
+OBS_FRONTEND_EVENT_PROFILE_CHANGING = 35
+OBS_FRONTEND_EVENT_SCRIPTING_SHUTDOWN = 36
+OBS_FRONTEND_EVENT_PROFILE_RENAMED = 37
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_RENAMED = 38
+OBS_FRONTEND_EVENT_THEME_CHANGED = 39
+OBS_FRONTEND_EVENT_SCREENSHOT_TAKEN = 40
+OBS_FRONTEND_EVENT_CANVAS_ADDED = 41
+OBS_FRONTEND_EVENT_CANVAS_REMOVED = 42
+
+class SignalHandler():
+    """Signal names and the callbacks connected to them"""
+
+    def __init__(self):
+        self.callbacks = {}  # Signal name: [callback, ...]
+
+    def emit(self, signal: str, calldata: dict):
+        """Call everything connected to a signal"""
+        for callback in tuple(self.callbacks.get(signal, ())):
+            callback(calldata)
+
+    @property
+    def num_connected(self) -> int:
+        """How many callbacks are connected, to anything"""
+        return sum(len(callbacks) for callbacks in self.callbacks.values())
+
+
+class Source():
+    """A source, owned by OBS, that the script can take references to"""
+
+    def __init__(self, name: str, unversioned_id: str):
+        self.name = name
+        self.unversioned_id = unversioned_id
+        self.settings = {}
+        self.updates = 0
+        self.refs = 0  # References held by the script
+        self.signal_handler = SignalHandler()
+
+
+class Scene():
+    """A scene, which is referenced through its source"""
+
+    def __init__(self, source: Source):
+        self.source = source
+        self.items = []
+
+
+class SceneItem():
+    """An item placing a source in a scene"""
+
+    def __init__(self, scene: Scene, source: Source):
+        self.scene = scene
+        self.source = source
+        self.visible = False
+        self.shows = 0  # How many times it was made visible
+        self.refs = 0
+
+
+class Data():
+    """Settings data"""
+
+    def __init__(self, values: dict = None, created_by_script: bool = False):
+        self.values = dict(values or {})
+        self.defaults = {}
+        self.refs = 1 if created_by_script else 0
+
+
+class Property():
+    """A script property"""
+
+    def __init__(self, name: str, description: str, kind: str):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.items = []
+        self.modified_callback = None
+
+
+class Properties():
+    """A set of script properties"""
+
+    def __init__(self):
+        self.props = {}
+
+    def add(self, name: str, description: str, kind: str) -> Property:
+        """Add a property"""
+        self.props[name] = Property(name, description, kind)
+        return self.props[name]
+
+
+# The synthetic OBS state
+sources = {}  # Name: Source, including scenes
+scenes = {}  # Name: Scene
+current_scene = None
+global_signal_handler = SignalHandler()
+frontend_callbacks = []
+timers = []  # (callback, interval in ms)
+created_data = set()  # Data objects the script holds references to, or released too often
+
+
+def reset():
+    """Forget the whole scene collection and every callback"""
+    global current_scene, global_signal_handler
+    sources.clear()
+    scenes.clear()
+    current_scene = None
+    global_signal_handler = SignalHandler()
+    frontend_callbacks.clear()
+    timers.clear()
+    created_data.clear()
+
+
+# Driving the fake OBS
+def create_source(name: str, unversioned_id: str = "text_ft2_source") -> Source:
+    """Create a source, emitting source_create"""
+    sources[name] = Source(name, unversioned_id)
+    global_signal_handler.emit("source_create", {"source": sources[name]})
+    return sources[name]
+
+
+def create_scene(name: str) -> Scene:
+    """Create a scene, emitting source_create"""
+    scenes[name] = Scene(create_source(name, "scene"))
+    return scenes[name]
+
+
+def add_scene_item(scene_name: str, source_name: str) -> SceneItem:
+    """Put a source in a scene, emitting item_add on the scene"""
+    scene = scenes[scene_name]
+    item = SceneItem(scene, sources[source_name])
+    scene.items.append(item)
+    scene.source.signal_handler.emit("item_add", {"scene": scene, "item": item})
+    return item
+
+
+def remove_source(name: str):
+    """Remove a source from every scene and then from OBS, emitting the signals OBS would"""
+    source = sources[name]
+    for scene in scenes.values():
+        for item in tuple(scene.items):
+            if item.source is source:
+                scene.source.signal_handler.emit("item_remove", {"scene": scene, "item": item})
+                scene.items.remove(item)
+    global_signal_handler.emit("source_remove", {"source": source})
+    del sources[name]
+    scenes.pop(name, None)
+
+
+def rename_source(prev_name: str, new_name: str):
+    """Rename a source, emitting source_rename"""
+    source = sources.pop(prev_name)
+    source.name = new_name
+    sources[new_name] = source
+    if prev_name in scenes:
+        scenes[new_name] = scenes.pop(prev_name)
+    global_signal_handler.emit("source_rename", {"source": source, "prev_name": prev_name, "new_name": new_name})
+
+
+def set_current_scene(name: str):
+    """Switch the program scene, emitting the frontend event"""
+    global current_scene
+    current_scene = scenes[name]
+    emit_frontend_event(OBS_FRONTEND_EVENT_SCENE_CHANGED)
+
+
+def emit_frontend_event(event: int):
+    """Call every frontend event callback"""
+    for callback in tuple(frontend_callbacks):
+        callback(event)
+
+
+def make_settings(values: dict = None) -> Data:
+    """Make settings data as OBS would pass to script_update"""
+    return Data(values)
+
+
+def build_collection(num_sources: int, num_scenes: int = None, nest: bool = True) -> list[str]:
+    """Build a synthetic scene collection
+
+    Args:
+        num_sources (int): How many text sources to spread over the scenes.
+        num_scenes (int): How many scenes.
+            Defaults to one per 10 sources.
+        nest (bool): Nest the scenes in a tree under the first one, four to a scene.
+            Defaults to True.
+
+    Returns:
+        Scene names (list[str]): The scenes, the first one being current."""
+
+    num_scenes = num_scenes or max(1, num_sources // 10)
+    scene_names = [f"Scene {i}" for i in range(num_scenes)]
+    for scene_name in scene_names:
+        create_scene(scene_name)
+
+    for i in range(num_sources):
+        source_name = f"Text {i}"
+        create_source(source_name, ("text_ft2_source", "text_gdiplus", "image_source")[i % 3])
+        add_scene_item(scene_names[i % num_scenes], source_name)
+
+    if nest:
+        for i, child in enumerate(scene_names[1:], start=1):
+            add_scene_item(scene_names[(i - 1) // 4], child)
+
+    set_current_scene(scene_names[0])
+    return scene_names
+
+
+def run_timers():
+    """Call every timer callback once, as if its interval had passed"""
+    for callback, _ in tuple(timers):
+        callback()
+
+
+def leaks() -> dict:
+    """Everything the script still holds
+
+    Returns:
+        Leaks (dict): Source and scene item references by name, unreleased
+            data objects, and connected signal, frontend and timer callbacks.
+            Over-released handles show negative counts."""
+
+    source_refs = {name: source.refs for name, source in sources.items() if source.refs}
+    item_refs = {}
+    for scene_name, scene in scenes.items():
+        for item in scene.items:
+            if item.refs:
+                item_refs[f"{scene_name}/{item.source.name}"] = item.refs
+
+    return {
+        "sources": source_refs,
+        "sceneitems": item_refs,
+        "data": sum(1 for data in created_data if data.refs),
+        "signals": global_signal_handler.num_connected + sum(s.signal_handler.num_connected for s in sources.values()),
+        "frontend_callbacks": len(frontend_callbacks),
+        "timers": len(timers),
+        }
+
+
+# Sources
+def obs_get_source_by_name(name: str) -> Source:
+    source = sources.get(name)
+    if source:
+        source.refs += 1
+    return source
+
+
+def obs_source_release(source: Source):
+    if source:
+        source.refs -= 1
+
+
+def obs_source_get_name(source: Source) -> str:
+    return source.name if source else None
+
+
+def obs_source_get_unversioned_id(source: Source) -> str:
+    return source.unversioned_id
+
+
+def obs_source_update(source: Source, data: Data):
+    source.settings.update(data.values)
+    source.updates += 1
+
+
+def obs_source_get_settings(source: Source) -> Data:
+    """The source's own settings, not a copy, with a reference for the script"""
+    data = Data(created_by_script=True)
+    data.values = source.settings
+    created_data.add(data)
+    return data
+
+
+def obs_source_get_signal_handler(source: Source) -> SignalHandler:
+    return source.signal_handler
+
+
+def obs_enum_sources() -> list[Source]:
+    listed = [source for source in sources.values() if source.unversioned_id != "scene"]
+    for source in listed:
+        source.refs += 1
+    return listed
+
+
+def source_list_release(source_list: list[Source]):
+    for source in source_list:
+        source.refs -= 1
+
+
+# Scenes and scene items
+def obs_frontend_get_scenes() -> list[Source]:
+    listed = [scene.source for scene in scenes.values()]
+    for source in listed:
+        source.refs += 1
+    return listed
+
+
+def obs_frontend_get_current_scene() -> Source:
+    if not current_scene:
+        return None
+    current_scene.source.refs += 1
+    return current_scene.source
+
+
+def obs_get_scene_by_name(name: str) -> Scene:
+    scene = scenes.get(name)
+    if scene:
+        scene.source.refs += 1
+    return scene
+
+
+def obs_scene_release(scene: Scene):
+    if scene:
+        scene.source.refs -= 1
+
+
+def obs_scene_from_source(source: Source) -> Scene:
+    return scenes.get(source.name) if source else None
+
+
+def obs_scene_get_source(scene: Scene) -> Source:
+    return scene.source
+
+
+def obs_scene_enum_items(scene: Scene) -> list[SceneItem]:
+    for item in scene.items:
+        item.refs += 1
+    return list(scene.items)
+
+
+def sceneitem_list_release(items: list[SceneItem]):
+    for item in items:
+        item.refs -= 1
+
+
+def obs_scene_find_source(scene: Scene, name: str) -> SceneItem:
+    for item in scene.items:
+        if item.source.name == name:
+            return item
+    return None
+
+
+def obs_sceneitem_addref(item: SceneItem):
+    item.refs += 1
+
+
+def obs_sceneitem_release(item: SceneItem):
+    item.refs -= 1
+
+
+def obs_sceneitem_get_source(item: SceneItem) -> Source:
+    return item.source
+
+
+def obs_sceneitem_get_scene(item: SceneItem) -> Scene:
+    return item.scene
+
+
+def obs_sceneitem_set_visible(item: SceneItem, visible: bool):
+    item.shows += visible and not item.visible
+    item.visible = visible
+
+
+def obs_sceneitem_visible(item: SceneItem) -> bool:
+    return item.visible
+
+
+# Data
+def obs_data_create() -> Data:
+    data = Data(created_by_script=True)
+    created_data.add(data)
+    return data
+
+
+def obs_data_release(data: Data):
+    data.refs -= 1
+    if data.refs:
+        created_data.add(data)
+    else:
+        created_data.discard(data)
+
+
+def obs_data_set_string(data: Data, key: str, value: str):
+    data.values[key] = value
+
+
+def obs_data_get_string(data: Data, key: str) -> str:
+    return data.values.get(key, data.defaults.get(key, ""))
+
+
+def obs_data_get_int(data: Data, key: str) -> int:
+    return data.values.get(key, data.defaults.get(key, 0))
+
+
+def obs_data_get_double(data: Data, key: str) -> float:
+    return data.values.get(key, data.defaults.get(key, 0.0))
+
+
+def obs_data_get_bool(data: Data, key: str) -> bool:
+    return data.values.get(key, data.defaults.get(key, False))
+
+
+def obs_data_set_default_string(data: Data, key: str, value: str):
+    data.defaults[key] = value
+
+
+obs_data_set_default_int = obs_data_set_default_double = obs_data_set_default_bool = obs_data_set_default_string
+
+
+# Signals and callbacks
+def obs_get_signal_handler() -> SignalHandler:
+    return global_signal_handler
+
+
+def signal_handler_connect(handler: SignalHandler, signal: str, callback: callable):
+    handler.callbacks.setdefault(signal, []).append(callback)
+
+
+def signal_handler_disconnect(handler: SignalHandler, signal: str, callback: callable):
+    if callback in handler.callbacks.get(signal, ()):
+        handler.callbacks[signal].remove(callback)
+
+
+def calldata_source(calldata: dict, key: str) -> Source:
+    return calldata.get(key)
+
+
+def calldata_sceneitem(calldata: dict, key: str) -> SceneItem:
+    return calldata.get(key)
+
+
+def calldata_string(calldata: dict, key: str) -> str:
+    return calldata.get(key)
+
+
+def obs_frontend_add_event_callback(callback: callable):
+    frontend_callbacks.append(callback)
+
+
+def obs_frontend_remove_event_callback(callback: callable):
+    if callback in frontend_callbacks:
+        frontend_callbacks.remove(callback)
+
+
+def timer_add(callback: callable, interval_ms: int):
+    timers.append((callback, interval_ms))
+
+
+def timer_remove(callback: callable):
+    for timer in timers:
+        if timer[0] == callback:
+            timers.remove(timer)
+            return
+
+
+# Properties
+def obs_properties_create() -> Properties:
+    return Properties()
+
+
+def obs_properties_add_text(props: Properties, name: str, description: str, text_type: int) -> Property:
+    return props.add(name, description, "text")
+
+
+def obs_properties_add_int(props: Properties, name: str, description: str, minimum: int, maximum: int, step: int) -> Property:
+    return props.add(name, description, "int")
+
+
+def obs_properties_add_float(props: Properties, name: str, description: str, minimum: float, maximum: float, step: float) -> Property:
+    return props.add(name, description, "float")
+
+
+def obs_properties_add_bool(props: Properties, name: str, description: str) -> Property:
+    return props.add(name, description, "bool")
+
+
+def obs_properties_add_list(props: Properties, name: str, description: str, combo_type: int, combo_format: int) -> Property:
+    return props.add(name, description, "list")
+
+
+def obs_properties_add_button(props: Properties, name: str, text: str, callback: callable) -> Property:
+    prop = props.add(name, text, "button")
+    prop.modified_callback = callback
+    return prop
+
+
+def obs_properties_get(props: Properties, name: str) -> Property:
+    return props.props.get(name)
+
+
+def obs_property_list_add_string(prop: Property, name: str, value: str):
+    prop.items.append((name, value))
+
+
+def obs_property_list_clear(prop: Property):
+    prop.items.clear()
+
+
+def obs_property_set_modified_callback(prop: Property, callback: callable):
+    prop.modified_callback = callback
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""HTTP connection pool benchmark
+
+Run HTTPConnectionPool against a local keep-alive HTTP stub server, and check
+that it reuses connections, reconnects when the server closes one while it
+sits idle, fails cleanly on bad URLs, refused connections and timeouts, and
+never leaks a connection on the way. Then compare requests per second with
+and without reusing connections, from one thread and from several.
+
+Needs neither OBS, Cocorum, nor a network connection.
+S.D.G."""
+
+import argparse
+import contextlib
+import http.server
+import os
+import socket
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+sys.path.insert(0, os.path.join(HERE, "fakes"))
+
+with open(os.devnull, "w") as _devnull, contextlib.redirect_stdout(_devnull):
+    import rum_live_alerts
+
+BODY = b'{"followers": {"recent_followers": []}}'
+SLOW_DELAY = 1  # How long the /slow endpoint takes to answer, in seconds
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Answers like the RLS API, keeping connections alive unless told otherwise
+
+    /drop answers as if keeping the connection alive, then closes it, like a
+    server timing out an idle connection. /slow answers after SLOW_DELAY."""
+
+    protocol_version = "HTTP/1.1"
+
+    # Send the body right after the headers, or delayed ACKs make every reused request take 40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests_served += 1
+        if self.path == "/slow":
+            time.sleep(SLOW_DELAY)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+        if self.path == "/drop":
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    """Local HTTP stub server, on a free port, in a daemon thread"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests_served = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True, name="http stub server")
+        self.thread.start()
+
+    def url(self, path: str = "/") -> str:
+        """The URL of a path on this server"""
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def handle_error(self, request, client_address):
+        """Say nothing of clients hanging up early, the timeout check does that on purpose"""
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+def free_port() -> int:
+    """A local port that nothing is listening on, as far as we can tell"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def check_pool(server: StubServer) -> list[str]:
+    """Check how the pool behaves, and return what went wrong"""
+    problems = []
+
+    def expect(condition: bool, problem: str):
+        if not condition:
+            problems.append(problem)
+
+    # Reuse: one connection serves a run of requests
+    pool = rum_live_alerts.HTTPConnectionPool()
+    for _ in range(20):
+        status, body = pool.get(server.url())
+        expect(status == 200 and body == BODY, f"bad response {status} {body!r}")
+    expect(pool.connections_opened == 1, f"opened {pool.connections_opened} connections for 20 sequential requests")
+    expect(pool.requests_reused == 19, f"reused a connection for {pool.requests_reused} of 20 requests")
+    expect(pool.open_connections == 1, f"{pool.open_connections} connections open after sequential requests")
+
+    # Concurrent requests each get a connection, and only max_idle_per_host stay open after
+    threads = [threading.Thread(target=pool.get, args=(server.url("/slow"),)) for _ in range(pool.max_idle_per_host + 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expect(
+        pool.open_connections == pool.max_idle_per_host,
+        f"{pool.open_connections} connections open after concurrent requests, wanted {pool.max_idle_per_host}",
+        )
+    pool.close()
+    expect(pool.open_connections == 0, f"{pool.open_connections} connections open after closing the pool")
+
+    # Reconnect: the server closes a connection the pool thinks it can reuse
+    pool = rum_live_alerts.HTTPConnectionPool()
+    pool.get(server.url("/drop"))
+    time.sleep(0.1)
+    served = server.requests_served
+    try:
+        status, _ = pool.get(server.url())
+        expect(status == 200, f"bad status {status} after the server dropped the connection")
+    except OSError as e:
+        problems.append(f"did not reconnect after the server dropped the connection: {e!r}")
+    expect(server.requests_served == served + 1, "the request after a dropped connection was not served exactly once")
+    expect(pool.connections_opened == 2, f"opened {pool.connections_opened} connections around a dropped one, wanted 2")
+    pool.close()
+
+    # Bad URLs fail before any connection is made
+    pool = rum_live_alerts.HTTPConnectionPool()
+    for url in ("rumble.com/-livestream-api/get-data?key=x", "https://", "ftp://rumble.com/", "not a url", ""):
+        try:
+            pool.get(url)
+            problems.append(f"no error for bad URL {url!r}")
+        except ValueError:
+            pass
+        except Exception as e:
+            problems.append(f"wrong error for bad URL {url!r}: {e!r}")
+    expect(pool.connections_opened == 0, f"opened {pool.connections_opened} connections for bad URLs")
+
+    # Refused connections and timeouts raise OSError and leave nothing open
+    for url, timeout, what in ((f"http://127.0.0.1:{free_port()}/", 5, "a refused connection"), (server.url("/slow"), SLOW_DELAY / 4, "a timeout")):
+        pool = rum_live_alerts.HTTPConnectionPool(timeout=timeout)
+        try:
+            pool.get(url)
+            problems.append(f"no error for {what}")
+        except OSError:
+            pass
+        except Exception as e:
+            problems.append(f"wrong error for {what}: {e!r}")
+        expect(pool.open_connections == 0, f"{pool.open_connections} connections open after {what}")
+        pool.close()
+
+    return problems
+
+
+def bench_throughput(server: StubServer, requests: int, num_threads: int, reuse: bool) -> float:
+    """Time requests to the stub server, and return requests per second"""
+    pool = rum_live_alerts.HTTPConnectionPool(max_idle_per_host=num_threads if reuse else 0)
+    per_thread = requests // num_threads
+
+    def worker():
+        for _ in range(per_thread):
+            pool.get(server.url())
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return per_thread * num_threads / elapsed
+
+
+def main():
+    """Run the checks and the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="requests per throughput run")
+    parser.add_argument("-t", "--threads", type=int, nargs="+", default=[1, 4], help="thread counts for the throughput runs")
+    args = parser.parse_args()
+
+    server = StubServer()
+    try:
+        problems = check_pool(server)
+        for num_threads in args.threads:
+            for reuse in (False, True):
+                rate = bench_throughput(server, args.requests, num_threads, reuse)
+                print(f"{num_threads:2d} threads, {'reusing' if reuse else 'new connection every time':26}: {rate:8.0f} requests/sec")
+    finally:
+        server.close()
+
+    if problems:
+        print("\nProblems:")
+        for problem in problems:
+            print("  " + problem)
+        sys.exit(1)
+    print("\nReuse, reconnects and failures all behaved.")
+
+
+if __name__ == "__main__":
+    main()
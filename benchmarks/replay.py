@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""Traffic replay load test
+
+Feed a recording made with the script's "Record API and chat traffic" setting
+back through the script, against the in-memory OBS and Cocorum stand-ins (see
+fakes/), at its original speed, faster, or as fast as the script can take it.
+RLS API responses go to the script's own pollers, livestream chat events to
+its chat alert receivers, and extra chat events to its chat ingestor over a
+local SSE server, so every alert takes the same path it did live. Reports how
+many alerts were queued, shown, and dropped, and how deep the inboxes got.
+
+With --synthesize, write a made up recording instead: a stream that gets a
+300 person raid and then a gift bomb.
+
+Needs neither OBS, Cocorum, nor a network connection.
+S.D.G."""
+
+import argparse
+import calendar
+import contextlib
+import http.server
+import json
+import math
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+sys.path.insert(0, os.path.join(HERE, "fakes"))
+
+# Keep the seen alerts store and journal away from the real ones
+os.environ["HOME"] = tempfile.mkdtemp(prefix="rla-replay-")
+
+import cocorum
+import cocorum.chatapi
+import obspython as obs
+import rum_live_alerts
+
+# Alert scene name: the text sources in it, from the script's default settings
+ALERT_SCENES = {
+    getattr(rum_live_alerts.DefaultSettings, f"{name}_alert_scene_source"): [
+        value
+        for key, value in vars(rum_live_alerts.DefaultSettings).items()
+        if key.startswith(f"{name}_alert_") and key.endswith("_source") and not key.endswith("scene_source")
+        ]
+    for name in rum_live_alerts.ALERT_NAMES
+    }
+
+# Where the replayed RLS API lives, the account key goes on the end
+REPLAY_API_URL = "https://replay.invalid/"
+
+# Timestamped fields in RLS API responses: (section, list or single entry, timestamp field)
+API_TIMESTAMPS = (
+    ("followers", "recent_followers", "followed_on"),
+    ("followers", "latest_follower", "followed_on"),
+    ("subscribers", "recent_subscribers", "subscribed_on"),
+    ("subscribers", "latest_subscriber", "subscribed_on"),
+    )
+
+# The script logs a lot, so our results go to where stdout was before we silence it
+REPORT = sys.stdout
+
+
+def report(*args):
+    """Print a result line"""
+    print(*args, file=REPORT, flush=True)
+
+
+def load_recording(path: str) -> tuple[float, list]:
+    """Read a recording
+
+    Returns:
+        Start (float): The wall clock time the recording started.
+        Entries (list): [seconds since the start, kind, key, data] lists, in order."""
+
+    start_time = None
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from a crash
+            if entry[1] == "start":
+                start_time = entry[3]
+            else:
+                entries.append(entry)
+
+    assert start_time is not None, "Not a traffic recording"
+    entries.sort(key=lambda entry: entry[0])
+    return start_time, entries
+
+
+class ReplayPool():
+    """Serves recorded RLS API responses the way HTTPConnectionPool serves the live API
+
+    The responses are retimed so that followers and subscribers who were new
+    when recorded are new when served, at any replay speed."""
+
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.current = {}  # Account key: (seconds into the recording, response body)
+        self.served = {}  # Account key: set when its current response has been fetched
+        self.requests_sent = 0
+        self.__retimed = {}  # (account key, field, username, recorded timestamp): replayed timestamp
+        self.__lock = threading.Lock()
+
+    def set_response(self, key: str, offset: float, body: str):
+        """Make a recorded response the one the API gives for an account from now on"""
+        with self.__lock:
+            self.current[key] = (offset, body)
+            self.served.setdefault(key, threading.Event()).clear()
+
+    def get(self, url: str, headers: dict = None) -> tuple[int, bytes]:
+        self.requests_sent += 1
+        key = url.removeprefix(REPLAY_API_URL)
+        with self.__lock:
+            if key not in self.current:
+                return 404, b""
+            offset, body = self.current[key]
+            body = self.__retime(key, offset, json.loads(body))
+            self.served[key].set()
+        return 200, json.dumps(body).encode()
+
+    def __retime(self, key: str, offset: float, jsondata: dict) -> dict:
+        """Move the timestamps in a response to replay time (must hold the lock)"""
+        now = time.time()
+        first_response = not any(retimed_key[0] == key for retimed_key in self.__retimed)
+        recorded_now = self.start_time + offset
+
+        def retime(field: str, entry: dict):
+            retimed_key = (key, field, entry.get("username"), entry[field])
+            if retimed_key not in self.__retimed:
+                # Already there when we first looked, so keep it as old as it was
+                if first_response:
+                    seconds = now - (recorded_now - cocorum.utils.parse_timestamp(entry[field]))
+
+                # New since the last response, so new now
+                else:
+                    seconds = math.ceil(now)
+                self.__retimed[retimed_key] = cocorum.utils.form_timestamp(seconds)
+            entry[field] = self.__retimed[retimed_key]
+
+        for section, listing, field in API_TIMESTAMPS:
+            entries = jsondata.get(section, {}).get(listing)
+            for entry in entries if isinstance(entries, list) else [entries] if entries else []:
+                retime(field, entry)
+        for livestream in jsondata.get("livestreams", []):
+            retime("created_on", livestream)
+        jsondata["now"] = int(now)
+        return jsondata
+
+    def get_stats(self) -> dict:
+        return {"requests_sent": self.requests_sent}
+
+    def close(self):
+        pass
+
+
+class ReplaySSEHandler(http.server.BaseHTTPRequestHandler):
+    """Streams the replayed events of an extra chat as they come"""
+
+    def do_GET(self):
+        try:
+            events = self.server.streams[int(self.path.split("/")[2])]
+        except (IndexError, ValueError, KeyError):
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while not self.server.stopping.is_set():
+                try:
+                    data = events.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self.wfile.write(f"data: {data}\n\n".encode())
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class Replay():
+    """Feeds a recording through the script, and keeps count"""
+
+    def __init__(self, start_time: float, entries: list, speed: float, alert_time: int):
+        """
+        Feeds a recording through the script
+
+        Args:
+            start_time (float): The wall clock time the recording started.
+            entries (list): The recorded traffic.
+            speed (float): How many times faster than recorded to replay, 0 for as fast as possible.
+            alert_time (int): How long to show each alert, in seconds."""
+
+        self.entries = entries
+        self.speed = speed
+        self.pool = ReplayPool(start_time)
+        self.offered = dict.fromkeys(rum_live_alerts.ALERT_NAMES, 0)
+        self.queued = dict.fromkeys(rum_live_alerts.ALERT_NAMES, 0)
+        self.peak_depth = dict.fromkeys(rum_live_alerts.ALERT_NAMES, 0)
+        self.tick = rum_live_alerts.ALERT_SCHEDULER_TICK / 1000
+        self.last_tick = 0
+
+        api_keys = list(dict.fromkeys(key for _, kind, key, _ in entries if kind == "api"))
+        sse_keys = list(dict.fromkeys(key for _, kind, key, _ in entries if kind == "sse"))
+
+        # Livestream chats are there to connect to from the start, so reconnect backoff does not hold them up
+        for key in {key for _, kind, key, _ in entries if kind == "chat"}:
+            cocorum.chatapi.open_chat(key)
+
+        # Extra chats come over a local server
+        self.sse_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ReplaySSEHandler)
+        self.sse_server.daemon_threads = True
+        self.sse_server.streams = {cocorum.utils.base_36_to_10(key): queue.Queue() for key in sse_keys}
+        self.sse_server.stopping = threading.Event()
+        threading.Thread(target=self.sse_server.serve_forever, daemon=True).start()
+        cocorum.static.URI.ChatAPI.sse_stream = f"http://127.0.0.1:{self.sse_server.server_port}/chat/{{stream_id_b10}}/stream"
+
+        # The scene collection, with the alert scenes in the current scene
+        obs.reset()
+        scene_names = obs.build_collection(20)
+        for alert_scene, text_sources in ALERT_SCENES.items():
+            obs.create_scene(alert_scene)
+            for source_name in text_sources:
+                obs.create_source(source_name)
+                obs.add_scene_item(alert_scene, source_name)
+            obs.add_scene_item(scene_names[0], alert_scene)
+
+        # The script, polling the replayed accounts often enough to see every recorded response
+        self.alerts = rum_live_alerts.OBSRumLiveAlerts()
+        self.alerts.http_pool.close()
+        self.alerts.http_pool = self.pool
+        self.alerts.queue_alertable = self.count_calls(self.alerts.queue_alertable, self.offered, lambda name, _: name)
+        for name in rum_live_alerts.ALERT_NAMES:
+            inbox = getattr(self.alerts, f"{name}_inbox")
+            inbox.put = self.count_calls(inbox.put, self.queued, lambda _, name=name: name)
+
+        self.settings = obs.make_settings()
+        self.alerts.script_defaults(self.settings)
+        self.settings.values.update({
+            "api_url": REPLAY_API_URL + api_keys[0] if api_keys else "",
+            "extra_api_urls": " ".join(REPLAY_API_URL + key for key in api_keys[1:]),
+            "extra_chat_streams": ",".join(sse_keys),
+            "refresh_rate": 0.01 if not speed else min(1, 1 / speed),
+            "refresh_rate_idle": 0.01 if not speed else min(1, 1 / speed),
+            **{f"{name}_alert_time": alert_time for name in rum_live_alerts.ALERT_NAMES},
+            })
+        self.alerts.script_load(self.settings)
+        self.alerts.script_update(self.settings)
+
+    @staticmethod
+    def count_calls(function: callable, counts: dict, get_name: callable) -> callable:
+        """Wrap a function to count its calls by alert name"""
+        def counted(*args):
+            counts[get_name(*args)] += 1
+            return function(*args)
+        return counted
+
+    def run_ticks(self, until: float = 0):
+        """Run the OBS timers every scheduler tick until a time, or just once if one is due"""
+        while True:
+            now = time.monotonic()
+            if now - self.last_tick >= self.tick:
+                self.last_tick = now
+                for name in rum_live_alerts.ALERT_NAMES:
+                    self.peak_depth[name] = max(self.peak_depth[name], getattr(self.alerts, f"{name}_inbox").qsize())
+                obs.run_timers()
+            if now >= until:
+                return
+            time.sleep(min(self.tick, until - now))
+
+    def feed(self, kind: str, key: str, data: str):
+        """Hand one recorded entry to the script, the way it arrived live"""
+        if kind == "api":
+            self.pool.set_response(key, *data)
+
+            # As fast as possible, but do not skip any responses
+            if not self.speed:
+                deadline = time.monotonic() + 2
+                while not self.pool.served[key].wait(self.tick) and time.monotonic() < deadline:
+                    self.run_ticks()
+
+        elif kind == "chat":
+            cocorum.chatapi.post_event(key, data)
+
+        elif kind == "sse":
+            self.sse_server.streams[cocorum.utils.base_36_to_10(key)].put(data)
+
+    def run(self, settle: float) -> float:
+        """Replay everything, then let the alerts drain for a while
+
+        Returns:
+            Elapsed (float): How long the replay itself took, in seconds."""
+
+        start = time.monotonic()
+        for offset, kind, key, data in self.entries:
+            if self.speed:
+                self.run_ticks(start + offset / self.speed)
+            else:
+                self.run_ticks()
+            self.feed(kind, key, (offset, data) if kind == "api" else data)
+        elapsed = time.monotonic() - start
+
+        # Let whatever is still queued get shown
+        deadline = time.monotonic() + settle
+        inboxes = [getattr(self.alerts, f"{name}_inbox") for name in rum_live_alerts.ALERT_NAMES]
+        while time.monotonic() < deadline and not all(inbox.empty() for inbox in inboxes):
+            self.run_ticks(time.monotonic() + self.tick)
+        return elapsed
+
+    def close(self) -> dict:
+        """Unload the script and stop serving, and return how it went"""
+        chat_stats = self.alerts.get_chat_stats()
+        inbox_stats = self.alerts.get_inbox_stats()
+        shown = {
+            name: sum(item.shows for scene in obs.scenes.values() for item in scene.items if item.source.name == alert_scene)
+            for name, alert_scene in zip(rum_live_alerts.ALERT_NAMES, ALERT_SCENES)
+            }
+        self.alerts.script_unload()
+        self.sse_server.stopping.set()
+        self.sse_server.shutdown()
+        self.sse_server.server_close()
+        leaks = {kind: held for kind, held in obs.leaks().items() if held}
+        return {"chats": chat_stats, "inboxes": inbox_stats, "shown": shown, "leaks": leaks}
+
+
+def synthesize(path: str, duration: float = 120, seed: int = 0):
+    """Write a made up recording of a stream with a 300 person raid and then a gift bomb"""
+    rng = random.Random(seed)
+    start_time = time.time() - duration
+    stream_id = "6abcde"
+    stamp = lambda offset: cocorum.utils.form_timestamp(start_time + offset)
+    key = rum_live_alerts.account_key("https://rumble.com/-livestream-api/get-data?key=synthetic")
+
+    entries = []
+    followers = []
+    subscribers = []
+    message_ids = iter(range(1, 10 ** 9))
+
+    def chat(offset: float, users: list[int], kind: str = None):
+        messages = []
+        for user_id in users:
+            message = {"id": str(next(message_ids)), "user_id": str(user_id), "text": "Hello!", "time": stamp(offset)}
+            if kind == "rant":
+                message["rant"] = {"price_cents": 100 * rng.randint(1, 100), "duration": 120, "expires_on": stamp(offset + 120)}
+            elif kind == "gift_purchase_notification":
+                message[kind] = {"total_gifts": rng.randint(1, 50), "gift_type": "subs"}
+            elif kind == "raid_notification":
+                message[kind] = {"from_user": {"id": str(user_id), "username": f"viewer{user_id}"}, "viewers": 300}
+            messages.append(message)
+        users_json = [{"id": str(user_id), "username": f"viewer{user_id}"} for user_id in set(users)]
+        data = {"type": "messages", "data": {"messages": messages, "users": users_json, "channels": []}}
+        entries.append([round(offset, 3), "chat", stream_id, json.dumps(data, separators=(",", ":"))])
+
+    # Ordinary chatter the whole time, busier during the raid
+    offset = 5.0
+    while offset < duration:
+        raiding = 30 <= offset < 60
+        chat(offset, [rng.randrange(1000, 1300 if raiding else 1050) for _ in range(rng.randint(1, 5 if raiding else 2))])
+        if rng.random() < 0.01:
+            chat(offset, [rng.randrange(1000, 1050)], "rant")
+        offset += rng.expovariate(20 if raiding else 2)
+
+    # The raid lands, and many of the raiders follow
+    chat(30, [999], "raid_notification")
+    for i in range(300):
+        if rng.random() < 0.5:
+            followers.insert(0, (30 + rng.uniform(0, 20), f"raider{i}"))
+
+    # Then the gift bomb, with some rants on top
+    for i in range(50):
+        chat(70 + i * 0.05, [rng.randrange(1000, 1300)], "gift_purchase_notification")
+    for i in range(20):
+        chat(72 + i * 0.2, [rng.randrange(1000, 1300)], "rant")
+    for i in range(10):
+        subscribers.insert(0, (75 + i, f"subscriber{i}"))
+
+    # The RLS API polled every 10 seconds, live from 5 seconds in
+    for offset in range(0, int(duration), 10):
+        recent_followers = sorted((f for f in followers if f[0] <= offset), reverse=True)[:20]
+        recent_subscribers = sorted((s for s in subscribers if s[0] <= offset), reverse=True)[:20]
+        body = {
+            "now": int(start_time + offset),
+            "type": "user",
+            "user_id": "1a",
+            "username": "synthetic",
+            "followers": {
+                "num_followers": len(recent_followers),
+                "num_followers_total": len(recent_followers),
+                "latest_follower": {"username": recent_followers[0][1], "followed_on": stamp(recent_followers[0][0])} if recent_followers else None,
+                "recent_followers": [{"username": name, "followed_on": stamp(when)} for when, name in recent_followers],
+                },
+            "subscribers": {
+                "num_subscribers": len(recent_subscribers),
+                "num_subscribers_total": len(recent_subscribers),
+                "latest_subscriber": None,
+                "recent_subscribers": [
+                    {"username": name, "user": name, "amount_cents": 500, "amount_dollars": 5, "subscribed_on": stamp(when)}
+                    for when, name in recent_subscribers
+                    ],
+                },
+            "livestreams": [
+                {"id": stream_id, "title": "Synthetic stream", "created_on": stamp(0), "is_live": True},
+                ] if offset >= 5 else [],
+            }
+        entries.append([offset, "api", key, json.dumps(body, separators=(",", ":"))])
+
+    entries.sort(key=lambda entry: entry[0])
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps([0, "start", "", start_time]) + "\n")
+        for entry in entries:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    print(f"Wrote {len(entries)} entries covering {duration:.0f} seconds to {path}")
+
+
+def main():
+    """Run the replay"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("recording", help="the traffic recording file")
+    parser.add_argument("-x", "--speed", type=float, default=1, help="how many times faster than recorded to replay, 0 for as fast as possible")
+    parser.add_argument("-t", "--alert-time", type=int, default=0, help="how long to show each alert, in seconds")
+    parser.add_argument("-w", "--settle", type=float, default=5, help="how long to let alerts drain after the replay, in seconds")
+    parser.add_argument("--synthesize", action="store_true", help="write a made up recording to the file instead of replaying one")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        synthesize(args.recording)
+        return
+
+    start_time, entries = load_recording(args.recording)
+    span = entries[-1][0] if entries else 0
+    kinds = {kind: sum(1 for entry in entries if entry[1] == kind) for kind in ("api", "chat", "sse")}
+    report(f"{len(entries)} entries over {span:.1f} seconds: " + ", ".join(f"{count} {kind}" for kind, count in kinds.items()))
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        replay = Replay(start_time, entries, args.speed, args.alert_time)
+        elapsed = replay.run(args.settle)
+        results = replay.close()
+
+    report(f"Replayed in {elapsed:.2f} seconds ({span / elapsed if elapsed else 0:.1f}x), {replay.pool.requests_sent} API requests")
+    report(f"{'':12}{'offered':>8}{'queued':>8}{'shown':>8}{'dropped':>8}{'left':>8}{'peak':>8}")
+    for name in rum_live_alerts.ALERT_NAMES:
+        inbox = results["inboxes"][name]
+        report(
+            f"{name:12}{replay.offered[name]:8d}{replay.queued[name]:8d}{results['shown'][name]:8d}"
+            f"{inbox['dropped']:8d}{inbox['queued']:8d}{replay.peak_depth[name]:8d}"
+            )
+    for chat in results["chats"]:
+        report(f"Chat {chat['stream_id']}: {chat['events_received']} events, {chat['events_skipped']} skipped unparsed")
+    if results["leaks"]:
+        report("LEAKED:", results["leaks"])
+
+
+if __name__ == "__main__":
+    main()
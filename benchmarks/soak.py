@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""Soak test for leaks
+
+Load the script into the in-memory OBS and Cocorum stand-ins (see fakes/) and
+keep it busy for a long time: thousands of settings updates, scene switches
+and edits, scene collection changes, streams going live and ending with chats
+full of rants, raids and gifts (and one account's chats that stay silent), and
+now and then a full script reload. Every so often, report the OBS references
+the script holds, live threads, open file descriptors, and resident memory, so
+slow growth stands out. At the end, unload the script and check that it let go
+of everything, and that no call from OBS kept the OBS thread waiting.
+
+If a step hangs, dump every thread's stack and exit.
+
+Needs neither OBS, Cocorum, nor a network connection.
+S.D.G."""
+
+import argparse
+import contextlib
+import faulthandler
+import gc
+import http.server
+import importlib
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+sys.path.insert(0, os.path.join(HERE, "fakes"))
+
+# Keep the seen alerts store and journal away from the real ones
+os.environ["HOME"] = tempfile.mkdtemp(prefix="rla-soak-")
+
+import cocorum
+import cocorum.chatapi
+import obspython as obs
+import rum_live_alerts
+
+NUM_ACCOUNTS = 3
+NUM_EXTRA_CHATS = 3
+NUM_SOURCES = 200
+RECENT_LENGTH = 10  # How many recent followers and subscribers the RLS API lists
+STEP_TIMEOUT = 30  # A step taking this long (seconds) is a hang, not slowness
+
+# Alert scene name: the text sources in it, from the script's default settings
+ALERT_SCENES = {
+    getattr(rum_live_alerts.DefaultSettings, f"{name}_alert_scene_source"): [
+        value
+        for key, value in vars(rum_live_alerts.DefaultSettings).items()
+        if key.startswith(f"{name}_alert_") and key.endswith("_source") and not key.endswith("scene_source")
+        ]
+    for name in rum_live_alerts.ALERT_NAMES
+    }
+
+# The script logs a lot, so our results go to where stdout was before we silence it
+REPORT = sys.stdout
+
+
+def report(*args):
+    """Print a result line"""
+    print(*args, file=REPORT, flush=True)
+
+
+def make_chat_event(message_ids: itertools.count, rng: random.Random, alert_ratio: float = 0.05) -> str:
+    """Make the raw SSE data of a chat messages event, with an alert now and then"""
+    messages = []
+    users = {}
+    for _ in range(rng.randint(1, 5)):
+        user_id = rng.randrange(1000)
+        message = {"id": str(next(message_ids)), "user_id": str(user_id), "text": "Hello there, chat!"}
+        if rng.random() < alert_ratio:
+            kind = rng.choice(("rant", "raid_notification", "gift_purchase_notification"))
+            message[kind] = {"price_cents": 100 * rng.randint(1, 50), "total_gifts": rng.randint(1, 20)}
+        messages.append(message)
+        users[user_id] = {"id": str(user_id), "username": f"chatter{user_id}"}
+    return json.dumps(
+        {"type": "messages", "data": {"messages": messages, "users": list(users.values()), "channels": []}},
+        separators=(",", ":"),
+        )
+
+
+class AccountPool():
+    """Serves the fake Cocorum accounts the way HTTPConnectionPool serves the RLS API"""
+
+    def __init__(self, world):
+        self.world = world
+        self.requests_sent = 0
+
+    def get(self, url: str, headers: dict = None) -> tuple[int, bytes]:
+        self.requests_sent += 1
+        with self.world.lock:
+            if url not in cocorum.accounts:
+                return 404, b""
+            return 200, json.dumps(cocorum.accounts[url]).encode()
+
+    def get_stats(self) -> dict:
+        return {"requests_sent": self.requests_sent}
+
+    def close(self):
+        pass
+
+
+class ChatSSEHandler(http.server.BaseHTTPRequestHandler):
+    """Streams a burst of chat events for any stream, then hangs up so the reader has to reconnect"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        rng = random.Random()
+        try:
+            for _ in range(rng.randint(20, 200)):
+                data = make_chat_event(self.server.message_ids, rng)
+                self.wfile.write(f"data: {data}\n\n".encode())
+                self.wfile.flush()
+                if self.server.stopping.wait(0.01):
+                    break
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class World():
+    """The Rumble side: accounts with followers, subscribers, livestreams and their chats"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.api_urls = [f"https://rumble.com/-livestream-api/get-data?key=soak{i}" for i in range(NUM_ACCOUNTS)]
+        self.live = {}  # API URL: stream ID in base 36
+        self.stream_ids = itertools.count(10 ** 9)
+        self.message_ids = itertools.count(1)
+        self.user_ids = itertools.count(1)
+        for api_url in self.api_urls:
+            cocorum.accounts[api_url] = cocorum.make_account()
+
+        # Nobody ever chats on this account's streams, so chat receivers sit in a blocked read on them
+        self.quiet_api_url = self.api_urls[0]
+
+        # The chat ingestor reads extra chats from a local server instead of Rumble
+        self.sse_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ChatSSEHandler)
+        self.sse_server.daemon_threads = True
+        self.sse_server.message_ids = self.message_ids
+        self.sse_server.stopping = threading.Event()
+        threading.Thread(target=self.sse_server.serve_forever, daemon=True, name="soak-sse-server").start()
+        cocorum.static.URI.ChatAPI.sse_stream = f"http://127.0.0.1:{self.sse_server.server_port}/chat/{{stream_id_b10}}/stream"
+        self.extra_chats = [cocorum.utils.base_10_to_36(next(self.stream_ids)) for _ in range(NUM_EXTRA_CHATS)]
+
+    def close(self):
+        """Stop the chat server and end all streams"""
+        self.sse_server.stopping.set()
+        self.sse_server.shutdown()
+        self.sse_server.server_close()
+        for api_url in tuple(self.live):
+            self.end_stream(api_url)
+
+    def new_follower(self, api_url: str):
+        """Someone follows an account"""
+        with self.lock:
+            followers = cocorum.accounts[api_url]["followers"]
+            followers["recent_followers"] = [
+                {"username": f"follower{next(self.user_ids)}", "followed_on": cocorum.utils.form_timestamp(time.time())},
+                ] + followers["recent_followers"][:RECENT_LENGTH - 1]
+
+    def new_subscriber(self, api_url: str):
+        """Someone subscribes to an account"""
+        with self.lock:
+            subscribers = cocorum.accounts[api_url]["subscribers"]
+            subscribers["recent_subscribers"] = [
+                {"username": f"subscriber{next(self.user_ids)}", "amount_cents": 500, "subscribed_on": cocorum.utils.form_timestamp(time.time())},
+                ] + subscribers["recent_subscribers"][:RECENT_LENGTH - 1]
+
+    def go_live(self, api_url: str):
+        """An account starts a livestream, with a chat"""
+        if api_url in self.live:
+            return
+        stream_id = cocorum.utils.base_10_to_36(next(self.stream_ids))
+        cocorum.chatapi.open_chat(stream_id)
+        with self.lock:
+            cocorum.accounts[api_url]["livestreams"] = [
+                {"id": stream_id, "title": f"Soak stream {stream_id}", "created_on": cocorum.utils.form_timestamp(time.time()), "is_live": True},
+                ]
+        self.live[api_url] = stream_id
+
+    def end_stream(self, api_url: str):
+        """An account's livestream ends, closing its chat"""
+        if not (stream_id := self.live.pop(api_url, None)):
+            return
+        with self.lock:
+            cocorum.accounts[api_url]["livestreams"] = []
+        cocorum.chatapi.close_chat(stream_id)
+
+    def chat(self, api_url: str):
+        """Someone chats on an account's livestream, if it has one and is not the quiet one"""
+        if api_url != self.quiet_api_url and (stream_id := self.live.get(api_url)):
+            cocorum.chatapi.post_event(stream_id, make_chat_event(self.message_ids, self.rng))
+
+
+class Soak():
+    """Drives the script and the world at random, and keeps track of resource use"""
+
+    def __init__(self, rng: random.Random, refresh_rate: float):
+        self.rng = rng
+        self.world = World(rng)
+        self.refresh_rate = refresh_rate
+        self.module = rum_live_alerts
+        self.settings = None
+        self.scene_names = []
+        self.counts = dict.fromkeys(("iterations", "updates", "scene changes", "collections", "reloads"), 0)
+        self.leaky_reloads = 0
+        self.slowest_call = (0.0, "")  # The longest the script kept the OBS thread in one call (seconds), and which
+
+    def call_script(self, function_name: str, *args):
+        """Call a script function the way OBS does, on its own thread, and time it"""
+        start = time.perf_counter()
+        result = getattr(self.module, function_name)(*args)
+        self.slowest_call = max(self.slowest_call, (time.perf_counter() - start, function_name))
+        return result
+
+    # Script lifecycle, the way OBS calls it
+    def load(self):
+        """Load the script"""
+        # Poll the fake accounts instead of the network
+        self.module.rla.http_pool.close()
+        self.module.rla.http_pool = AccountPool(self.world)
+
+        self.settings = obs.make_settings()
+        self.module.script_defaults(self.settings)
+        self.settings.values.update({f"{name}_alert_time": 0 for name in self.module.ALERT_NAMES})
+        self.settings.values.update({"refresh_rate": self.refresh_rate, "refresh_rate_idle": self.refresh_rate * 4})
+        self.call_script("script_load", self.settings)
+        self.call_script("script_update", self.settings)
+
+    def unload(self) -> dict:
+        """Unload the script, and return whatever it still holds in OBS"""
+        self.call_script("script_unload")
+        return {kind: held for kind, held in obs.leaks().items() if held}
+
+    def reload(self):
+        """Reload the script, like the reload button in the OBS scripts window, which imports it afresh"""
+        if leaks := self.unload():
+            report("LEAKED on reload:", leaks)
+            self.leaky_reloads += 1
+        self.module = importlib.reload(self.module)
+        self.load()
+        self.counts["reloads"] += 1
+
+    # Things that happen in OBS
+    def new_collection(self):
+        """Switch to a freshly built scene collection, with the alert scenes in it"""
+        obs.emit_frontend_event(obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CLEANUP)
+        for name in tuple(obs.sources):
+            obs.remove_source(name)
+        self.scene_names = obs.build_collection(NUM_SOURCES)
+
+        for alert_scene, text_sources in ALERT_SCENES.items():
+            obs.create_scene(alert_scene)
+            for source_name in text_sources:
+                obs.create_source(source_name)
+                obs.add_scene_item(alert_scene, source_name)
+            obs.add_scene_item(self.rng.choice(self.scene_names), alert_scene)
+
+        obs.emit_frontend_event(obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED)
+        self.counts["collections"] += 1
+
+    def change_scene(self):
+        """Switch scenes, or edit one"""
+        self.counts["scene changes"] += 1
+        choice = self.rng.random()
+        if choice < 0.5:
+            obs.set_current_scene(self.rng.choice(self.scene_names))
+        elif choice < 0.7:
+            source_name = f"Extra {self.counts['scene changes']}"
+            obs.create_source(source_name)
+            obs.add_scene_item(self.rng.choice(self.scene_names), source_name)
+        elif choice < 0.85:
+            extras = [name for name in obs.sources if name.startswith("Extra ")]
+            if extras:
+                obs.remove_source(self.rng.choice(extras))
+        else:
+            # Rename an alert text source away and back, as someone fixing a typo would
+            name = self.rng.choice(("Follower Username", "Rant Message", "Gift Count"))
+            obs.rename_source(name, name + " (old)")
+            obs.rename_source(name + " (old)", name)
+
+    def update_settings(self):
+        """Change some settings and apply them, as the scripts window does"""
+        self.counts["updates"] += 1
+        values = self.settings.values
+        choice = self.rng.random()
+        if choice < 0.4:
+            values["api_url"] = self.rng.choice(self.world.api_urls + [""])
+            values["extra_api_urls"] = " ".join(self.rng.sample(self.world.api_urls, self.rng.randint(0, 2)))
+        elif choice < 0.6:
+            values["extra_chat_streams"] = ",".join(self.rng.sample(self.world.extra_chats, self.rng.randint(0, NUM_EXTRA_CHATS)))
+        elif choice < 0.8:
+            name = self.rng.choice(self.module.ALERT_NAMES)
+            values[f"{name}_alert_use"] = self.rng.random() < 0.8
+            values[f"{name}_alert_lane"] = self.rng.randint(1, 3)
+            values[f"{name}_alert_max_queued"] = self.rng.choice((0, 10, 100))
+        elif choice < 0.9:
+            values["refresh_adaptive"] = not values.get("refresh_adaptive")
+        else:
+            # Point an alert at a scene that does not exist, or back
+            name = self.rng.choice(self.module.ALERT_NAMES)
+            values[f"{name}_alert_scene_source"] = self.rng.choice((getattr(self.module.DefaultSettings, f"{name}_alert_scene_source"), "No Such Scene"))
+        self.call_script("script_update", self.settings)
+
+    def open_properties(self):
+        """Open the script properties, and pick an alert scene like the user would"""
+        props = self.call_script("script_properties")
+        for name in ("follower", "subscriber"):
+            prop = obs.obs_properties_get(props, f"{name}_alert_scene_source")
+            if prop and prop.modified_callback:
+                prop.modified_callback(props, prop, self.settings)
+        if self.rng.random() < 0.2:
+            button = obs.obs_properties_get(props, f"{self.rng.choice(self.module.ALERT_NAMES)}_alert_test")
+            button.modified_callback(props, button)
+
+    # Things that happen on Rumble
+    def rumble_activity(self):
+        """Followers, subscribers, streams starting and stopping, and chat"""
+        api_url = self.rng.choice(self.world.api_urls)
+        choice = self.rng.random()
+        if choice < 0.1:
+            self.world.new_follower(api_url)
+        elif choice < 0.15:
+            self.world.new_subscriber(api_url)
+        elif choice < 0.17:
+            self.world.go_live(api_url)
+        elif choice < 0.18:
+            self.world.end_stream(api_url)
+        else:
+            self.world.chat(api_url)
+
+    def step(self, reload_every: int):
+        """Do one random thing, and let OBS tick"""
+        self.counts["iterations"] += 1
+        choice = self.rng.random()
+        if choice < 0.05:
+            self.update_settings()
+        elif choice < 0.1:
+            self.change_scene()
+        elif choice < 0.101:
+            self.new_collection()
+        elif choice < 0.103:
+            self.open_properties()
+        else:
+            self.rumble_activity()
+
+        if reload_every and self.counts["iterations"] % reload_every == 0:
+            self.reload()
+
+        obs.run_timers()
+
+
+def get_rss_mb() -> float:
+    """Get our resident memory in megabytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+    # Not Linux, settle for the peak
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_fds() -> int:
+    """Count our open file descriptors, or -1 if we cannot tell"""
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        with contextlib.suppress(OSError):
+            return len(os.listdir(fd_dir))
+    return -1
+
+
+def sample(soak: Soak, start: float) -> dict:
+    """Take a reading of resource use"""
+    gc.collect()
+    leaks = obs.leaks()
+    return {
+        "time": time.monotonic() - start,
+        "iterations": soak.counts["iterations"],
+        "source refs": sum(leaks["sources"].values()),
+        "item refs": sum(leaks["sceneitems"].values()),
+        "data": leaks["data"],
+        "signals": leaks["signals"],
+        "threads": threading.active_count(),
+        "fds": count_fds(),
+        "rss": get_rss_mb(),
+        }
+
+
+def report_sample(reading: dict):
+    """Print a reading as a table row"""
+    report(
+        f"{reading['time']:7.0f}s {reading['iterations']:9d} {reading['source refs']:7d} {reading['item refs']:7d}"
+        f" {reading['data']:6d} {reading['signals']:7d} {reading['threads']:7d} {reading['fds']:5d} {reading['rss']:8.1f}"
+        )
+
+
+def main():
+    """Run the soak test"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-d", "--duration", type=float, default=120, help="how long to run, in seconds")
+    parser.add_argument("-e", "--report-every", type=float, default=10, help="seconds between readings")
+    parser.add_argument("-r", "--reload-every", type=int, default=5000, help="iterations between script reloads, 0 for never")
+    parser.add_argument("-f", "--refresh-rate", type=float, default=0.05, help="RLS API refresh rate, in seconds")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="random seed, so runs are comparable")
+    args = parser.parse_args()
+
+    soak = Soak(random.Random(args.seed), args.refresh_rate)
+    baseline_threads = threading.enumerate()
+    readings = []
+    report("   time iterations srcrefs itemrefs  data signals threads   fds   rss MB")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        soak.new_collection()
+        soak.load()
+
+        start = time.monotonic()
+        next_reading = start
+        while time.monotonic() - start < args.duration:
+            faulthandler.dump_traceback_later(STEP_TIMEOUT, exit=True)
+            soak.step(args.reload_every)
+            time.sleep(0.001)  # Let the script's threads run, like OBS would between ticks
+            if time.monotonic() >= next_reading:
+                readings.append(sample(soak, start))
+                report_sample(readings[-1])
+                next_reading += args.report_every
+
+        faulthandler.dump_traceback_later(STEP_TIMEOUT, exit=True)
+        final_leaks = soak.unload()
+
+        # Give threads that were told to stop a moment to finish, with the streams still live
+        # so that ones stuck reading a quiet chat stay stuck and get caught
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and set(threading.enumerate()) - set(baseline_threads):
+            time.sleep(0.1)
+        stray_threads = [t.name for t in set(threading.enumerate()) - set(baseline_threads) if not t.name.startswith("soak-")]
+        faulthandler.cancel_dump_traceback_later()
+        soak.world.close()
+
+    report("\n" + ", ".join(f"{count} {what}" for what, count in soak.counts.items()))
+    report(f"Slowest call from OBS: {soak.slowest_call[1]} took {soak.slowest_call[0]:.3f} seconds")
+    if len(readings) >= 3:
+        # Ignore the warm up, when caches and the seen alerts store fill
+        settled = readings[len(readings) // 3]
+        growth = readings[-1]["rss"] - settled["rss"]
+        hours = (readings[-1]["time"] - settled["time"]) / 3600
+        report(f"Memory grew {growth:+.1f} MB after warm up ({growth / hours if hours else 0:+.1f} MB/hour)")
+
+    failed = False
+    if final_leaks:
+        report("LEAKED after unload:", final_leaks)
+        failed = True
+    if soak.leaky_reloads:
+        report(f"LEAKED on {soak.leaky_reloads} reloads")
+        failed = True
+    if stray_threads:
+        report("Threads still running after unload:", stray_threads)
+        failed = True
+    if soak.slowest_call[0] > rum_live_alerts.THREAD_SHUTDOWN_TIMEOUT:
+        report(f"OBS was kept waiting longer than the {rum_live_alerts.THREAD_SHUTDOWN_TIMEOUT} second shutdown timeout")
+        failed = True
+    if not failed:
+        report("No leaked OBS references, and no threads left running.")
+    sys.exit(failed)
+
+
+if __name__ == "__main__":
+    main()
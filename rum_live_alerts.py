@@ -4,11 +4,34 @@
 Live alerts for your Rumble livestream.
 S.D.G."""
 
-from queue import Queue
+import asyncio
+import bisect
+from collections import Counter, deque, OrderedDict
+import hashlib
+import heapq
+import http.client
+import http.server
+import json
+import math
+import os
+from queue import Empty
+import random
+import re
+import socket
+import sqlite3
+import ssl
+import sys
 import threading
+import time
+import tracemalloc
+from urllib.parse import urlsplit
 try:
     import obspython as obs
 except ModuleNotFoundError:
+    obs = None
+
+# Run by itself rather than by OBS, explain how to load it (but stay importable, e.g. by the benchmarks)
+if not obs and __name__ == "__main__":
     print("""
 ---ERROR---
 
@@ -20,169 +43,3005 @@ where you can browse to this script and load it. Then, select it in the list of
 loaded scripts (the big box on the left-hand side of the Scripts dialog), and
 you should see all of its settings on the right-hand side.
 
-If you are on Windows or MacOS, you must have a Python install path set under
-the Python Settings tab of the Scripts dialog.
-"""
-    )
-    input("Goodbye! Press enter to exit.")
-    quit()
+If you are on Windows or MacOS, you must have a Python install path set under
+the Python Settings tab of the Scripts dialog.
+"""
+    )
+    input("Goodbye! Press enter to exit.")
+    quit()
+
+try:
+    import cocorum
+    print("Cocorum successfully imported.")
+    COCORUM_IMPORTED = True
+except ModuleNotFoundError:
+    print("ERROR: You must install the Python library 'cocorum' to use this script.")
+    COCORUM_IMPORTED = False
+
+SCRIPT_DESCRIPTION = """
+<center>
+<h1>Rumble Live Alerts PY</h1>
+<p>Emulate the behavior of RumBot 4.5 and under, without WebSocket</p>
+</center>
+"""
+
+MAX_ALERT_TIME = 6000  # Maximum for how long an alert can be displayed
+MAX_QUEUED = 10000  # Maximum for how many alerts of one type can wait to be displayed
+MAX_PRIORITY = 1000  # Maximum for alert priority settings
+
+# Minimum and maximum refresh rates to check the API again
+REFRESH_RATE_MIN = 10
+REFRESH_RATE_MAX = 300
+
+# How much slower to poll after each quiet check when adapting the refresh rate
+REFRESH_BACKOFF = 1.5
+
+# Random variation in adaptive poll delays, as a fraction of the delay
+REFRESH_JITTER = 0.1
+
+# The alert types we handle, in the order their inboxes are checked
+ALERT_NAMES = ("follower", "subscriber", "rant", "raid", "gift")
+
+# What to do when an alert inbox is full, and how to show the choices in the OBS UI
+OVERFLOW_POLICIES = {
+    "drop_oldest": "Drop the oldest queued",
+    "drop_newest": "Drop the newest",
+    "keep_highest": "Keep the highest value",
+    }
+
+# How long to wait for a background thread to finish when shutting it down (seconds)
+THREAD_SHUTDOWN_TIMEOUT = 2
+
+# How long to wait before reconnecting to a chat that dropped, doubling each failed try (seconds)
+CHAT_RECONNECT_DELAY_MIN = 1
+CHAT_RECONNECT_DELAY_MAX = 60
+
+# How often the alert scheduler checks if it was woken or a deadline passed (milliseconds)
+ALERT_SCHEDULER_TICK = 50
+
+# How long to wait before retrying an alert whose scene is not in the current scene (seconds)
+ALERT_RETRY_DELAY = 1
+
+# Where we keep data that must survive restarts
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".rum_live_alerts")
+SEEN_ALERTS_FILE = os.path.join(DATA_DIR, "seen_alerts.sqlite3")
+
+# Where we journal alerts that are waiting to be shown, so they survive a crash
+JOURNAL_FILE = os.path.join(DATA_DIR, "pending_alerts.jsonl")
+
+# How often to write and sync the journal to disk (seconds)
+JOURNAL_SYNC_INTERVAL = 0.5
+
+# Rewrite the journal with only what is pending once it has this many more lines than that
+JOURNAL_COMPACT_LINES = 10000
+
+# Where we record API and chat traffic for replaying
+RECORDINGS_DIR = os.path.join(DATA_DIR, "recordings")
+
+# Where we write profile captures
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+
+# How many recently seen alert IDs to remember exactly in memory
+SEEN_FRONT_SIZE = 10000
+
+# How many seen alert IDs the Bloom filter is sized for at first, and how often it may wrongly say one was seen
+SEEN_BLOOM_CAPACITY = 1000000
+SEEN_BLOOM_ERROR_RATE = 0.001
+
+# Raw chat SSE text that marks an event as new messages, and text one of them must contain to be alert-worthy
+CHAT_MESSAGES_EVENT_MARKER = '"type":"messages"'
+CHAT_ALERT_MARKERS = ('"rant"', '"raid_notification"', '"gift_purchase_notification"')
+
+# Raw chat SSE text that appears once per message, as users have no user_id and quotes in text are escaped
+CHAT_MESSAGE_MARKER = '"user_id"'
+
+# What a stream ID in base 36 looks like
+STREAM_ID_PATTERN = "[0-9a-z]+"
+
+# How many idle keep-alive connections to keep open to each host
+HTTP_POOL_MAX_IDLE = 4
+
+# How long to wait on an HTTP request before giving up (seconds)
+HTTP_TIMEOUT = 20
+
+# Upper bounds of the metrics histogram buckets (seconds)
+ALERT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+API_POLL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+TICK_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+
+# How often to refresh the metrics text source (milliseconds)
+METRICS_DISPLAY_INTERVAL = 1000
+
+# Profile captures: longest capture (seconds), time between stack samples (seconds),
+# deepest stack to record, frames per allocation traceback, and how many of the slowest calls and biggest allocation growths to keep
+PROFILE_DURATION_MAX = 600
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_STACK_DEPTH = 64
+PROFILE_TRACEMALLOC_FRAMES = 10
+PROFILE_TOP_ENTRIES = 30
+
+# OBS source types we can set the text of
+TEXT_SOURCE_TYPES = ("text_gdiplus", "text_ft2_source")
+
+
+def format_usernames(usernames: list[str], shown: int = 2) -> str:
+    """Format a list of usernames for display, e.g. "Alice, Bob and 23 others"
+
+    Args:
+        usernames (list[str]): The usernames, in order.
+        shown (int): How many usernames to show before summarizing the rest.
+            Defaults to 2.
+
+    Returns:
+        Text (str): The formatted usernames."""
+
+    if len(usernames) <= 1:
+        return "".join(usernames)
+
+    if len(usernames) <= shown:
+        return ", ".join(usernames[:-1]) + " and " + usernames[-1]
+
+    others = len(usernames) - shown
+    return ", ".join(usernames[:shown]) + f" and {others} other" + ("s" if others != 1 else "")
+
+
+def account_key(api_url: str) -> str:
+    """Identify an RLS API account without giving away the key in its URL"""
+    return hashlib.sha256(api_url.encode()).hexdigest()[:16]
+
+
+class DefaultSettings:
+    """The default values for the various settings in the OBS UI"""
+    # Base settings
+    api_url = ""  # Rumble Live Stream API URL
+    extra_api_urls = ""  # More RLS API URLs for other channels, space separated
+    refresh_rate = 10  # API refresh rate
+    refresh_adaptive = False  # Adapt the refresh rate to activity
+    refresh_rate_idle = REFRESH_RATE_MAX  # Slowest adaptive refresh rate
+    coalesce_threshold = 10  # Combine alerts of a type when more than this many are queued
+    extra_chat_streams = ""  # Other streams to alert for chat from, comma separated IDs
+    record_traffic = False  # Record API and chat traffic for replaying
+    metrics_port = 0  # Serve metrics on this localhost port, 0 for off
+    metrics_source = ""  # Text source to show metrics in, empty for none
+    profile_duration = 30  # How long to capture a profile for, in seconds
+
+    # Settings for the follower alert
+    follower_alert_use = True
+    follower_alert_time = 10
+    follower_alert_max_queued = 100
+    follower_alert_lane = 1
+    follower_alert_priority = 10
+    follower_alert_overflow = "drop_oldest"
+    follower_alert_uname_source = "Follower Username"
+    follower_alert_scene_source = "Follower Scene"
+
+    # Settings for the subscriber alert
+    subscriber_alert_use = True
+    subscriber_alert_time = 10
+    subscriber_alert_max_queued = 100
+    subscriber_alert_lane = 1
+    subscriber_alert_priority = 20
+    subscriber_alert_value_weight = 0.01
+    subscriber_alert_overflow = "keep_highest"
+    subscriber_alert_uname_source = "Subscriber Username"
+    subscriber_alert_amount_source = "Subscriber Amount Dollars"
+    subscriber_alert_scene_source = "Subscriber Scene"
+
+    # Settings for the rant alert
+    rant_alert_use = True
+    rant_alert_time = 10
+    rant_alert_max_queued = 100
+    rant_alert_lane = 1
+    rant_alert_priority = 20
+    rant_alert_value_weight = 0.01
+    rant_alert_overflow = "keep_highest"
+    rant_alert_uname_source = "Rant Username"
+    rant_alert_message_source = "Rant Message"
+    rant_alert_amount_source = "Rant Amount Dollars"
+    rant_alert_scene_source = "Rant Scene"
+
+    # Settings for the raid alert
+    raid_alert_use = True
+    raid_alert_time = 10
+    raid_alert_max_queued = 100
+    raid_alert_lane = 1
+    raid_alert_priority = 40
+    raid_alert_overflow = "drop_oldest"
+    raid_alert_uname_source = "Raid Username"
+    raid_alert_scene_source = "Raid Scene"
+
+    # Settings for the gift alert
+    gift_alert_use = True
+    gift_alert_time = 10
+    gift_alert_max_queued = 100
+    gift_alert_lane = 1
+    gift_alert_priority = 20
+    gift_alert_value_weight = 1.0
+    gift_alert_overflow = "keep_highest"
+    gift_alert_uname_source = "Gift Username"
+    gift_alert_count_source = "Gift Count"
+    #gift_alert_amount_source = "Gift Amount Dollars"
+    gift_alert_scene_source = "Gift Scene"
+
+
+class AlertRecord():
+    """The few details of a follower, subscriber, or chat message that its alert displays"""
+
+    __slots__ = ("alert_id", "username", "text", "amount_cents", "count")
+
+    def __init__(self, username: str, alert_id: str = None, text: str = "", amount_cents: int = 0, count: int = 0):
+        """
+        The few details of an alertable that its alert displays
+
+        Args:
+            username (str): Who the alert is for.
+            alert_id (str): Identifies what we are alerting for, even across restarts.
+                Defaults to None, for test alerts.
+            text (str): The message text, for rants.
+                Defaults to empty.
+            amount_cents (int): How much was paid, for subscribers and rants.
+                Defaults to 0.
+            count (int): How many subscriptions were gifted, for gifts.
+                Defaults to 0."""
+
+        self.alert_id = alert_id
+        self.username = username
+        self.text = text
+        self.amount_cents = amount_cents
+        self.count = count
+
+    def __str__(self):
+        """The alert record in string form"""
+        return self.username
+
+    def __repr__(self):
+        """The alert record in debugging form"""
+        return f"AlertRecord({self.username!r}, alert_id={self.alert_id!r})"
+
+    def to_dict(self) -> dict:
+        """The alert record as a JSON-friendly dict"""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Make an alert record back from to_dict() output"""
+        return cls(**data)
+
+    @classmethod
+    def from_follower(cls, follower):
+        """Make an alert record of a Cocorum follower"""
+        return cls(follower.username, alert_id=f"{follower.username}@{follower.followed_on:.0f}")
+
+    @classmethod
+    def from_subscriber(cls, subscriber):
+        """Make an alert record of a Cocorum subscriber"""
+        return cls(
+            subscriber.username,
+            alert_id=f"{subscriber.username}@{subscriber.subscribed_on:.0f}",
+            amount_cents=subscriber.amount_cents,
+            )
+
+    @classmethod
+    def from_message(cls, message):
+        """Make an alert record of a Cocorum chat message"""
+        gift = message.gift_purchase_notification
+        return cls(
+            message.user.username if message.user else "",
+            alert_id=str(message.message_id),
+            text=message.text,
+            amount_cents=message.rant_price_cents,
+            count=gift.total_gifts if gift else 0,
+            )
+
+    @classmethod
+    def from_message_json(cls, jsondata: dict, username: str):
+        """Make an alert record of a chat message straight from its SSE JSON
+
+        Args:
+            jsondata (dict): The JSON data block for the message.
+            username (str): The username of who sent it."""
+
+        return cls(
+            username,
+            alert_id=str(jsondata["id"]),
+            text=jsondata.get("text", ""),
+            amount_cents=jsondata["rant"]["price_cents"] if "rant" in jsondata else 0,
+            count=(jsondata.get("gift_purchase_notification") or {}).get("total_gifts", 0),
+            )
+
+
+# Alert records to test the alert displays with
+TestFollower = AlertRecord("NOBODY")
+TestSubscriber = AlertRecord("NOBODY", amount_cents=316)
+TestRant = AlertRecord("NOBODY", text="Soli Deo gloria.", amount_cents=316)
+TestRaid = AlertRecord("NOBODY")
+TestGift = AlertRecord("NOBODY", count=37)
+
+
+class AlertJournal(threading.Thread):
+    """Append-only on-disk journal of alerts waiting in the inboxes, written and synced in batches in the background"""
+
+    def __init__(self, path: str = JOURNAL_FILE, sync_interval: float = JOURNAL_SYNC_INTERVAL):
+        """
+        Append-only on-disk journal of alerts waiting in the inboxes
+
+        Args:
+            path (str): The journal file.
+                Defaults to JOURNAL_FILE.
+            sync_interval (float): How often to write and sync to disk, in seconds.
+                Defaults to JOURNAL_SYNC_INTERVAL."""
+
+        super().__init__(daemon=True)
+
+        self.path = path
+        self.sync_interval = sync_interval
+
+        self.__pending = OrderedDict()  # (Alert name, alert ID): alert record, oldest first
+        self.__buffer = []  # Operations waiting to be written, as (operation, alert name, alert record)
+        self.__lock = threading.Lock()
+        self.__opened = False
+
+        # Only touched while writing, so the inboxes never wait on the disk
+        self.__lines_since_compact = 0
+        self.__file = None
+        self.__write_lock = threading.Lock()
+
+        # Thread-safe killswitch, also wakes us to write early
+        self.__stop_event = threading.Event()
+
+        # Statistics
+        self.syncs = 0
+        self.bytes_written = 0
+
+    @property
+    def opened(self) -> bool:
+        """Have we read the journal and started writing to it?"""
+        return self.__opened
+
+    def open(self) -> list[tuple[str, AlertRecord]]:
+        """Read back what was pending, compact the journal, and start writing to it
+
+        Returns:
+            Pending (list[tuple[str, AlertRecord]]): The alert names and records
+                that were waiting when we last stopped, oldest first."""
+
+        pending = OrderedDict()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op, name, data = json.loads(line)
+                    except ValueError:
+                        # The last line may have been cut off by a crash
+                        continue
+                    if op == "+":
+                        pending[(name, data["alert_id"])] = AlertRecord.from_dict(data)
+                    else:
+                        pending.pop((name, data), None)
+
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"ERROR: Could not read pending alerts from {self.path}: {e}")
+
+        with self.__lock:
+            # Anything queued before we opened still counts
+            pending.update(self.__pending)
+            self.__pending = pending
+            self.__buffer = []
+            snapshot = list(pending.items())
+
+        with self.__write_lock:
+            self.__compact(snapshot)
+
+        self.__opened = True
+        self.start()
+        return [(name, alertable) for (name, _), alertable in snapshot]
+
+    def put(self, name: str, alertable: AlertRecord):
+        """Journal that an alert was queued (cheap, does not touch the disk)"""
+        key = (name, alertable.alert_id)
+        with self.__lock:
+            if key in self.__pending:
+                return
+            self.__pending[key] = alertable
+            self.__buffer.append(("+", name, alertable))
+
+    def take(self, name: str, alertable: AlertRecord):
+        """Journal that an alert left its inbox (cheap, does not touch the disk)"""
+        key = (name, alertable.alert_id)
+        with self.__lock:
+            if self.__pending.pop(key, None) is None:
+                return
+            self.__buffer.append(("-", name, alertable))
+
+    def run(self):
+        """The threaded code"""
+        while not self.__stop_event.wait(self.sync_interval):
+            self.sync()
+        self.sync()
+
+    def sync(self):
+        """Write and sync everything journaled so far, compacting if the journal got long"""
+        with self.__lock:
+            if not self.__buffer:
+                return
+            operations, self.__buffer = self.__buffer, []
+
+            # A snapshot of what is pending already includes the effect of these operations
+            snapshot = None
+            if self.__lines_since_compact + len(operations) > JOURNAL_COMPACT_LINES + len(self.__pending):
+                snapshot = list(self.__pending.items())
+
+        with self.__write_lock:
+            if snapshot is not None:
+                self.__compact(snapshot)
+            else:
+                self.__write([self.__format(*operation) for operation in operations])
+
+    @staticmethod
+    def __format(operation: str, name: str, alertable: AlertRecord) -> str:
+        """Make the journal line for an operation"""
+        if operation == "+":
+            return json.dumps(["+", name, alertable.to_dict()]) + "\n"
+        return json.dumps(["-", name, alertable.alert_id]) + "\n"
+
+    def __write(self, lines: list[str]):
+        """Append lines to the journal and sync it (must hold the write lock)"""
+        if not self.__file:
+            return
+        data = "".join(lines)
+        try:
+            self.__file.write(data)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+        except OSError as e:
+            print(f"ERROR: Could not write pending alerts journal: {e}")
+            return
+        self.__lines_since_compact += len(lines)
+        self.bytes_written += len(data.encode())
+        self.syncs += 1
+
+    def __compact(self, snapshot: list):
+        """Atomically replace the journal with just what is pending (must hold the write lock)
+
+        Args:
+            snapshot (list): The pending (alert name, alert ID) keys and alert records."""
+
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+
+        temp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data = "".join(self.__format("+", name, alertable) for (name, _), alertable in snapshot)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self.__file = open(self.path, "a", encoding="utf-8")
+
+        except OSError as e:
+            print(f"ERROR: Could not write pending alerts journal, pending alerts will not survive a crash: {e}")
+            return
+
+        self.__lines_since_compact = 0
+        self.bytes_written += len(data.encode())
+        self.syncs += 1
+
+    def close(self, timeout: float = THREAD_SHUTDOWN_TIMEOUT):
+        """Write out everything journaled and stop
+
+        Args:
+            timeout (float): How long to wait for the last write, in seconds.
+                Defaults to THREAD_SHUTDOWN_TIMEOUT."""
+
+        self.__stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        with self.__write_lock:
+            if self.__file:
+                self.__file.close()
+                self.__file = None
+
+
+class AlertInbox():
+    """Thread-safe queue of alertables with a maximum depth and an overflow policy, first in first out or highest value first"""
+
+    def __init__(
+        self,
+        name: str,
+        value_of: callable = None,
+        max_queued: int = 0,
+        overflow: str = "drop_oldest",
+        journal: AlertJournal = None,
+            ):
+        """
+        Thread-safe queue of alertables with a maximum depth and an overflow policy
+
+        Args:
+            name (str): The alert name, for logging.
+            value_of (callable): Gets the value of an alertable, for the
+                keep_highest policy and taking the highest value first.
+                Defaults to all alertables being equal.
+            max_queued (int): How many alertables can wait at once.
+                Defaults to 0, no limit.
+            overflow (str): Which alertables to drop when full, a key of
+                OVERFLOW_POLICIES. Defaults to drop_oldest.
+            journal (AlertJournal): Where to journal alertables coming and going,
+                so they survive a crash. Defaults to None, no journal."""
+
+        self.name = name
+        self.value_of = value_of or (lambda alertable: 0)
+        self.max_queued = max_queued
+        self.overflow = overflow
+        self.journal = journal
+
+        # Take the highest value first instead of the oldest, of equal values the oldest
+        self.highest_first = False
+
+        # How many alertables we have dropped due to overflow
+        self.dropped = 0
+
+        # Entries are [arrival time, alertable, sequence number, still queued]
+        # Dropping the lowest value leaves its entry in the deque marked as gone,
+        # to be skipped when it reaches either end or cleared out in a compaction
+        self.__items = deque()
+        self.__count = 0
+        self.__sequence = 0
+
+        # For keep_highest, a min-heap of (value, -sequence number, entry), so the lowest and then newest is first
+        # Entries taken from the deque stay in it marked as gone, the same way
+        self.__by_value = []
+
+        # For highest_first, a min-heap of (-value, sequence number, entry), so the highest and then oldest is first
+        # Entries dropped or taken stay in it marked as gone, the same way
+        self.__take_order = []
+
+        self.__lock = threading.Lock()
+
+    def configure(self, max_queued: int, overflow: str, highest_first: bool = False):
+        """Change the maximum depth, overflow policy and take order, dropping alertables if we are now over
+
+        Args:
+            max_queued (int): How many alertables can wait at once, 0 for no limit.
+            overflow (str): Which alertables to drop when full, a key of OVERFLOW_POLICIES.
+            highest_first (bool): Take the highest value first, instead of the oldest.
+                Defaults to False."""
+
+        if overflow not in OVERFLOW_POLICIES:
+            print(f"ERROR: Unknown {self.name} overflow policy '{overflow}', using drop_oldest")
+            overflow = "drop_oldest"
+
+        with self.__lock:
+            self.max_queued = max_queued
+            if overflow != self.overflow or highest_first != self.highest_first:
+                self.overflow = overflow
+                self.highest_first = highest_first
+                self.__compact()
+            dropped = self.__trim()
+        self.__report_dropped(dropped)
+
+    def put(self, alertable) -> bool:
+        """Queue an alertable, dropping one if we are full
+
+        Returns:
+            Queued (bool): False if this alertable was the one dropped."""
+
+        with self.__lock:
+            self.__sequence += 1
+            entry = [time.monotonic_ns(), alertable, self.__sequence, True]
+            self.__items.append(entry)
+            self.__count += 1
+            if self.overflow == "keep_highest" or self.highest_first:
+                value = self.value_of(alertable)
+                if self.overflow == "keep_highest":
+                    heapq.heappush(self.__by_value, (value, -self.__sequence, entry))
+                if self.highest_first:
+                    heapq.heappush(self.__take_order, (-value, self.__sequence, entry))
+            self.__journal("put", alertable)
+            dropped = self.__trim()
+        self.__report_dropped(dropped)
+        return not any(d is alertable for d in dropped)
+
+    def __compact(self):
+        """Clear out entries marked as gone, and rebuild the heaps we need (must hold the lock)"""
+        self.__items = deque(entry for entry in self.__items if entry[3])
+        self.__by_value = []
+        self.__take_order = []
+        if self.overflow == "keep_highest":
+            self.__by_value = [(self.value_of(entry[1]), -entry[2], entry) for entry in self.__items]
+            heapq.heapify(self.__by_value)
+        if self.highest_first:
+            self.__take_order = [(-self.value_of(entry[1]), entry[2], entry) for entry in self.__items]
+            heapq.heapify(self.__take_order)
+
+    def __pop_entry(self, end: str) -> list:
+        """Take the oldest ("left") or newest ("right") queued entry, skipping ones marked as gone (must hold the lock)"""
+        pop = self.__items.popleft if end == "left" else self.__items.pop
+        while not (entry := pop())[3]:
+            pass
+        entry[3] = False
+        self.__count -= 1
+        self.__maybe_compact()
+        return entry
+
+    def __maybe_compact(self):
+        """Compact once more than half of what we hold is marked as gone, so each compaction pays for itself (must hold the lock)"""
+        limit = 2 * self.__count + 16
+        if len(self.__items) > limit or len(self.__by_value) > limit or len(self.__take_order) > limit:
+            self.__compact()
+
+    def __journal(self, operation: str, alertable):
+        """Journal an alertable coming (put) or going (take), if we have a journal and it can be identified (must hold the lock)"""
+        if self.journal and alertable.alert_id is not None:
+            getattr(self.journal, operation)(self.name, alertable)
+
+    def __trim(self) -> list:
+        """Drop alertables until we are within our maximum depth (must hold the lock)"""
+        dropped = []
+        while self.max_queued and self.__count > self.max_queued:
+            if self.overflow == "drop_oldest":
+                dropped.append(self.__pop_entry("left")[1])
+
+            elif self.overflow == "drop_newest":
+                dropped.append(self.__pop_entry("right")[1])
+
+            # Drop the lowest value, and of equal values, the newest
+            else:
+                while not (entry := heapq.heappop(self.__by_value)[2])[3]:
+                    pass
+                entry[3] = False
+                self.__count -= 1
+                dropped.append(entry[1])
+                self.__maybe_compact()
+
+        for alertable in dropped:
+            self.__journal("take", alertable)
+        self.dropped += len(dropped)
+        return dropped
+
+    def __report_dropped(self, dropped: list):
+        """Log that alertables were dropped"""
+        for alertable in dropped:
+            print(f"WARNING: {self.name.capitalize()} inbox full, dropped {alertable}")
+
+    def get_nowait(self):
+        """Get the next alertable, raising queue.Empty if there are none"""
+        return self.take_nowait()[1]
+
+    def take_nowait(self) -> tuple:
+        """Get the next alertable with its arrival time in nanoseconds, raising queue.Empty if there are none"""
+        with self.__lock:
+            if not self.__count:
+                raise Empty
+            if self.highest_first:
+                entry = self.__next_highest()
+                heapq.heappop(self.__take_order)
+                entry[3] = False
+                self.__count -= 1
+                self.__maybe_compact()
+            else:
+                entry = self.__pop_entry("left")
+            arrival, alertable, *_ = entry
+            self.__journal("take", alertable)
+            return arrival, alertable
+
+    def __next_highest(self) -> list:
+        """Get the highest value queued entry without taking it, clearing gone ones off the top of the heap (must hold the lock)"""
+        while not self.__take_order[0][2][3]:
+            heapq.heappop(self.__take_order)
+        return self.__take_order[0][2]
+
+    def peek(self) -> tuple | None:
+        """Look at the next alertable without taking it
+
+        Returns:
+            Next (tuple | None): The arrival time in nanoseconds and the
+                alertable, or None if there are none waiting."""
+
+        with self.__lock:
+            if not self.__count:
+                return None
+            if self.highest_first:
+                return tuple(self.__next_highest()[:2])
+            while not self.__items[0][3]:
+                self.__items.popleft()
+            return tuple(self.__items[0][:2])
+
+    def empty(self) -> bool:
+        """Are there no alertables waiting?"""
+        return not self.__count
+
+    def qsize(self) -> int:
+        """How many alertables are waiting"""
+        return self.__count
+
+
+def count_chat_messages(data: str) -> int:
+    """Cheaply count the new messages in raw chat SSE event data, without parsing it
+
+    Args:
+        data (str): The raw data of one chat SSE event.
+
+    Returns:
+        Count (int): How many new messages it holds, 0 for any other event."""
+
+    if not data or CHAT_MESSAGES_EVENT_MARKER not in data:
+        return 0
+    return data.count(CHAT_MESSAGE_MARKER)
+
+
+def chat_event_may_alert(data: str) -> bool:
+    """Cheaply check if raw chat SSE event data could hold an alert, without parsing it
+
+    Args:
+        data (str): The raw data of one chat SSE event.
+
+    Returns:
+        Maybe (bool): False only for new messages events that certainly hold no alerts."""
+
+    # Only skip ordinary new messages, every other event changes chat state
+    if CHAT_MESSAGES_EVENT_MARKER not in data:
+        return True
+
+    return any(marker in data for marker in CHAT_ALERT_MARKERS)
+
+
+class BloomFilter():
+    """Set of strings that may wrongly say it has one, but never wrongly says it does not"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Set of strings that may wrongly say it has one
+
+        Args:
+            capacity (int): How many strings it is sized for.
+            error_rate (float): How often it may wrongly say it has a string, when at capacity."""
+
+        self.capacity = capacity
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.__bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def __indices(self, key: str):
+        """Yield the bit indices of a string"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        """Add a string"""
+        for index in self.__indices(key):
+            self.__bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        """Might we have this string?"""
+        return all(self.__bits[index >> 3] & (1 << (index & 7)) for index in self.__indices(key))
+
+
+class SeenAlertStore():
+    """On-disk record of which alerts we have already queued, that survives restarts (thread-safe)"""
+
+    def __init__(self, path: str = SEEN_ALERTS_FILE, front_size: int = SEEN_FRONT_SIZE):
+        """
+        On-disk record of which alerts we have already queued
+
+        Args:
+            path (str): The SQLite database to keep the alert IDs in, indexed by name and ID.
+                Defaults to SEEN_ALERTS_FILE.
+            front_size (int): How many recent alert IDs to remember exactly in memory.
+                Defaults to SEEN_FRONT_SIZE."""
+
+        self.path = path
+        self.front_size = front_size
+        self.__lock = threading.Lock()
+        self.__recent = OrderedDict()  # Recently seen keys, oldest first
+        self.__bloom = None
+        self.__db = None
+
+        # Set by close() to cut short a load in progress
+        self.__closing = False
+
+    @property
+    def loaded(self) -> bool:
+        """Have we loaded the file yet?"""
+        return self.__bloom is not None
+
+    @staticmethod
+    def __open(path: str) -> sqlite3.Connection:
+        """Open the database, creating it if need be, with each statement committing on its own"""
+        db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+        return db
+
+    def load_in_background(self) -> threading.Thread:
+        """Load on a thread of its own, so that whoever checks first does not wait for all of it
+
+        Returns:
+            Loader (threading.Thread): The started thread. Checks wait for it to finish."""
+
+        self.__closing = False
+        loader = threading.Thread(target=self.load, daemon=True, name="seen alerts loader")
+        loader.start()
+        return loader
+
+    def load(self):
+        """Open the database of seen alert IDs and fill the in-memory front from it, if we have not already"""
+        with self.__lock:
+            if self.loaded or self.__closing:
+                return
+
+            db = None
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                db = self.__open(self.path)
+                count = db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+            except (OSError, sqlite3.Error) as e:
+                print(f"ERROR: Could not open {self.path}, seen alerts will not survive a restart: {e}")
+                if db:
+                    db.close()
+                db = self.__open(":memory:")
+                count = 0
+
+            bloom = BloomFilter(max(SEEN_BLOOM_CAPACITY, count * 2), SEEN_BLOOM_ERROR_RATE)
+            for (key,) in db.execute("SELECT key FROM seen"):
+                bloom.add(key)
+
+                # We are being closed, so nobody needs the rest
+                if self.__closing:
+                    db.close()
+                    return
+
+            self.__bloom = bloom
+            recent = db.execute("SELECT key FROM seen ORDER BY rowid DESC LIMIT ?", (self.front_size,)).fetchall()
+            self.__recent = OrderedDict.fromkeys(key for (key,) in reversed(recent))
+            self.__db = db
+
+            print(f"Loaded {count} seen alert IDs.")
+
+    def close(self):
+        """Close the database, and forget what we loaded from it"""
+        self.__closing = True
+        with self.__lock:
+            self.__closing = False
+            if self.__db:
+                self.__db.close()
+            self.__db = None
+            self.__bloom = None
+            self.__recent.clear()
+
+    @staticmethod
+    def __key(name: str, alert_id: str) -> str:
+        """Combine an alert name and ID into one line of the file"""
+        return f"{name}\t{alert_id}"
+
+    def __has(self, key: str) -> bool:
+        """Check for a key, cheaply unless the Bloom filter says maybe"""
+        if key in self.__recent:
+            self.__recent.move_to_end(key)
+            return True
+        if key not in self.__bloom:
+            return False
+
+        # Old ID or a false positive, so only the database knows for sure
+        try:
+            return self.__db.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is not None
+        except sqlite3.Error:
+            return True
+
+    def seen(self, name: str, alert_id: str) -> bool:
+        """Have we already queued this alert?
+
+        Args:
+            name (str): The alert name.
+            alert_id (str): The alert ID.
+
+        Returns:
+            Seen (bool): Did we see it before?"""
+
+        self.load()
+        with self.__lock:
+            # Closed while we waited, so nothing to go by
+            if not self.loaded:
+                return False
+            return self.__has(self.__key(name, alert_id))
+
+    def add(self, name: str, alert_id: str) -> bool:
+        """Remember that we queued this alert
+
+        Args:
+            name (str): The alert name.
+            alert_id (str): The alert ID.
+
+        Returns:
+            New (bool): False if we already had it."""
+
+        self.load()
+        key = self.__key(name, alert_id)
+        with self.__lock:
+            # Closed while we waited, so nowhere to remember it
+            if not self.loaded:
+                return True
+            if self.__has(key):
+                return False
+
+            self.__bloom.add(key)
+            self.__recent[key] = None
+            if len(self.__recent) > self.front_size:
+                self.__recent.popitem(last=False)
+
+            try:
+                self.__db.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,))
+            except sqlite3.Error as e:
+                print(f"ERROR: Could not save seen alert {key!r}: {e}")
+            return True
+
+
+class TrafficRecorder():
+    """Append-only recording of raw RLS API responses and chat events, with when they arrived (thread-safe)
+
+    Each line is the JSON list [seconds since the recording started, kind, key, data],
+    where kind is "api" (keyed by account_key()), "chat" (keyed by the base 36 stream ID)
+    for the livestream chat, or "sse" (same key) for the extra chats. The first line
+    is [0, "start", "", the wall clock time], so replays can shift timestamps."""
+
+    def __init__(self, directory: str = RECORDINGS_DIR):
+        """
+        Append-only recording of raw RLS API responses and chat events
+
+        Args:
+            directory (str): Where to put recording files.
+                Defaults to RECORDINGS_DIR."""
+
+        self.directory = directory
+        self.path = None
+        self.entries = 0
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__start = 0
+
+    @property
+    def recording(self) -> bool:
+        """Are we recording?"""
+        return self.__file is not None
+
+    def start(self):
+        """Start recording to a new file, unless we already are"""
+        with self.__lock:
+            if self.__file:
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self.path = os.path.join(self.directory, time.strftime("traffic-%Y%m%d-%H%M%S.jsonl"))
+                self.__file = open(self.path, "a", encoding="utf-8", buffering=1)
+            except OSError as e:
+                print(f"ERROR: Could not start recording traffic: {e}")
+                return
+            self.__start = time.monotonic()
+            self.entries = 0
+            self.__write([0, "start", "", time.time()])
+        print("Recording API and chat traffic to", self.path)
+
+    def stop(self):
+        """Stop recording, if we are"""
+        with self.__lock:
+            if not self.__file:
+                return
+            self.__file.close()
+            self.__file = None
+        print(f"Recorded {self.entries} API responses and chat events to {self.path}")
+
+    def record(self, kind: str, key: str, data: str):
+        """Record some traffic, if we are recording
+
+        Args:
+            kind (str): "api", "chat", or "sse".
+            key (str): Which account or stream it is for.
+            data (str): The raw response body or SSE event data."""
+
+        if not self.__file:
+            return
+        with self.__lock:
+            if not self.__file:
+                return
+            self.__write([round(time.monotonic() - self.__start, 3), kind, key, data])
+            self.entries += 1
+
+    def __write(self, entry: list):
+        """Write an entry as a line (must hold the lock)"""
+        try:
+            self.__file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(f"ERROR: Could not record traffic: {e}")
+
+
+class Histogram():
+    """Counts of observed values by bucket, like a Prometheus histogram (see PipelineMetrics on thread safety)"""
+
+    def __init__(self, buckets: tuple):
+        """
+        Counts of observed values by bucket
+
+        Args:
+            buckets (tuple): Upper bounds of the buckets, ascending.
+                Values above the last one go in an implied infinite bucket."""
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        """Count a value"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in
+
+        Returns:
+            Quantile (float): The bucket's upper bound, 0 if nothing was observed,
+                or infinity if it is above the last bucket."""
+
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), tuple(self.counts)):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_prometheus(self, name: str, labels: str = "") -> list[str]:
+        """Format as Prometheus text exposition lines
+
+        Args:
+            name (str): The metric name.
+            labels (str): Labels to add to every line, like 'alert="rant"'.
+                Defaults to none."""
+
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), tuple(self.counts)):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{"+Inf" if bound == float("inf") else bound}"}} {cumulative}')
+        labels = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{labels} {self.total}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class PipelineMetrics():
+    """Counters and histograms of how alerts move through the script
+
+    Updates take no locks. Each is a few integer and list operations, and the
+    GIL keeps those whole, so at worst two threads updating the same counter at
+    once lose one count, which does not matter for monitoring."""
+
+    def __init__(self):
+        """Counters and histograms of how alerts move through the script"""
+        # Seconds from an alert being queued to being shown
+        self.alert_latency = {name: Histogram(ALERT_LATENCY_BUCKETS) for name in ALERT_NAMES}
+
+        # Seconds per RLS API check, and how many failed
+        self.api_poll_duration = Histogram(API_POLL_BUCKETS)
+        self.api_poll_failures = 0
+
+        # Seconds per alert scheduler tick, for ticks that had something to do and ones that went straight back to sleep
+        self.tick_duration = {"busy": Histogram(TICK_BUCKETS), "idle": Histogram(TICK_BUCKETS)}
+
+        # Raw chat events, and new chat messages in them, received from livestream chats and extra chats
+        self.chat_events = {"livestream": 0, "extra": 0}
+        self.chat_messages = {"livestream": 0, "extra": 0}
+
+    def count_chat_event(self, source: str, data: str):
+        """Count a raw chat event from a source, "livestream" or "extra", and the new messages in it"""
+        self.chat_events[source] += 1
+        self.chat_messages[source] += count_chat_messages(data)
+
+    def to_prometheus(self) -> list[str]:
+        """Format as Prometheus text exposition lines"""
+        lines = [
+            "# HELP rla_alert_latency_seconds Time from an alert being queued to being shown.",
+            "# TYPE rla_alert_latency_seconds histogram",
+            ]
+        for name, histogram in self.alert_latency.items():
+            lines += histogram.to_prometheus("rla_alert_latency_seconds", f'alert="{name}"')
+
+        lines += [
+            "# HELP rla_api_poll_seconds Time per RLS API check.",
+            "# TYPE rla_api_poll_seconds histogram",
+            *self.api_poll_duration.to_prometheus("rla_api_poll_seconds"),
+            "# HELP rla_api_poll_failures_total RLS API checks that failed.",
+            "# TYPE rla_api_poll_failures_total counter",
+            f"rla_api_poll_failures_total {self.api_poll_failures}",
+            "# HELP rla_alert_scheduler_tick_seconds Time per OBS alert scheduler tick, busy if it had something to do.",
+            "# TYPE rla_alert_scheduler_tick_seconds histogram",
+            ]
+        for work, histogram in self.tick_duration.items():
+            lines += histogram.to_prometheus("rla_alert_scheduler_tick_seconds", f'work="{work}"')
+
+        lines += [
+            "# HELP rla_chat_events_total Raw chat events received.",
+            "# TYPE rla_chat_events_total counter",
+            *(f'rla_chat_events_total{{source="{source}"}} {count}' for source, count in tuple(self.chat_events.items())),
+            "# HELP rla_chat_messages_total New chat messages received.",
+            "# TYPE rla_chat_messages_total counter",
+            *(f'rla_chat_messages_total{{source="{source}"}} {count}' for source, count in tuple(self.chat_messages.items())),
+            ]
+        return lines
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answer GET /metrics with the server's metrics text"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.get_metrics_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Do not log every scrape"""
+        pass
+
+
+class MetricsServer(threading.Thread):
+    """Serve metrics in the Prometheus text format on localhost, in the background"""
+
+    def __init__(self, port: int, get_metrics_text: callable):
+        """
+        Serve metrics in the Prometheus text format on localhost
+
+        Args:
+            port (int): The port to listen on.
+            get_metrics_text (callable): Returns the metrics text, called for every request.
+
+        Raises:
+            OSError: The port could not be listened on."""
+
+        super().__init__(daemon=True)
+        self.port = port
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), MetricsRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.get_metrics_text = get_metrics_text
+
+    def run(self):
+        """The threaded code"""
+        self.httpd.serve_forever()
+
+    def shutdown(self, timeout: float = THREAD_SHUTDOWN_TIMEOUT):
+        """Stop serving and close the port"""
+        if self.is_alive():
+            self.httpd.shutdown()
+            self.join(timeout)
+        self.httpd.server_close()
+
+
+class Profiler():
+    """Time-bounded capture of where the script spends its time and memory, costing nothing until started
+
+    While capturing, wrapped OBS timer callbacks are timed, a sampler thread
+    records the Python stacks of the OBS thread(s) running them and of the chat
+    threads, and tracemalloc follows allocation growth. At the end it all goes
+    in a JSON file to attach to a bug report."""
+
+    def __init__(self, directory: str = PROFILES_DIR, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        """
+        Time-bounded capture of where the script spends its time and memory
+
+        Args:
+            directory (str): Where to put profile files.
+                Defaults to PROFILES_DIR.
+            sample_interval (float): Seconds between stack samples.
+                Defaults to PROFILE_SAMPLE_INTERVAL."""
+
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.path = None
+        self.capturing = False
+
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__sampler = None
+        self.__start = 0
+
+        # Capture data
+        self.__callback_times = {}  # Callback name: [(seconds into the capture, duration)]
+        self.__callback_threads = {}  # Thread ident: label, for threads that ran timed callbacks
+        self.__stacks = Counter()  # Collapsed stack: samples
+        self.__memory = []  # [seconds into the capture, traced bytes]
+
+    def start(self, duration: float, get_threads: callable):
+        """Start a capture, unless one is running
+
+        Args:
+            duration (float): How long to capture for, in seconds.
+            get_threads (callable): Returns the chat threads to sample, as
+                {thread ident: label}. Called for every sample, as they come and go."""
+
+        with self.__lock:
+            if self.capturing:
+                print("Already capturing a profile.")
+                return
+            self.capturing = True
+            self.__stop_event.clear()
+            self.__callback_times = {}
+            self.__callback_threads = {}
+            self.__stacks = Counter()
+            self.__memory = []
+            self.__start = time.perf_counter()
+            self.__sampler = threading.Thread(target=self.__capture, args=(duration, get_threads), daemon=True)
+            self.__sampler.start()
+        print(f"Capturing a profile for {duration} seconds.")
+
+    def stop(self, wait: bool = True, timeout: float = THREAD_SHUTDOWN_TIMEOUT) -> bool:
+        """End a capture early, if one is running
+
+        Args:
+            wait (bool): Wait for the profile to be written. Otherwise the
+                sampler thread writes it in its own time.
+                Defaults to True.
+            timeout (float): How long to wait, in seconds.
+                Defaults to THREAD_SHUTDOWN_TIMEOUT.
+
+        Returns:
+            Finished (bool): False if the profile is still being written after the timeout, or we did not wait."""
+
+        self.__stop_event.set()
+        if not wait:
+            return not self.capturing
+        if (sampler := self.__sampler) and sampler.is_alive():
+            sampler.join(timeout)
+            if sampler.is_alive():
+                print(f"WARNING: Profile was not written within {timeout} seconds.")
+                return False
+        return True
+
+    def timed(self, callback: callable) -> callable:
+        """Wrap an OBS timer callback to time it while we are capturing
+
+        Only wrap callbacks while capturing, so that they cost nothing otherwise."""
+
+        name = callback.__name__
+
+        def timed_callback(*args):
+            if not self.capturing:
+                return callback(*args)
+
+            start = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                end = time.perf_counter()
+                self.__callback_times.setdefault(name, []).append((start - self.__start, end - start))
+                self.__callback_threads.setdefault(threading.get_ident(), "obs timers")
+
+        timed_callback.__name__ = name
+        return timed_callback
+
+    def __capture(self, duration: float, get_threads: callable):
+        """Sample stacks and memory until the capture time is up or we are stopped, then write the profile (runs in the sampler thread)"""
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        first_snapshot = tracemalloc.take_snapshot()
+        own_thread = threading.get_ident()
+
+        deadline = time.perf_counter() + duration
+        last_memory_sample = 0
+        while not self.__stop_event.wait(self.sample_interval) and (now := time.perf_counter()) < deadline:
+            self.__sample_stacks({**self.__callback_threads, **get_threads()}, own_thread)
+            if now - last_memory_sample >= 1:
+                last_memory_sample = now
+                self.__memory.append([round(now - self.__start, 3), tracemalloc.get_traced_memory()[0]])
+
+        last_snapshot = tracemalloc.take_snapshot()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+
+        # Leave out tracemalloc's own bookkeeping, our sampling shows up though
+        own_traces = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        self.__write(
+            time.perf_counter() - self.__start,
+            last_snapshot.filter_traces(own_traces).compare_to(first_snapshot.filter_traces(own_traces), "lineno")[:PROFILE_TOP_ENTRIES],
+            peak_memory,
+            )
+        self.capturing = False
+
+    def __sample_stacks(self, threads: dict, own_thread: int):
+        """Count the current Python stack of each thread we follow (runs in the sampler thread)"""
+        frames = sys._current_frames()
+        for ident, label in threads.items():
+            frame = frames.get(ident)
+
+            # Not running Python code right now, e.g. OBS is rendering
+            if frame is None or ident == own_thread:
+                continue
+
+            stack = []
+            while frame and len(stack) < PROFILE_STACK_DEPTH:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.__stacks[";".join([label] + stack[::-1])] += 1
+
+    def __write(self, elapsed: float, allocation_growth: list, peak_memory: int):
+        """Write the capture to a new profile file"""
+        callbacks = {}
+        for name, times in tuple(self.__callback_times.items()):
+            durations = sorted(duration for _, duration in times)
+            callbacks[name] = {
+                "calls": len(durations),
+                "total": sum(durations),
+                "mean": sum(durations) / len(durations),
+                "p50": durations[len(durations) // 2],
+                "p99": durations[min(len(durations) - 1, int(len(durations) * 0.99))],
+                "max": durations[-1],
+                "slowest": sorted(times, key=lambda entry: entry[1], reverse=True)[:PROFILE_TOP_ENTRIES],
+                }
+
+        profile = {
+            "started": time.time() - elapsed,
+            "duration": elapsed,
+            "sample_interval": self.sample_interval,
+            "callbacks": callbacks,
+            "stacks": dict(self.__stacks.most_common()),
+            "memory": {
+                "traced": self.__memory,
+                "peak": peak_memory,
+                "growth": [
+                    {"where": str(stat.traceback[0]), "size_diff": stat.size_diff, "count_diff": stat.count_diff, "size": stat.size}
+                    for stat in allocation_growth
+                    ],
+                },
+            }
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S.json"))
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(profile, f, indent=1)
+        except OSError as e:
+            print(f"ERROR: Could not write profile: {e}")
+            return
+        print("Profile written to", self.path)
+
+
+def chat_stream_socket(chat) -> socket.socket | None:
+    """Find the socket under a Cocorum chat's SSE stream
+
+    Args:
+        chat (cocorum.chatapi.ChatAPI): The open chat.
+
+    Returns:
+        Socket (socket.socket | None): The socket, or None if we could not find it."""
+
+    client = getattr(chat, "client", None)
+
+    # sseclient-py keeps the requests response as the event source, sseclient as resp
+    response = getattr(client, "_event_source", None)
+    if response is None:
+        response = getattr(client, "resp", None)
+    raw = getattr(response, "raw", None)
+
+    # urllib3 2.x keeps its connection, older versions only the http.client response
+    for path in (("_connection", "sock"), ("_fp", "fp", "raw", "_sock")):
+        found = raw
+        for attribute in path:
+            found = getattr(found, attribute, None)
+        if found is not None:
+            return found
+    return None
+
+
+def interrupt_chat_stream(chat):
+    """End a blocking read on a chat stream from another thread, without waiting for the read
+
+    Args:
+        chat (cocorum.chatapi.ChatAPI): The open chat."""
+
+    if (sock := chat_stream_socket(chat)) is None:
+        print("WARNING: Could not find the chat stream socket to interrupt.")
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+
+    # The socket is already closed or disconnected
+    except OSError:
+        pass
+
+
+def close_chat_stream(chat):
+    """Close a chat stream, from the thread that reads it
+
+    Closing waits for any read in progress, so another thread should interrupt the stream instead.
+
+    Args:
+        chat (cocorum.chatapi.ChatAPI): The open chat."""
+
+    try:
+        chat.client.close()
+
+    # The stream is already closed or was never fully opened
+    except (AttributeError, OSError) as e:
+        print("Could not close chat stream:", e)
+
+
+class ChatAlertReceiver(threading.Thread):
+    """Connect to a Rumble chat, and push message alerts from it to queues, reconnecting if it drops"""
+
+    def __init__(
+        self,
+        stream_id: int | str,
+        queue_alertable: callable,
+        seen_alerts: SeenAlertStore = None,
+        recorder: TrafficRecorder = None,
+        metrics: PipelineMetrics = None,
+            ):
+        """
+        Connect to a Rumble chat, and push alerts from it to queues
+
+        Args:
+            stream_id (int | str): The numeric ID of the stream to connect to.
+            queue_alertable (callable): Called with the alert name and the
+                message for every alert-worthy message.
+            seen_alerts (SeenAlertStore): Alerts we already queued, to catch up
+                on a stream we were reading before a restart.
+                Defaults to None, skip messages from before we connected.
+            recorder (TrafficRecorder): Where to record the raw chat events, when it is recording.
+                Defaults to None, never record.
+            metrics (PipelineMetrics): Where to count the raw chat events.
+                Defaults to None, do not count them."""
+
+        super().__init__(daemon=True)
+
+        self.stream_id = stream_id
+        self.chat = None
+        self.queue_alertable = queue_alertable
+        self.seen_alerts = seen_alerts
+        self.recorder = recorder
+        self.metrics = metrics
+
+        # The ID of the newest message we have seen, to resume from after reconnecting
+        self.last_message_id = None
+
+        # How many raw chat events we got, and how many we skipped without parsing
+        self.events_received = 0
+        self.events_skipped = 0
+
+        # Set while the chat hands us the messages from before we connected, to skip
+        self.__skipping_history = False
+
+        # Connection health
+        self.reconnects = 0
+        self.__downtime = 0.0
+        self.__down_since = None
+        self.__reconnect_delay = CHAT_RECONNECT_DELAY_MIN
+
+        # Thread-safe killswitch, also wakes us from waiting to reconnect
+        self.__stop_event = threading.Event()
+
+        # Set when the connection attempt in progress finishes, or we are stopped
+        self.__connecting = None
+
+    @property
+    def running(self):
+        """Are we still supposed to be receiving?"""
+        return not self.__stop_event.is_set()
+
+    @property
+    def downtime(self) -> float:
+        """Total seconds spent disconnected after first connecting, including now"""
+        if self.__down_since is None:
+            return self.__downtime
+        return self.__downtime + time.monotonic() - self.__down_since
+
+    def stop(self):
+        """Stop receiving, interrupting a blocking read or connection attempt
+
+        The receiver thread closes its own chat stream, so this never waits on it."""
+
+        self.__stop_event.set()
+        if connecting := self.__connecting:
+            connecting.set()
+        if chat := self.chat:
+            interrupt_chat_stream(chat)
+
+    def shutdown(self, timeout: float = THREAD_SHUTDOWN_TIMEOUT) -> bool:
+        """Stop receiving and wait for the thread to finish
+
+        Args:
+            timeout (float): How long to wait, in seconds.
+                Defaults to THREAD_SHUTDOWN_TIMEOUT.
+
+        Returns:
+            Finished (bool): False if the thread is still running after the timeout."""
+
+        self.stop()
+        if self.is_alive():
+            self.join(timeout)
+        if self.is_alive():
+            print(f"WARNING: Chat {self.stream_id} receiver did not stop within {timeout} seconds.")
+            return False
+        return True
+
+    def connect(self) -> bool:
+        """Connect (or reconnect) to the chat
+
+        Returns:
+            Success (bool): Did we connect?"""
+
+        chat = self.open_chat()
+
+        # Could not connect, we will try again later
+        if isinstance(chat, Exception):
+            print("Chat", self.stream_id, "could not connect:", chat)
+            return False
+
+        # We were stopped while connecting, or gave up
+        if chat is None:
+            return False
+
+        # First connection, or we have no idea where we left off: skip messages from before we connected,
+        # remembering their alerts as seen so that catching up later does not bring them back,
+        # unless we were reading this stream before a restart, then the seen alerts store drops what we already had
+        self.__skipping_history = False
+        if self.last_message_id is None:
+            if self.seen_alerts and not self.seen_alerts.add("stream", cocorum.utils.ensure_b36(self.stream_id)):
+                print("Catching up on chat", self.stream_id)
+            elif self.seen_alerts:
+                self.__skipping_history = True
+            else:
+                chat.clear_mailbox()
+
+        # Most chat messages are not alerts, so do not let Cocorum parse those at all
+        chat.event_generator = self.prefilter_events(chat.event_generator)
+
+        self.chat = chat
+
+        # We were stopped while connecting, run() closes the stream on the way out
+        if not self.running:
+            return False
+
+        # We are back after a drop
+        if self.__down_since is not None:
+            downtime = time.monotonic() - self.__down_since
+            self.__downtime += downtime
+            self.reconnects += 1
+            self.__down_since = None
+            print(f"Chat {self.stream_id} reconnected after {downtime:.1f} seconds ({self.reconnects} reconnects so far).")
+
+        self.__reconnect_delay = CHAT_RECONNECT_DELAY_MIN
+        return True
+
+    def open_chat(self):
+        """Open the chat API on a helper thread, so that stopping never waits on a slow server
+
+        The chat API sets no timeout of its own. If we stop or give up first,
+        the helper closes the chat whenever it does open.
+
+        Returns:
+            Chat (cocorum.chatapi.ChatAPI | Exception | None): The open chat,
+                the error it failed with, or None if we stopped or gave up first."""
+
+        connecting = threading.Event()
+        lock = threading.Lock()
+        attempt = {"abandoned": False}
+
+        def open_in_background():
+            """Open the chat, and hand it over or close it if nobody wants it any more"""
+            try:
+                result = cocorum.chatapi.ChatAPI(self.stream_id)
+            except (AssertionError, ValueError, KeyError, cocorum.requests.exceptions.RequestException) as e:
+                result = e
+
+            with lock:
+                if not attempt["abandoned"]:
+                    attempt["result"] = result
+                    connecting.set()
+                    return
+            if not isinstance(result, Exception):
+                close_chat_stream(result)
+
+        self.__connecting = connecting
+        threading.Thread(target=open_in_background, daemon=True, name=f"chat {self.stream_id} connect").start()
+        if self.running:
+            connecting.wait(HTTP_TIMEOUT)
+        self.__connecting = None
+
+        with lock:
+            if "result" in attempt:
+                return attempt["result"]
+            attempt["abandoned"] = True
+
+        if self.running:
+            print(f"Chat {self.stream_id} did not connect within {HTTP_TIMEOUT} seconds.")
+        return None
+
+    def prefilter_events(self, events):
+        """Pass on only the raw chat SSE events that could hold an alert
+
+        Args:
+            events (iterator): Raw SSE events, with the event data in their data attribute.
+
+        Returns:
+            Events (generator): The events worth parsing."""
+
+        # Cocorum only reads new events once it has handed over the messages from before we connected
+        self.__skipping_history = False
+
+        for event in events:
+            self.events_received += 1
+            if self.metrics:
+                self.metrics.count_chat_event("livestream", event.data)
+            if self.recorder:
+                self.recorder.record("chat", cocorum.utils.ensure_b36(self.stream_id), event.data)
+            if event.data and not chat_event_may_alert(event.data):
+                self.events_skipped += 1
+                continue
+            yield event
+
+    def disconnected(self):
+        """Note that the chat dropped, and wait before we try to reconnect"""
+        if chat := self.chat:
+            self.chat = None
+            close_chat_stream(chat)
+        if self.__down_since is None:
+            self.__down_since = time.monotonic()
+
+        print(f"Chat {self.stream_id} will reconnect in {self.__reconnect_delay} seconds.")
+        self.__stop_event.wait(self.__reconnect_delay)
+        self.__reconnect_delay = min(self.__reconnect_delay * 2, CHAT_RECONNECT_DELAY_MAX)
+
+    def run(self):
+        """The threaded code"""
+        try:
+            self.receive()
+
+        # Only this thread reads the stream, so only it may close it without waiting
+        finally:
+            if chat := self.chat:
+                self.chat = None
+                close_chat_stream(chat)
+
+    def receive(self):
+        """Receive chat messages and queue alerts from them until stopped"""
+        while self.running:
+            if not self.chat and not self.connect():
+                if self.running:
+                    self.disconnected()
+                continue
+
+            try:
+                message = self.chat.get_message()
+
+            # Closing the stream under a blocking read can raise about anything
+            except Exception as e:
+                if not self.running:
+                    break
+                print("Chat", self.stream_id, "failed:", e)
+                message = None
+
+            # We were stopped while waiting for this message
+            if not self.running:
+                break
+
+            # The chat closed or dropped, try to get it back
+            if not message:
+                print("Chat", self.stream_id, "closed.")
+                self.disconnected()
+                continue
+
+            # We already saw this message before reconnecting
+            if self.last_message_id is not None and message.message_id <= self.last_message_id:
+                continue
+            self.last_message_id = message.message_id
+
+            if not (name := classify_message(message)):
+                continue
+
+            # The message is from before we connected, so we only remember that we saw it
+            if self.__skipping_history:
+                self.seen_alerts.add(name, AlertRecord.from_message(message).alert_id)
+                continue
+
+            self.queue_alertable(name, AlertRecord.from_message(message))
+
+
+def is_stream_id(stream_id: int | str) -> bool:
+    """Is this a stream ID we can read the chat of, an integer or a base 36 string?
+
+    Args:
+        stream_id (int | str): The stream ID.
+
+    Returns:
+        Valid (bool): Can we use it?"""
+
+    if isinstance(stream_id, int):
+        return stream_id >= 0
+    return isinstance(stream_id, str) and bool(re.fullmatch(STREAM_ID_PATTERN, stream_id.lower()))
+
+
+def classify_message(message) -> str | None:
+    """Decide what kind of alert a Cocorum chat message is for, if any
+
+    Args:
+        message (cocorum.chatapi.Message): The chat message.
+
+    Returns:
+        Name (str | None): The alert name, or None for an ordinary message."""
+
+    if message.is_rant:
+        return "rant"
+    if message.raid_notification:
+        return "raid"
+    if message.gift_purchase_notification:
+        return "gift"
+    return None
+
+
+def classify_chat_message(jsondata: dict) -> str | None:
+    """Decide what kind of alert a raw chat message JSON is for, if any
+
+    Args:
+        jsondata (dict): The JSON data block for one message from the chat SSE.
+
+    Returns:
+        Name (str | None): The alert name, or None for an ordinary message."""
+
+    if "rant" in jsondata:
+        return "rant"
+    if jsondata.get("raid_notification"):
+        return "raid"
+    if jsondata.get("gift_purchase_notification"):
+        return "gift"
+    return None
+
+
+class AsyncChatIngestor(threading.Thread):
+    """Read many Rumble chats at once on one asyncio event loop, and push message alerts from them to queues"""
+
+    def __init__(
+        self,
+        queue_alertable: callable,
+        sse_url_format: str = None,
+        seen_alerts: SeenAlertStore = None,
+        recorder: TrafficRecorder = None,
+        metrics: PipelineMetrics = None,
+            ):
+        """
+        Read many Rumble chats at once on one asyncio event loop
+
+        Args:
+            queue_alertable (callable): Called with the alert name and the
+                message for every alert-worthy message.
+            sse_url_format (str): The chat SSE URL, to format with stream_id_b10.
+                Defaults to Rumble's, pass a local one to test against a fake server.
+            seen_alerts (SeenAlertStore): Alerts we already queued, to catch up
+                on streams we were reading before a restart.
+                Defaults to None, skip messages from before we connected.
+            recorder (TrafficRecorder): Where to record the raw chat events, when it is recording.
+                Defaults to None, never record.
+            metrics (PipelineMetrics): Where to count the raw chat events.
+                Defaults to None, do not count them."""
+
+        super().__init__(daemon=True)
+
+        self.queue_alertable = queue_alertable
+        self.seen_alerts = seen_alerts
+        self.recorder = recorder
+        self.metrics = metrics
+        self.sse_url_format = sse_url_format or cocorum.static.URI.ChatAPI.sse_stream
+
+        self.loop = asyncio.new_event_loop()
+        self.__tasks = {}  # Stream ID in base 10: reader task
+
+        # Stream ID in base 10: connection health and where we left off
+        self.stream_stats = {}
+
+    def run(self):
+        """The threaded code"""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            # Let the readers finish cancelling before we close up
+            tasks = tuple(self.__tasks.values())
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def set_streams(self, stream_ids: list):
+        """Read exactly these chats from now on (thread-safe)
+
+        Args:
+            stream_ids (list): Stream IDs, in base 36 or as integers.
+                Invalid ones are skipped."""
+
+        stream_ids_b10 = set()
+        for stream_id in stream_ids:
+            if not is_stream_id(stream_id):
+                print(f"ERROR: Skipping invalid chat stream ID {stream_id!r}")
+                continue
+            if isinstance(stream_id, str):
+                stream_id = stream_id.lower()
+            stream_ids_b10.add(cocorum.utils.base_36_to_10(cocorum.utils.ensure_b36(stream_id)))
+        self.loop.call_soon_threadsafe(self.__set_streams, stream_ids_b10)
+
+    def __set_streams(self, stream_ids_b10: set):
+        """Start and cancel readers to match a set of stream IDs (runs in the loop)"""
+        for stream_id_b10 in tuple(self.__tasks):
+            if stream_id_b10 not in stream_ids_b10:
+                print("Chat", stream_id_b10, "no longer wanted, closing.")
+                self.__tasks.pop(stream_id_b10).cancel()
+                self.stream_stats.pop(stream_id_b10, None)
+
+        for stream_id_b10 in stream_ids_b10:
+            if stream_id_b10 not in self.__tasks:
+                self.__tasks[stream_id_b10] = self.loop.create_task(self.__read_stream(stream_id_b10))
+
+    def stop(self):
+        """Close all chats and stop the event loop, without waiting (thread-safe)"""
+        self.loop.call_soon_threadsafe(self.__stop)
+
+    def __stop(self):
+        """Cancel all readers and stop the event loop (runs in the loop)"""
+        for task in self.__tasks.values():
+            task.cancel()
+        self.loop.stop()
+
+    def shutdown(self, timeout: float = THREAD_SHUTDOWN_TIMEOUT) -> bool:
+        """Close all chats and wait for the thread to finish
+
+        Args:
+            timeout (float): How long to wait, in seconds.
+                Defaults to THREAD_SHUTDOWN_TIMEOUT.
+
+        Returns:
+            Finished (bool): False if the thread is still running after the timeout."""
+
+        self.stop()
+        if self.is_alive():
+            self.join(timeout)
+        if self.is_alive():
+            print(f"WARNING: Chat ingestor did not stop within {timeout} seconds.")
+            return False
+        return True
+
+    async def __read_stream(self, stream_id_b10: int):
+        """Keep reading a chat, reconnecting with backoff whenever it drops"""
+        stats = self.stream_stats[stream_id_b10] = {
+            "connected": False,
+            "reconnects": 0,
+            "last_message_id": None,
+            }
+        users = {}  # User ID: username
+        reconnect_delay = CHAT_RECONNECT_DELAY_MIN
+
+        while True:
+            try:
+                async for jsondata in self.__iter_events(self.sse_url_format.format(stream_id_b10=stream_id_b10), stream_id_b10):
+                    if not stats["connected"]:
+                        stats["connected"] = True
+                        reconnect_delay = CHAT_RECONNECT_DELAY_MIN
+                    self.__handle_event(stream_id_b10, jsondata, users, stats)
+                print("Chat", stream_id_b10, "closed.")
+
+            # Bad data can raise about anything, and that must not end this stream's task for good
+            except Exception as e:
+                print("Chat", stream_id_b10, "failed:", e)
+
+            # Try to get it back
+            if stats["connected"]:
+                stats["connected"] = False
+                stats["reconnects"] += 1
+            print(f"Chat {stream_id_b10} will reconnect in {reconnect_delay} seconds.")
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, CHAT_RECONNECT_DELAY_MAX)
+
+    def __handle_event(self, stream_id_b10: int, jsondata: dict, users: dict, stats: dict):
+        """Queue alerts for any new alert-worthy messages in a chat SSE event"""
+        if jsondata.get("type") not in ("init", "messages"):
+            return
+
+        data = jsondata.get("data", {})
+        for user_json in data.get("users", []):
+            users[int(user_json["id"])] = user_json.get("username")
+
+        messages = data.get("messages", [])
+
+        # First connection: skip messages from before we connected, but remember where they end
+        # and that we saw their alerts, so that catching up later does not bring them back,
+        # unless we were reading this stream before a restart, then the seen alerts store drops what we already had
+        if jsondata["type"] == "init" and stats["last_message_id"] is None:
+            if self.seen_alerts and not self.seen_alerts.add("stream", cocorum.utils.base_10_to_36(stream_id_b10)):
+                print("Catching up on chat", stream_id_b10)
+            else:
+                if self.seen_alerts:
+                    for message_json in messages:
+                        if name := classify_chat_message(message_json):
+                            self.seen_alerts.add(name, str(message_json["id"]))
+                stats["last_message_id"] = max((int(m["id"]) for m in messages), default=None)
+                return
+
+        for message_json in messages:
+            message_id = int(message_json["id"])
+
+            # We already saw this message before reconnecting
+            if stats["last_message_id"] is not None and message_id <= stats["last_message_id"]:
+                continue
+            stats["last_message_id"] = message_id
+
+            if name := classify_chat_message(message_json):
+                username = users.get(int(message_json.get("user_id", 0)), "")
+                self.queue_alertable(name, AlertRecord.from_message_json(message_json, username))
+
+    async def __iter_events(self, url: str, stream_id_b10: int):
+        """Connect to a chat's SSE URL and yield the JSON of each event"""
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        reader, writer = await asyncio.open_connection(
+            parts.hostname,
+            parts.port or (443 if secure else 80),
+            ssl=ssl.create_default_context() if secure else None,
+            )
+
+        try:
+            path = parts.path + ("?" + parts.query if parts.query else "")
+            headers = {
+                "Host": parts.netloc,
+                "Connection": "keep-alive",
+                "Cache-Control": "no-cache",
+                **cocorum.static.RequestHeaders.user_agent,
+                **cocorum.static.RequestHeaders.sse_api,
+                }
+            writer.write(
+                f"GET {path} HTTP/1.1\r\n".encode()
+                + "".join(f"{key}: {value}\r\n" for key, value in headers.items()).encode()
+                + b"\r\n"
+                )
+            await writer.drain()
+
+            # Status line and headers
+            status_line = await reader.readline()
+            if b" 200" not in status_line:
+                raise ValueError(f"Chat SSE answered {status_line.decode(errors='replace').strip()}")
+            chunked = False
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                if line.lower().startswith(b"transfer-encoding:") and b"chunked" in line.lower():
+                    chunked = True
+
+            # Server-sent events are separated by blank lines, and we only care about their data
+            buffer = b""
+            data_lines = []
+            async for chunk in self.__iter_body(reader, chunked):
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    line = line.rstrip(b"\r")
+                    if line.startswith(b"data:"):
+                        data_lines.append(line[5:].removeprefix(b" "))
+                    elif not line and data_lines:
+                        data = b"\n".join(data_lines).decode(errors="replace")
+                        data_lines = []
+                        if self.metrics:
+                            self.metrics.count_chat_event("extra", data)
+                        if self.recorder:
+                            self.recorder.record("sse", cocorum.utils.base_10_to_36(stream_id_b10), data)
+
+                        # Do not bother parsing ordinary messages
+                        if not chat_event_may_alert(data):
+                            continue
+                        try:
+                            yield json.loads(data)
+                        except ValueError:
+                            print("Could not parse chat SSE data:", data[:100])
+
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __iter_body(reader: asyncio.StreamReader, chunked: bool):
+        """Yield the body of an HTTP response as it arrives"""
+        if not chunked:
+            while chunk := await reader.read(65536):
+                yield chunk
+            return
+
+        while size_line := await reader.readline():
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if not size:
+                return
+            yield await reader.readexactly(size)
+            await reader.readline()  # The CRLF after each chunk
+
+
+class HTTPConnectionPool():
+    """Keep-alive HTTP connections shared by all our API requests, by host (thread-safe)"""
+
+    def __init__(self, max_idle_per_host: int = HTTP_POOL_MAX_IDLE, timeout: float = HTTP_TIMEOUT):
+        """
+        Keep-alive HTTP connections shared by all our API requests
+
+        Args:
+            max_idle_per_host (int): How many unused connections to keep open to each host.
+                Defaults to HTTP_POOL_MAX_IDLE.
+            timeout (float): How long to wait on a request, in seconds.
+                Defaults to HTTP_TIMEOUT."""
+
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.__idle = {}  # (scheme, host, port): [connection, ...]
+        self.__active = 0  # Connections currently out for a request
+        self.__lock = threading.Lock()
+
+        # Statistics
+        self.connections_opened = 0
+        self.requests_sent = 0  # Requests that got a response
+        self.requests_reused = 0  # Of those, ones that went over an already open connection
+
+    @property
+    def open_connections(self) -> int:
+        """How many connections we have open, idle or in use"""
+        with self.__lock:
+            return self.__active + sum(len(connections) for connections in self.__idle.values())
+
+    @property
+    def reuse_ratio(self) -> float:
+        """The fraction of requests that did not need a new connection"""
+        if not self.requests_sent:
+            return 0.0
+        return self.requests_reused / self.requests_sent
+
+    def get_stats(self) -> dict:
+        """Get how many connections we have and how well they are being reused"""
+        return {
+            "open_connections": self.open_connections,
+            "connections_opened": self.connections_opened,
+            "requests_sent": self.requests_sent,
+            "reuse_ratio": self.reuse_ratio,
+            }
+
+    def get(self, url: str, headers: dict = None) -> tuple[int, bytes]:
+        """Make a GET request over a pooled connection
+
+        Args:
+            url (str): The HTTP or HTTPS URL to get.
+            headers (dict): Extra request headers.
+                Defaults to None.
+
+        Returns:
+            Status (int): The HTTP status code.
+            Body (bytes): The response body.
+
+        Raises:
+            ValueError: The URL is not HTTP or HTTPS, or has no host name."""
+
+        # Do not put the URL itself in the error, it may hold an API key
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"URL must start with http:// or https://, not {parts.scheme or 'nothing'}")
+        if not parts.hostname:
+            raise ValueError("URL has no host name")
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+
+        # A reused connection may have been closed by the server while idle, so retry those once on a fresh one
+        fresh = False
+        while True:
+            connection, reused = self.__acquire(key, fresh)
+            try:
+                connection.request("GET", path or "/", headers=headers or {})
+                response = connection.getresponse()
+                body = response.read()
+
+            except (http.client.HTTPException, OSError):
+                self.__release(key, connection, keep=False)
+                if reused and not fresh:
+                    fresh = True
+                    continue
+                raise
+
+            with self.__lock:
+                self.requests_sent += 1
+                self.requests_reused += reused
+            self.__release(key, connection, keep=not response.will_close)
+            return response.status, body
+
+    def __acquire(self, key: tuple, fresh: bool = False) -> tuple[http.client.HTTPConnection, bool]:
+        """Take an idle connection to a host, or open a new one
+
+        Returns:
+            Connection (http.client.HTTPConnection): The connection to use.
+            Reused (bool): Was the connection already open?"""
+
+        with self.__lock:
+            self.__active += 1
+            idle = self.__idle.get(key)
+            if idle and not fresh:
+                return idle.pop(), True
+            self.connections_opened += 1
+
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=ssl.create_default_context()), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def __release(self, key: tuple, connection: http.client.HTTPConnection, keep: bool):
+        """Return a connection to the idle pool, or close it"""
+        with self.__lock:
+            self.__active -= 1
+            idle = self.__idle.setdefault(key, [])
+            if keep and len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """Close all idle connections"""
+        with self.__lock:
+            idle, self.__idle = self.__idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+# Cocorum only fetches with its own module-level requests.get, so we need our own refresh to use the pool
+if COCORUM_IMPORTED:
+    class PooledRumbleAPI(cocorum.RumbleAPI):
+        """Cocorum's Rumble Live Stream API wrapper, fetching over a shared connection pool"""
+
+        def __init__(
+            self,
+            api_url: str,
+            http_pool: HTTPConnectionPool,
+            refresh_rate: int = cocorum.static.Delays.api_refresh_default,
+            recorder: TrafficRecorder = None,
+                ):
+            """
+            Cocorum's Rumble Live Stream API wrapper, fetching over a shared connection pool
+
+            Args:
+                api_url (str): The Rumble API URL, with the key.
+                http_pool (HTTPConnectionPool): The connection pool to fetch over.
+                refresh_rate (int): How long to reuse queried data before refreshing.
+                    Defaults to Cocorum's default.
+                recorder (TrafficRecorder): Where to record the raw responses, when it is recording.
+                    Defaults to None, never record."""
+
+            # Setting the API URL refreshes, so we need the pool first
+            self.http_pool = http_pool
+            self.recorder = recorder
+            super().__init__(api_url, refresh_rate=refresh_rate)
+
+        def refresh(self):
+            """Reload data from the API, over the connection pool"""
+            self.last_refresh_time = time.time()
+            status, body = self.http_pool.get(self.api_url, cocorum.static.RequestHeaders.user_agent)
+            assert status == 200, "Status code " + str(status)
+            if self.recorder:
+                self.recorder.record("api", account_key(self.api_url), body.decode(errors="replace"))
+
+            self._jsondata = json.loads(body)
+
+            # Update Cocorum's private livestream records the same way it does
+            livestreams = self._RumbleAPI__livestreams
+            listed_ids = [jsondata["id"] for jsondata in self._jsondata["livestreams"]]
+            for stream_id in tuple(livestreams):
+                if stream_id not in listed_ids:
+                    livestreams.pop(stream_id).is_disappeared = True
+
+            for jsondata in self._jsondata["livestreams"]:
+                if jsondata["id"] in livestreams:
+                    livestreams[jsondata["id"]]._jsondata = jsondata
+                else:
+                    livestreams[jsondata["id"]] = cocorum.Livestream(jsondata, self)
+
+
+class RLSAPIPoller(threading.Thread):
+    """Poll the Rumble Live Stream API in the background, and push new alertables from it to queues"""
+
+    def __init__(
+        self,
+        api_url: str,
+        refresh_rate: int,
+        queue_alertable: callable,
+        adaptive: bool = False,
+        refresh_rate_idle: int = REFRESH_RATE_MAX,
+        http_pool: HTTPConnectionPool = None,
+        seen_alerts: SeenAlertStore = None,
+        recorder: TrafficRecorder = None,
+        metrics: PipelineMetrics = None,
+            ):
+        """
+        Poll the Rumble Live Stream API in the background
+
+        Args:
+            api_url (str): The RLS API URL, with the key.
+            refresh_rate (int): How long to wait between checks, in seconds.
+                When adapting, this is the fastest we will poll.
+            queue_alertable (callable): Called with the alert name and the
+                alertable for every new follower, subscriber, and chat alert.
+            adaptive (bool): Poll fast while followers and subscribers are
+                arriving on a live stream, and back off when it is quiet.
+                Defaults to False.
+            refresh_rate_idle (int): The slowest we will poll when adapting.
+                Defaults to REFRESH_RATE_MAX.
+            http_pool (HTTPConnectionPool): Keep-alive connections to share with other pollers.
+                Defaults to None, use a pool of our own.
+            seen_alerts (SeenAlertStore): Alerts we already queued, to catch up
+                on followers and subscribers we missed while not running.
+                Defaults to None, skip the ones from before we connected.
+            recorder (TrafficRecorder): Where to record API responses and chat events, when it is recording.
+                Defaults to None, never record.
+            metrics (PipelineMetrics): Where to time our checks and count chat events.
+                Defaults to None, do not."""
+
+        super().__init__(daemon=True)
+
+        self.api_url = api_url
+        self.http_pool = http_pool or HTTPConnectionPool()
+        self.seen_alerts = seen_alerts
+        self.recorder = recorder
+        self.metrics = metrics
+        self.refresh_rate = refresh_rate
+        self.queue_alertable = queue_alertable
+
+        # Adaptive polling
+        self.adaptive = adaptive
+        self.refresh_rate_idle = max(refresh_rate_idle, refresh_rate)
+        self.refresh_delay = refresh_rate
+
+        self.api = None
+        self.livestream = None
+        self.chat_alert_receiver = None
+
+        # Thread-safe killswitch, also wakes us from waiting between checks
+        self.__stop_event = threading.Event()
+
+    @property
+    def running(self):
+        """Are we still polling, and supposed to be?"""
+        return not self.__stop_event.is_set() and self.is_alive()
+
+    def stop(self):
+        """Stop polling and close the chat stream as soon as possible, without waiting"""
+        self.__stop_event.set()
+        if chat_alert_receiver := self.chat_alert_receiver:
+            chat_alert_receiver.stop()
+
+    def shutdown(self, timeout: float = THREAD_SHUTDOWN_TIMEOUT) -> bool:
+        """Stop polling and wait for us and our chat alert receiver to finish
+
+        Args:
+            timeout (float): How long to wait, in seconds.
+                Defaults to THREAD_SHUTDOWN_TIMEOUT.
+
+        Returns:
+            Finished (bool): False if the thread is still running after the timeout."""
+
+        self.stop()
+        if self.is_alive():
+            self.join(timeout)
+        if self.is_alive():
+            print(f"WARNING: RLS API poller did not stop within {timeout} seconds.")
+            return False
+        return True
+
+    def configure(self, refresh_rate: int, adaptive: bool, refresh_rate_idle: int):
+        """Change how we poll without reconnecting (see __init__ for arguments)"""
+        self.refresh_rate = refresh_rate
+        self.adaptive = adaptive
+        self.refresh_rate_idle = max(refresh_rate_idle, refresh_rate)
+        self.refresh_delay = refresh_rate
+        if self.api:
+            self.api.refresh_rate = refresh_rate
+
+    def run(self):
+        """The threaded code"""
+        while self.running:
+            start = time.perf_counter()
+            try:
+                had_activity = self.check_main_rls_api()
+
+            # The API could not be reached, try again next time
+            except (AssertionError, ValueError, KeyError, OSError, http.client.HTTPException) as e:
+                print(f"API connection failed: {e}")
+                had_activity = False
+                if self.metrics:
+                    self.metrics.api_poll_failures += 1
+
+            # Something we did not expect, but one bad check must not end polling for good
+            except Exception as e:
+                print(f"ERROR: API check failed: {e!r}")
+                had_activity = False
+                if self.metrics:
+                    self.metrics.api_poll_failures += 1
+
+            if self.metrics:
+                self.metrics.api_poll_duration.observe(time.perf_counter() - start)
+
+            self.__stop_event.wait(self.get_refresh_delay(had_activity))
+
+        self.abandon_chat_alert_receiver()
+
+    def get_refresh_delay(self, had_activity: bool) -> float:
+        """Decide how long to wait before the next check
+
+        Args:
+            had_activity (bool): Did the last check find new followers or subscribers?
+
+        Returns:
+            Delay (float): Seconds to wait, between refresh_rate and refresh_rate_idle when adapting."""
+
+        if not self.adaptive:
+            return self.refresh_rate
+
+        # Alertables are arriving, poll as fast as we are allowed to
+        if had_activity:
+            self.refresh_delay = self.refresh_rate
+
+        # Nobody is watching a stream, so nothing much will happen
+        elif not self.livestream:
+            self.refresh_delay = self.refresh_rate_idle
+
+        # The stream is quiet, back off gradually
+        else:
+            self.refresh_delay = min(self.refresh_delay * REFRESH_BACKOFF, self.refresh_rate_idle)
+
+        # Spread out our requests a bit, but stay within our limits
+        jittered = self.refresh_delay * random.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER)
+        return min(max(jittered, self.refresh_rate), self.refresh_rate_idle)
+
+    def connect(self):
+        """Create the Cocorum API object and clear its stale alertables"""
+        print("Creating new Cocorum API object")
+        self.api = PooledRumbleAPI(self.api_url, self.http_pool, refresh_rate=self.refresh_rate, recorder=self.recorder)
+
+        # Clear these mailboxes
+        print("Stale new followers: ", self.api.new_followers)
+        print("Stale new subscribers: ", self.api.new_subscribers)
+
+        if not self.seen_alerts:
+            return
+
+        followers = sorted(self.api.recent_followers, key=lambda follower: follower.followed_on)
+        subscribers = sorted(self.api.recent_subscribers, key=lambda subscriber: subscriber.subscribed_on)
+
+        # We polled this account before a restart, so alert for anyone we missed while not running
+        if not self.seen_alerts.add("account", account_key(self.api_url)):
+            print("Catching up on followers and subscribers")
+            for follower in followers:
+                self.queue_alertable("follower", AlertRecord.from_follower(follower))
+            for subscriber in subscribers:
+                self.queue_alertable("subscriber", AlertRecord.from_subscriber(subscriber))
+            return
+
+        # New account, only remember who was already there
+        for follower in followers:
+            self.seen_alerts.add("follower", AlertRecord.from_follower(follower).alert_id)
+        for subscriber in subscribers:
+            self.seen_alerts.add("subscriber", AlertRecord.from_subscriber(subscriber).alert_id)
+
+    def abandon_chat_alert_receiver(self):
+        """If we have a chat alert receiver, shut it down, and remove its reference"""
+        if chat_alert_receiver := self.chat_alert_receiver:
+            self.chat_alert_receiver = None
+            chat_alert_receiver.shutdown()
+
+    def check_main_rls_api(self) -> bool:
+        """Check if there are any new alertables in the main RLS API and add them to the inboxes
+
+        Returns:
+            Activity (bool): Were there any new followers or subscribers?"""
+
+        print("Checking main RLS API")
+        if not self.api:
+            self.connect()
+
+        # Do all the network requests before handing anything over
+        # We never check sooner than the API refresh rate, so this is one request per check
+        self.api.check_refresh()
+        new_followers = self.api.new_followers
+        new_subscribers = self.api.new_subscribers
+
+        # We were stopped while waiting on the API
+        if not self.running:
+            return False
+
+        for new_follower in new_followers:
+            self.queue_alertable("follower", AlertRecord.from_follower(new_follower))
+
+        for new_subscriber in new_subscribers:
+            self.queue_alertable("subscriber", AlertRecord.from_subscriber(new_subscriber))
+
+        # Livestream change handler
+        # Current stream is no longer live
+        if self.livestream and self.livestream.is_disappeared:
+            print("Livestream shut down.")
+            self.livestream = None
+            self.abandon_chat_alert_receiver()
+
+        # Other cases
+        """
+        We have a livestream and it is live: Even if there is a new one, stay here.
+        We do not have a livestream and there is no new one. Do nothing.
+        """
+
+        # Our chat alert receiver died on us, start another
+        if self.livestream and not (self.chat_alert_receiver and self.chat_alert_receiver.is_alive()):
+            print("Chat alert receiver is gone, restarting it.")
+            self.livestream = None
+            self.abandon_chat_alert_receiver()
+
+        # We have no livestream [anymore] and there is one live
+        if not self.livestream and (new := self.api.latest_livestream):
+            self.livestream = new
+            print("New livestream:", self.livestream.title)
+            self.chat_alert_receiver = ChatAlertReceiver(
+                self.livestream.stream_id,
+                self.queue_alertable,
+                seen_alerts=self.seen_alerts,
+                recorder=self.recorder,
+                metrics=self.metrics,
+                )
+            self.chat_alert_receiver.start()
+
+        # There is a livestream, so it may have new rants
+        # Handle this in the chat alert receiver instead
+        # for new_rant in self.livestream.chat.new_rants:
+        #     self.rant_inbox.put(new_rant)
+
+        return bool(new_followers or new_subscribers)
 
-try:
-    import cocorum
-    print("Cocorum successfully imported.")
-    COCORUM_IMPORTED = True
-except ModuleNotFoundError:
-    print("ERROR: You must install the Python library 'cocorum' to use this script.")
-    COCORUM_IMPORTED = False
 
-SCRIPT_DESCRIPTION = """
-<center>
-<h1>Rumble Live Alerts PY</h1>
-<p>Emulate the behavior of RumBot 4.5 and under, without WebSocket</p>
-</center>
-"""
+class SourceHandleCache():
+    """Referenced OBS sources and reusable settings objects, by source name"""
 
-MAX_ALERT_TIME = 6000  # Maximum for how long an alert can be displayed
+    def __init__(self):
+        """Referenced OBS sources and reusable settings objects, by source name"""
+        self.__handles = {}  # Source name: (source, settings data)
+        self.__lock = threading.Lock()
+        self.__signals_connected = False
+
+    def connect_signals(self):
+        """Invalidate our handles when OBS removes or renames a source"""
+        if self.__signals_connected:
+            return
+        self.__signals_connected = True
+        signal_handler = obs.obs_get_signal_handler()
+        obs.signal_handler_connect(signal_handler, "source_remove", self.on_source_remove)
+        obs.signal_handler_connect(signal_handler, "source_rename", self.on_source_rename)
+
+    def disconnect_signals(self):
+        """Stop listening for OBS source signals"""
+        if not self.__signals_connected:
+            return
+        self.__signals_connected = False
+        signal_handler = obs.obs_get_signal_handler()
+        obs.signal_handler_disconnect(signal_handler, "source_remove", self.on_source_remove)
+        obs.signal_handler_disconnect(signal_handler, "source_rename", self.on_source_rename)
+
+    def on_source_remove(self, calldata):
+        """A source was removed in OBS"""
+        # Does not increment the reference, do not independently release
+        source = obs.calldata_source(calldata, "source")
+        self.invalidate(obs.obs_source_get_name(source))
+
+    def on_source_rename(self, calldata):
+        """A source was renamed in OBS"""
+        self.invalidate(obs.calldata_string(calldata, "prev_name"))
+
+    def __get_handles(self, source_name: str):
+        """Get the handles for a source name, looking them up if needed (must hold the lock)"""
+        if handles := self.__handles.get(source_name):
+            return handles
+
+        # Adds a reference, which we keep until invalidated
+        source = obs.obs_get_source_by_name(source_name)
+        if not source:
+            return None
+
+        handles = self.__handles[source_name] = (source, obs.obs_data_create())
+        return handles
+
+    def update_text(self, source_name: str, new_value: str) -> bool:
+        """Set the text of a source, unless it already shows that text
+
+        Returns:
+            Success (bool): False if there is no such source."""
+
+        return not self.update_texts({source_name: new_value})
+
+    def update_texts(self, source_texts: dict[str, str]) -> list[str]:
+        """Set the texts of several sources in one go, skipping any that already show that text
+
+        Returns:
+            Missing (list[str]): The names of any sources that could not be found."""
+
+        missing = []
+        with self.__lock:
+            for source_name, new_value in source_texts.items():
+                handles = self.__get_handles(source_name)
+                if not handles:
+                    missing.append(source_name)
+                    continue
+                source, setter_data = handles
+
+                # Every update makes OBS lay out and upload the text again, so only do changed ones
+                # Ask the source what it shows, as the user or another script may have edited it since we set it
+                current_data = obs.obs_source_get_settings(source)
+                unchanged = obs.obs_data_get_string(current_data, "text") == new_value
+                obs.obs_data_release(current_data)
+                if unchanged:
+                    continue
+
+                obs.obs_data_set_string(setter_data, "text", new_value)
+                obs.obs_source_update(source, setter_data)
+
+        return missing
+
+    def invalidate(self, source_name: str):
+        """Forget and release the handles for a source name, if we have them"""
+        with self.__lock:
+            handles = self.__handles.pop(source_name, None)
+        if handles:
+            self.__release(handles)
+
+    def clear(self):
+        """Forget and release all our handles"""
+        with self.__lock:
+            all_handles = tuple(self.__handles.values())
+            self.__handles.clear()
+        for handles in all_handles:
+            self.__release(handles)
+
+    @staticmethod
+    def __release(handles: tuple):
+        """Release a source and its settings data"""
+        source, setter_data = handles
+        obs.obs_data_release(setter_data)
+        obs.obs_source_release(source)
 
-# Minimum and maximum refresh rates to check the API again
-REFRESH_RATE_MIN = 10
-REFRESH_RATE_MAX = 300
 
+class SceneIndex():
+    """Index of OBS scenes, their items, and source types, kept current from OBS events"""
 
-class DefaultSettings:
-    """The default values for the various settings in the OBS UI"""
-    # Base settings
-    api_url = ""  # Rumble Live Stream API URL
-    refresh_rate = 10  # API refresh rate
+    def __init__(self):
+        """Index of OBS scenes, their items, and source types, kept current from OBS events"""
+        self.source_names_to_types = {}
+        self.scene_names_and_items = {}
 
-    # Settings for the follower alert
-    follower_alert_use = True
-    follower_alert_time = 10
-    follower_alert_uname_source = "Follower Username"
-    follower_alert_scene_source = "Follower Scene"
+        # Incremented on every change, so users of the index know when to look again
+        self.generation = 0
 
-    # Settings for the subscriber alert
-    subscriber_alert_use = True
-    subscriber_alert_time = 10
-    subscriber_alert_uname_source = "Subscriber Username"
-    subscriber_alert_amount_source = "Subscriber Amount Dollars"
-    subscriber_alert_scene_source = "Subscriber Scene"
+        # The index must be built from scratch before first use, or after a scene collection change
+        self.dirty = True
 
-    # Settings for the rant alert
-    rant_alert_use = True
-    rant_alert_time = 10
-    rant_alert_uname_source = "Rant Username"
-    rant_alert_message_source = "Rant Message"
-    rant_alert_amount_source = "Rant Amount Dollars"
-    rant_alert_scene_source = "Rant Scene"
+        self.__lock = threading.RLock()
+        self.__signals_connected = False
+        self.__item_signal_scenes = set()  # Names of scenes we listen to item signals on
 
-    # Settings for the raid alert
-    raid_alert_use = True
-    raid_alert_time = 10
-    raid_alert_uname_source = "Raid Username"
-    raid_alert_scene_source = "Raid Scene"
+        # Root scene name: {nested scene name: scene names from the root down to it}
+        self.__scene_paths = {}
+        self.__scene_paths_generation = None
 
-    # Settings for the gift alert
-    gift_alert_use = True
-    gift_alert_time = 10
-    gift_alert_uname_source = "Gift Username"
-    gift_alert_count_source = "Gift Count"
-    #gift_alert_amount_source = "Gift Amount Dollars"
-    gift_alert_scene_source = "Gift Scene"
+    @property
+    def subscene_names(self) -> list[str]:
+        """Names of scenes that are items in other scenes"""
+        with self.__lock:
+            return list(dict.fromkeys(
+                name
+                for item_names in self.scene_names_and_items.values()
+                for name in item_names
+                if name in self.scene_names_and_items
+                ))
 
+    def get_items(self, scene_name: str) -> list[str]:
+        """Get the names of the items in a scene"""
+        with self.__lock:
+            return list(self.scene_names_and_items.get(scene_name, []))
 
-class TestFollower:
-    """Follower dummy with the same attributes as a real one"""
-    username = "NOBODY"
+    def get_type(self, source_name: str, default: str = None) -> str:
+        """Get the unversioned type ID of a source"""
+        return self.source_names_to_types.get(source_name, default)
 
+    def has_scene(self, scene_name: str) -> bool:
+        """Do we have a record of a scene?"""
+        return scene_name in self.scene_names_and_items
 
-class TestSubscriber:
-    """Subscriber dummy with the same attributes as a real one"""
-    username = "NOBODY"
-    amount_cents = 316
+    def find_scene_path(self, root_scene: str, target_scene: str) -> tuple | None:
+        """Find how a scene is nested in another
 
+        Args:
+            root_scene (str): The name of the scene to look in.
+            target_scene (str): The name of the scene to look for.
+
+        Returns:
+            Path (tuple | None): Scene names from the root down to the target,
+                or None if the target is not in the root at any depth."""
+
+        with self.__lock:
+            # The graph changed, our paths may be wrong now
+            if self.__scene_paths_generation != self.generation:
+                self.__scene_paths.clear()
+                self.__scene_paths_generation = self.generation
+
+            if root_scene not in self.__scene_paths:
+                self.__scene_paths[root_scene] = self.__map_scene_paths(root_scene)
+
+            return self.__scene_paths[root_scene].get(target_scene)
+
+    def __map_scene_paths(self, root_scene: str) -> dict[str, tuple]:
+        """Find the shortest path to every scene nested in a root scene (must hold the lock)"""
+        paths = {root_scene: (root_scene,)}
+        to_visit = [root_scene]
+
+        # Breadth first, and never visiting a scene twice, so cycles can't trap us
+        while to_visit:
+            next_visit = []
+            for scene_name in to_visit:
+                for item_name in self.scene_names_and_items.get(scene_name, ()):
+                    if item_name in self.scene_names_and_items and item_name not in paths:
+                        paths[item_name] = paths[scene_name] + (item_name,)
+                        next_visit.append(item_name)
+            to_visit = next_visit
+
+        return paths
+
+    def connect_signals(self):
+        """Keep the index current from OBS frontend events and source signals"""
+        if self.__signals_connected:
+            return
+        self.__signals_connected = True
+        obs.obs_frontend_add_event_callback(self.on_frontend_event)
+        signal_handler = obs.obs_get_signal_handler()
+        obs.signal_handler_connect(signal_handler, "source_create", self.on_source_create)
+        obs.signal_handler_connect(signal_handler, "source_remove", self.on_source_remove)
+        obs.signal_handler_connect(signal_handler, "source_rename", self.on_source_rename)
+
+    def disconnect_signals(self):
+        """Stop listening to OBS events and signals"""
+        if not self.__signals_connected:
+            return
+        self.__signals_connected = False
+        obs.obs_frontend_remove_event_callback(self.on_frontend_event)
+        signal_handler = obs.obs_get_signal_handler()
+        obs.signal_handler_disconnect(signal_handler, "source_create", self.on_source_create)
+        obs.signal_handler_disconnect(signal_handler, "source_remove", self.on_source_remove)
+        obs.signal_handler_disconnect(signal_handler, "source_rename", self.on_source_rename)
+        with self.__lock:
+            for scene_name in tuple(self.__item_signal_scenes):
+                self.__disconnect_item_signals(scene_name)
+
+    def __connect_item_signals(self, scene_source):
+        """Listen for items being added to or removed from a scene (must hold the lock)"""
+        scene_name = obs.obs_source_get_name(scene_source)
+        if scene_name in self.__item_signal_scenes:
+            return
+        self.__item_signal_scenes.add(scene_name)
+        signal_handler = obs.obs_source_get_signal_handler(scene_source)
+        obs.signal_handler_connect(signal_handler, "item_add", self.on_item_add)
+        obs.signal_handler_connect(signal_handler, "item_remove", self.on_item_remove)
+
+    def __disconnect_item_signals(self, scene_name: str, scene_source=None):
+        """Stop listening for item changes in a scene (must hold the lock)"""
+        if scene_name not in self.__item_signal_scenes:
+            return
+        self.__item_signal_scenes.discard(scene_name)
 
-class TestRant:
-    """Rant dummy with the same attributes as a real one"""
-    class user:
-        """User dummy sub"""
-        username = "NOBODY"
-    rant_price_cents = 316
-    text = "Soli Deo gloria."
+        # The scene is already gone, and its signal handler with it
+        source = scene_source or obs.obs_get_source_by_name(scene_name)
+        if not source:
+            return
+        signal_handler = obs.obs_source_get_signal_handler(source)
+        obs.signal_handler_disconnect(signal_handler, "item_add", self.on_item_add)
+        obs.signal_handler_disconnect(signal_handler, "item_remove", self.on_item_remove)
+        if not scene_source:
+            obs.obs_source_release(source)
+
+    def __changed(self):
+        """Record that the index changed (must hold the lock)"""
+        self.generation += 1
+
+    def on_frontend_event(self, event):
+        """Handle OBS frontend events"""
+        # A whole new set of scenes, start over now rather than when next used
+        if event in (obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED, obs.OBS_FRONTEND_EVENT_FINISHED_LOADING):
+            with self.__lock:
+                self.dirty = True
+                # Scenes created while the collection loaded are already connected, do not connect them twice
+                for scene_name in tuple(self.__item_signal_scenes):
+                    self.__disconnect_item_signals(scene_name)
+                self.__changed()
+            self.build()
+
+        # Scenes were added, removed, or reordered
+        elif event == obs.OBS_FRONTEND_EVENT_SCENE_LIST_CHANGED:
+            self.update_scene_list()
+
+    def on_source_create(self, calldata):
+        """A source was created in OBS"""
+        # Does not increment the reference, do not independently release
+        source = obs.calldata_source(calldata, "source")
+        name = obs.obs_source_get_name(source)
+        unversioned_id = obs.obs_source_get_unversioned_id(source)
+        with self.__lock:
+            if self.dirty:
+                return
+            self.source_names_to_types[name] = unversioned_id
+            if unversioned_id == "scene":
+                self.scene_names_and_items.setdefault(name, [])
+                self.__connect_item_signals(source)
+            self.__changed()
+
+    def on_source_remove(self, calldata):
+        """A source was removed in OBS"""
+        # Does not increment the reference, do not independently release
+        source = obs.calldata_source(calldata, "source")
+        name = obs.obs_source_get_name(source)
+        with self.__lock:
+            if self.dirty:
+                return
+            self.source_names_to_types.pop(name, None)
+            if self.scene_names_and_items.pop(name, None) is not None:
+                self.__disconnect_item_signals(name, source)
+            self.__changed()
+
+    def on_source_rename(self, calldata):
+        """A source was renamed in OBS"""
+        prev_name = obs.calldata_string(calldata, "prev_name")
+        new_name = obs.calldata_string(calldata, "new_name")
+        with self.__lock:
+            if self.dirty:
+                return
+            if prev_name in self.source_names_to_types:
+                self.source_names_to_types[new_name] = self.source_names_to_types.pop(prev_name)
+            if prev_name in self.scene_names_and_items:
+                self.scene_names_and_items[new_name] = self.scene_names_and_items.pop(prev_name)
+            if prev_name in self.__item_signal_scenes:
+                self.__item_signal_scenes.discard(prev_name)
+                self.__item_signal_scenes.add(new_name)
+            for item_names in self.scene_names_and_items.values():
+                for i, item_name in enumerate(item_names):
+                    if item_name == prev_name:
+                        item_names[i] = new_name
+            self.__changed()
+
+    def __get_item_names(self, calldata):
+        """Get the scene name and item source name from scene item signal data"""
+        # None of these increment the reference, do not independently release
+        item = obs.calldata_sceneitem(calldata, "item")
+        scene_source = obs.obs_scene_get_source(obs.obs_sceneitem_get_scene(item))
+        return obs.obs_source_get_name(scene_source), obs.obs_source_get_name(obs.obs_sceneitem_get_source(item))
+
+    def on_item_add(self, calldata):
+        """An item was added to a scene"""
+        scene_name, item_name = self.__get_item_names(calldata)
+        with self.__lock:
+            if self.dirty:
+                return
+            self.scene_names_and_items.setdefault(scene_name, []).append(item_name)
+            self.__changed()
+
+    def on_item_remove(self, calldata):
+        """An item was removed from a scene"""
+        scene_name, item_name = self.__get_item_names(calldata)
+        with self.__lock:
+            if self.dirty:
+                return
+            item_names = self.scene_names_and_items.get(scene_name, [])
+            if item_name in item_names:
+                item_names.remove(item_name)
+            self.__changed()
+
+    def update_scene_list(self):
+        """Add and remove scenes to match the frontend scene list, without looking at their items"""
+        with self.__lock:
+            if self.dirty:
+                return
 
+            scene_sources = obs.obs_frontend_get_scenes()
+            if not scene_sources:
+                return
 
-class TestRaid:
-    """Raid dummy with the same attributes as a real one"""
-    class user:
-        """User dummy sub"""
-        username = "NOBODY"
+            current = {}
+            for scene_source in scene_sources:
+                name = obs.obs_source_get_name(scene_source)
+                current[name] = scene_source
+                if name not in self.scene_names_and_items:
+                    self.scene_names_and_items[name] = self.__enum_item_names(name)
+                    self.source_names_to_types[name] = "scene"
+                    self.__connect_item_signals(scene_source)
+                    self.__changed()
+
+            for name in tuple(self.scene_names_and_items):
+                if name not in current:
+                    del self.scene_names_and_items[name]
+                    self.__disconnect_item_signals(name)
+                    self.__changed()
 
+            obs.source_list_release(scene_sources)
 
-class TestGift:
-    """Gift dummy with the same attributes as a real one"""
-    class user:
-        """User dummy sub"""
-        username = "NOBODY"
+    def __enum_item_names(self, scene_name: str) -> list[str]:
+        """Get the names of the items in a scene from OBS"""
+        scene = obs.obs_get_scene_by_name(scene_name)
+        if not scene:
+            return []
+
+        item_names = []
+        scene_items = obs.obs_scene_enum_items(scene)
+        if scene_items:
+            for item in scene_items:
+                # Does not increment the reference, do not independently release
+                item_names.append(obs.obs_source_get_name(obs.obs_sceneitem_get_source(item)))
+            obs.sceneitem_list_release(scene_items)
+        obs.obs_scene_release(scene)
+        return item_names
+
+    def build(self):
+        """Build the whole index from scratch"""
+        print("Getting scenes and sources...")
+        with self.__lock:
+            # Sources that are not subscenes
+            sources = obs.obs_enum_sources()
+            if sources:
+                self.source_names_to_types = {obs.obs_source_get_name(s): obs.obs_source_get_unversioned_id(s) for s in sources}
+                obs.source_list_release(sources)
+            else:
+                print("No sources found.")
+                self.source_names_to_types = {}
+
+            # All scenes (as sources for some reason)
+            self.scene_names_and_items = {}
+            scene_sources = obs.obs_frontend_get_scenes()
+            if scene_sources:
+                for scene_source in scene_sources:
+                    name = obs.obs_source_get_name(scene_source)
+                    self.source_names_to_types[name] = "scene"
+                    self.scene_names_and_items[name] = self.__enum_item_names(name)
+                    self.__connect_item_signals(scene_source)
+                obs.source_list_release(scene_sources)
+            else:
+                print("No scenes found.")
 
-    class gift_purchase_notification:
-        """Gift purchase notification data dummy sub"""
-        total_gifts = 37
+            self.dirty = False
+            self.__changed()
 
+        print(f"Indexed {len(self.source_names_to_types)} sources in {len(self.scene_names_and_items)} scenes.")
 
-class ChatAlertReceiver(threading.Thread):
-    """Connect to a Rumble chat, and push message alerts from it to queues"""
+    def ensure_built(self):
+        """Build the index if it is not current"""
+        if self.dirty:
+            self.build()
 
-    def __init__(
-        self,
-        stream_id: int | str,
-        rant_queue: Queue,
-        raid_queue: Queue,
-        gift_queue: Queue,
-            ):
-        """
-        Connect to a Rumble chat, and push alerts from it to queues
+
+class CurrentSceneResolver():
+    """Cached lookup of alert scene items nested in the current program scene"""
+
+    def __init__(self, scene_index: SceneIndex):
+        """Cached lookup of alert scene items nested in the current program scene
 
         Args:
-            stream_id (int | str): The numeric ID of the stream to connect to.
-            raid_queue (Queue): The queue to push raid alerts to."""
+            scene_index (SceneIndex): The index whose changes mean the
+                current scene's items may have changed."""
+
+        self.scene_index = scene_index
+        self.__current_scenesource = None
+        self.__sceneitems = {}  # Alert scene name: referenced scene item, or None if not in the current scene
+        self.__generation = None  # Scene index generation our cache is valid for
+        self.__lock = threading.Lock()
+        self.__signals_connected = False
+
+    def connect_signals(self):
+        """Invalidate our cache when the program scene changes"""
+        if self.__signals_connected:
+            return
+        self.__signals_connected = True
+        obs.obs_frontend_add_event_callback(self.on_frontend_event)
 
-        super().__init__(daemon=True)
+    def disconnect_signals(self):
+        """Stop listening to OBS frontend events"""
+        if not self.__signals_connected:
+            return
+        self.__signals_connected = False
+        obs.obs_frontend_remove_event_callback(self.on_frontend_event)
+
+    def on_frontend_event(self, event):
+        """Handle OBS frontend events"""
+        # Also let go of the old scenes before a scene collection change or exit
+        if event in (
+            obs.OBS_FRONTEND_EVENT_SCENE_CHANGED,
+            obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CLEANUP,
+            obs.OBS_FRONTEND_EVENT_EXIT,
+                ):
+            self.invalidate()
+
+    def invalidate(self):
+        """Forget and release everything we have cached"""
+        with self.__lock:
+            self.__invalidate()
+
+    def __invalidate(self):
+        """Forget and release everything we have cached (must hold the lock)"""
+        for sceneitem in self.__sceneitems.values():
+            if sceneitem:
+                obs.obs_sceneitem_release(sceneitem)
+        self.__sceneitems.clear()
+        if self.__current_scenesource:
+            obs.obs_source_release(self.__current_scenesource)
+            self.__current_scenesource = None
+        self.__generation = None
+
+    def __check_current(self):
+        """Make sure our cache is for the current scene and index (must hold the lock)"""
+        self.scene_index.ensure_built()
+        if self.__generation == self.scene_index.generation and self.__current_scenesource:
+            return
 
-        self.chat = cocorum.chatapi.ChatAPI(stream_id)
-        self.chat.clear_mailbox()
+        self.__invalidate()
+        self.__current_scenesource = obs.obs_frontend_get_current_scene()  # returns obs_source_t
+        self.__generation = self.scene_index.generation
 
-        self.rant_queue = rant_queue
-        self.raid_queue = raid_queue
-        self.gift_queue = gift_queue
+    @property
+    def current_scene_name(self) -> str:
+        """The name of the current program scene"""
+        with self.__lock:
+            self.__check_current()
+            return obs.obs_source_get_name(self.__current_scenesource)
 
-        # Thread-safe killswitch
-        self.running = False
+    def find_sceneitem(self, alert_scene_source: str):
+        """Find the scene item of an alert scene in the current scene, at any depth
 
-    def run(self):
-        """The threaded code"""
-        self.running = True
-        while self.running:
-            # The chat closed, gracefully exit
-            message = self.chat.get_message()
-            if not message:
-                print("Chat", self.chat.stream_id_b10, "closed.")
-                self.running = False
-                continue
+        Returns:
+            Scene item (obs_sceneitem_t | None): Does not increment the reference, add one to keep it."""
 
-            # The message is a rant
-            if message.is_rant:
-                self.rant_queue.put(message)
-                continue
+        with self.__lock:
+            self.__check_current()
+            if alert_scene_source in self.__sceneitems:
+                return self.__sceneitems[alert_scene_source]
 
-            # The message is a raid
-            if message.raid_notification:
-                self.raid_queue.put(message)
-                continue
+            # Keep our own reference while it is cached
+            subscene_sceneitem = self.__find_nested_sceneitem(alert_scene_source)
+            self.__sceneitems[alert_scene_source] = subscene_sceneitem
+            return subscene_sceneitem
 
-            # The message is a gift purchase
-            if message.gift_purchase_notification:
-                self.gift_queue.put(message)
-                continue
+    def __find_nested_sceneitem(self, alert_scene_source: str):
+        """Find the scene item of an alert scene at any depth in the current scene (adds a reference to it)"""
+        path = self.scene_index.find_scene_path(obs.obs_source_get_name(self.__current_scenesource), alert_scene_source)
+
+        # Not in the current scene, or it is the current scene itself
+        if not path or len(path) < 2:
+            return None
+
+        # The alert scene is shown and hidden in whichever scene directly contains it
+        parent_scene = obs.obs_get_scene_by_name(path[-2])
+        if not parent_scene:
+            return None
+        subscene_sceneitem = obs.obs_scene_find_source(parent_scene, alert_scene_source)
+        if subscene_sceneitem:
+            obs.obs_sceneitem_addref(subscene_sceneitem)
+        obs.obs_scene_release(parent_scene)
+        return subscene_sceneitem
 
 
 class OBSRumLiveAlerts():
@@ -192,36 +3051,67 @@ class OBSRumLiveAlerts():
         """Instanced once within script as a reliable memory system"""
         print("Initializing OBSRumLiveAlerts object")
         self.__obs_timers_set = False
-        self.alerts_mutex = threading.Lock()
-        self.api = None
-        self.livestream = None
-        self.chat_alert_receiver = None
+        self.__obs_timer_callbacks = []  # (callback, interval) pairs as we gave them to OBS
+
+        # Alert scheduler state
+        self.__alert_scheduler_wakeup = threading.Event()
+        self.__alert_scheduler_deadline = float("inf")
+        self.__shown_alerts = {}  # Alert name: (scene item, time to hide it)
+        self.rls_api_pollers = {}  # API URL: poller
+        self.http_pool = HTTPConnectionPool()
+        self.seen_alerts = SeenAlertStore()
+        self.chat_ingestor = None
+        self.recorder = TrafficRecorder()
+        self.metrics = PipelineMetrics()
+        self.metrics_server = None
+        self.profiler = Profiler()
+        self.__metrics_source_found = True
+        self.__last_chat_messages = (time.monotonic(), 0)  # For the chat message rate on the metrics display
+        self.source_handles = SourceHandleCache()
 
         self.props = None
-        self.scene_names_and_items = {}
-        self.subscene_names = []
-        self.source_names_to_types = {}
+        self.scene_index = SceneIndex()
+        self.scene_resolver = CurrentSceneResolver(self.scene_index)
 
         # Inboxes of things waiting to be alerted for
-        self.follower_inbox = Queue()
-        self.subscriber_inbox = Queue()
-        self.rant_inbox = Queue()
-        self.raid_inbox = Queue()
-        self.gift_inbox = Queue()
+        self.alert_journal = AlertJournal()
+        self.follower_inbox = AlertInbox("follower", journal=self.alert_journal)
+        self.subscriber_inbox = AlertInbox("subscriber", lambda subscriber: subscriber.amount_cents, journal=self.alert_journal)
+        self.rant_inbox = AlertInbox("rant", lambda rant: rant.amount_cents, journal=self.alert_journal)
+        self.raid_inbox = AlertInbox("raid", journal=self.alert_journal)
+        self.gift_inbox = AlertInbox("gift", lambda gift: gift.count, journal=self.alert_journal)
 
         # Base settings
         self.api_url = DefaultSettings.api_url
+        self.extra_api_urls = DefaultSettings.extra_api_urls
         self.refresh_rate = DefaultSettings.refresh_rate  # API refresh rate
+        self.refresh_adaptive = DefaultSettings.refresh_adaptive
+        self.refresh_rate_idle = DefaultSettings.refresh_rate_idle
+        self.coalesce_threshold = DefaultSettings.coalesce_threshold
+        self.extra_chat_streams = DefaultSettings.extra_chat_streams
+        self.record_traffic = DefaultSettings.record_traffic
+        self.metrics_port = DefaultSettings.metrics_port
+        self.metrics_source = DefaultSettings.metrics_source
+        self.profile_duration = DefaultSettings.profile_duration
 
         # Settings for the follower alert
         self.follower_alert_use = DefaultSettings.follower_alert_use
         self.follower_alert_time = DefaultSettings.follower_alert_time
+        self.follower_alert_max_queued = DefaultSettings.follower_alert_max_queued
+        self.follower_alert_overflow = DefaultSettings.follower_alert_overflow
+        self.follower_alert_lane = DefaultSettings.follower_alert_lane
+        self.follower_alert_priority = DefaultSettings.follower_alert_priority
         self.follower_alert_uname_source = DefaultSettings.follower_alert_uname_source
         self.follower_alert_scene_source = DefaultSettings.follower_alert_scene_source
 
         # Settings for the subscriber alert
         self.subscriber_alert_use = DefaultSettings.subscriber_alert_use
         self.subscriber_alert_time = DefaultSettings.subscriber_alert_time
+        self.subscriber_alert_max_queued = DefaultSettings.subscriber_alert_max_queued
+        self.subscriber_alert_overflow = DefaultSettings.subscriber_alert_overflow
+        self.subscriber_alert_lane = DefaultSettings.subscriber_alert_lane
+        self.subscriber_alert_priority = DefaultSettings.subscriber_alert_priority
+        self.subscriber_alert_value_weight = DefaultSettings.subscriber_alert_value_weight
         self.subscriber_alert_uname_source = DefaultSettings.subscriber_alert_uname_source
         self.subscriber_alert_amount_source = DefaultSettings.subscriber_alert_amount_source
         self.subscriber_alert_scene_source = DefaultSettings.subscriber_alert_scene_source
@@ -229,6 +3119,11 @@ class OBSRumLiveAlerts():
         # Settings for the rant alert
         self.rant_alert_use = DefaultSettings.rant_alert_use
         self.rant_alert_time = DefaultSettings.rant_alert_time
+        self.rant_alert_max_queued = DefaultSettings.rant_alert_max_queued
+        self.rant_alert_overflow = DefaultSettings.rant_alert_overflow
+        self.rant_alert_lane = DefaultSettings.rant_alert_lane
+        self.rant_alert_priority = DefaultSettings.rant_alert_priority
+        self.rant_alert_value_weight = DefaultSettings.rant_alert_value_weight
         self.rant_alert_uname_source = DefaultSettings.rant_alert_uname_source
         self.rant_alert_message_source = DefaultSettings.rant_alert_message_source
         self.rant_alert_amount_source = DefaultSettings.rant_alert_amount_source
@@ -237,12 +3132,21 @@ class OBSRumLiveAlerts():
         # Settings for the raid alert
         self.raid_alert_use = DefaultSettings.raid_alert_use
         self.raid_alert_time = DefaultSettings.raid_alert_time
+        self.raid_alert_max_queued = DefaultSettings.raid_alert_max_queued
+        self.raid_alert_overflow = DefaultSettings.raid_alert_overflow
+        self.raid_alert_lane = DefaultSettings.raid_alert_lane
+        self.raid_alert_priority = DefaultSettings.raid_alert_priority
         self.raid_alert_uname_source = DefaultSettings.raid_alert_uname_source
         self.raid_alert_scene_source = DefaultSettings.raid_alert_scene_source
 
         # Settings for the gift alert
         self.gift_alert_use = DefaultSettings.gift_alert_use
         self.gift_alert_time = DefaultSettings.gift_alert_time
+        self.gift_alert_max_queued = DefaultSettings.gift_alert_max_queued
+        self.gift_alert_overflow = DefaultSettings.gift_alert_overflow
+        self.gift_alert_lane = DefaultSettings.gift_alert_lane
+        self.gift_alert_priority = DefaultSettings.gift_alert_priority
+        self.gift_alert_value_weight = DefaultSettings.gift_alert_value_weight
         self.gift_alert_uname_source = DefaultSettings.gift_alert_uname_source
         self.gift_alert_count_source = DefaultSettings.gift_alert_count_source
         #self.gift_alert_amount_source = DefaultSettings.gift_alert_amount_source
@@ -253,17 +3157,35 @@ class OBSRumLiveAlerts():
         print("Called script_defaults with settings", settings)
         # Base settings
         obs.obs_data_set_default_string(settings, "api_url", DefaultSettings.api_url)
+        obs.obs_data_set_default_string(settings, "extra_api_urls", DefaultSettings.extra_api_urls)
         obs.obs_data_set_default_int(settings, "refresh_rate", DefaultSettings.refresh_rate)
+        obs.obs_data_set_default_bool(settings, "refresh_adaptive", DefaultSettings.refresh_adaptive)
+        obs.obs_data_set_default_int(settings, "refresh_rate_idle", DefaultSettings.refresh_rate_idle)
+        obs.obs_data_set_default_int(settings, "coalesce_threshold", DefaultSettings.coalesce_threshold)
+        obs.obs_data_set_default_string(settings, "extra_chat_streams", DefaultSettings.extra_chat_streams)
+        obs.obs_data_set_default_bool(settings, "record_traffic", DefaultSettings.record_traffic)
+        obs.obs_data_set_default_int(settings, "metrics_port", DefaultSettings.metrics_port)
+        obs.obs_data_set_default_string(settings, "metrics_source", DefaultSettings.metrics_source)
+        obs.obs_data_set_default_int(settings, "profile_duration", DefaultSettings.profile_duration)
 
         # Follower alert settings
         obs.obs_data_set_default_bool(settings, "follower_alert_use", DefaultSettings.follower_alert_use)
         obs.obs_data_set_default_int(settings, "follower_alert_time", DefaultSettings.follower_alert_time)
+        obs.obs_data_set_default_int(settings, "follower_alert_max_queued", DefaultSettings.follower_alert_max_queued)
+        obs.obs_data_set_default_string(settings, "follower_alert_overflow", DefaultSettings.follower_alert_overflow)
+        obs.obs_data_set_default_int(settings, "follower_alert_lane", DefaultSettings.follower_alert_lane)
+        obs.obs_data_set_default_int(settings, "follower_alert_priority", DefaultSettings.follower_alert_priority)
         obs.obs_data_set_default_string(settings, "follower_alert_uname_source", DefaultSettings.follower_alert_uname_source)
         obs.obs_data_set_default_string(settings, "follower_alert_scene_source", DefaultSettings.follower_alert_scene_source)
 
         # Subscriber alert settings
         obs.obs_data_set_default_bool(settings, "subscriber_alert_use", DefaultSettings.subscriber_alert_use)
         obs.obs_data_set_default_int(settings, "subscriber_alert_time", DefaultSettings.subscriber_alert_time)
+        obs.obs_data_set_default_int(settings, "subscriber_alert_max_queued", DefaultSettings.subscriber_alert_max_queued)
+        obs.obs_data_set_default_string(settings, "subscriber_alert_overflow", DefaultSettings.subscriber_alert_overflow)
+        obs.obs_data_set_default_int(settings, "subscriber_alert_lane", DefaultSettings.subscriber_alert_lane)
+        obs.obs_data_set_default_int(settings, "subscriber_alert_priority", DefaultSettings.subscriber_alert_priority)
+        obs.obs_data_set_default_double(settings, "subscriber_alert_value_weight", DefaultSettings.subscriber_alert_value_weight)
         obs.obs_data_set_default_string(settings, "subscriber_alert_uname_source", DefaultSettings.subscriber_alert_uname_source)
         obs.obs_data_set_default_string(settings, "subscriber_alert_amount_source", DefaultSettings.subscriber_alert_amount_source)
         obs.obs_data_set_default_string(settings, "subscriber_alert_scene_source", DefaultSettings.subscriber_alert_scene_source)
@@ -271,6 +3193,11 @@ class OBSRumLiveAlerts():
         # Rant alert settings
         obs.obs_data_set_default_bool(settings, "rant_alert_use", DefaultSettings.rant_alert_use)
         obs.obs_data_set_default_int(settings, "rant_alert_time", DefaultSettings.rant_alert_time)
+        obs.obs_data_set_default_int(settings, "rant_alert_max_queued", DefaultSettings.rant_alert_max_queued)
+        obs.obs_data_set_default_string(settings, "rant_alert_overflow", DefaultSettings.rant_alert_overflow)
+        obs.obs_data_set_default_int(settings, "rant_alert_lane", DefaultSettings.rant_alert_lane)
+        obs.obs_data_set_default_int(settings, "rant_alert_priority", DefaultSettings.rant_alert_priority)
+        obs.obs_data_set_default_double(settings, "rant_alert_value_weight", DefaultSettings.rant_alert_value_weight)
         obs.obs_data_set_default_string(settings, "rant_alert_uname_source", DefaultSettings.rant_alert_uname_source)
         obs.obs_data_set_default_string(settings, "rant_alert_message_source", DefaultSettings.rant_alert_message_source)
         obs.obs_data_set_default_string(settings, "rant_alert_amount_source", DefaultSettings.rant_alert_amount_source)
@@ -279,12 +3206,21 @@ class OBSRumLiveAlerts():
         # Raid alert settings
         obs.obs_data_set_default_bool(settings, "raid_alert_use", DefaultSettings.raid_alert_use)
         obs.obs_data_set_default_int(settings, "raid_alert_time", DefaultSettings.raid_alert_time)
+        obs.obs_data_set_default_int(settings, "raid_alert_max_queued", DefaultSettings.raid_alert_max_queued)
+        obs.obs_data_set_default_string(settings, "raid_alert_overflow", DefaultSettings.raid_alert_overflow)
+        obs.obs_data_set_default_int(settings, "raid_alert_lane", DefaultSettings.raid_alert_lane)
+        obs.obs_data_set_default_int(settings, "raid_alert_priority", DefaultSettings.raid_alert_priority)
         obs.obs_data_set_default_string(settings, "raid_alert_uname_source", DefaultSettings.raid_alert_uname_source)
         obs.obs_data_set_default_string(settings, "raid_alert_scene_source", DefaultSettings.raid_alert_scene_source)
 
         # Gift alert settings
         obs.obs_data_set_default_bool(settings, "gift_alert_use", DefaultSettings.gift_alert_use)
         obs.obs_data_set_default_int(settings, "gift_alert_time", DefaultSettings.gift_alert_time)
+        obs.obs_data_set_default_int(settings, "gift_alert_max_queued", DefaultSettings.gift_alert_max_queued)
+        obs.obs_data_set_default_string(settings, "gift_alert_overflow", DefaultSettings.gift_alert_overflow)
+        obs.obs_data_set_default_int(settings, "gift_alert_lane", DefaultSettings.gift_alert_lane)
+        obs.obs_data_set_default_int(settings, "gift_alert_priority", DefaultSettings.gift_alert_priority)
+        obs.obs_data_set_default_double(settings, "gift_alert_value_weight", DefaultSettings.gift_alert_value_weight)
         obs.obs_data_set_default_string(settings, "gift_alert_uname_source", DefaultSettings.gift_alert_uname_source)
         obs.obs_data_set_default_string(settings, "gift_alert_count_source", DefaultSettings.gift_alert_count_source)
         #obs.obs_data_set_default_string(settings, "gift_alert_amount_source", DefaultSettings.gift_alert_amount_source)
@@ -301,12 +3237,26 @@ class OBSRumLiveAlerts():
         # Base settings
         obs.obs_properties_add_text(self.props, "base_settings_header", "<h2>Base Settings</h2>", obs.OBS_TEXT_INFO)
         obs.obs_properties_add_text(self.props, "api_url", "API URL (with key)", obs.OBS_TEXT_PASSWORD)
+        obs.obs_properties_add_text(self.props, "extra_api_urls", "More API URLs for other channels (space separated)", obs.OBS_TEXT_PASSWORD)
         obs.obs_properties_add_int(self.props, "refresh_rate", "Refresh Rate (seconds)", REFRESH_RATE_MIN, REFRESH_RATE_MAX, 1)
+        obs.obs_properties_add_bool(self.props, "refresh_adaptive", "Adapt refresh rate to activity")
+        obs.obs_properties_add_int(self.props, "refresh_rate_idle", "Idle Refresh Rate (seconds)", REFRESH_RATE_MIN, REFRESH_RATE_MAX, 1)
+        obs.obs_properties_add_int(self.props, "coalesce_threshold", "Combine alerts when more are queued than (0 for never)", 0, MAX_QUEUED, 1)
+        obs.obs_properties_add_text(self.props, "extra_chat_streams", "Also alert for chats of stream IDs (base 36, comma separated)", obs.OBS_TEXT_DEFAULT)
+        obs.obs_properties_add_bool(self.props, "record_traffic", "Record API and chat traffic for replaying")
+        obs.obs_properties_add_int(self.props, "metrics_port", "Serve Prometheus metrics on localhost port (0 for off)", 0, 65535, 1)
+        metrics_source_prop = obs.obs_properties_add_list(self.props, "metrics_source", "Show metrics in text source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+        obs.obs_properties_add_int(self.props, "profile_duration", "Profile capture time (seconds)", 1, PROFILE_DURATION_MAX, 1)
+        obs.obs_properties_add_button(self.props, "profile_capture", "Capture profile (click again to stop early)", capture_profile)
 
         # Settings for the follower alert
         obs.obs_properties_add_text(self.props, "follower_alert_header", "<hr><h2>Follower Alert</h2>", obs.OBS_TEXT_INFO)
         obs.obs_properties_add_bool(self.props, "follower_alert_use", "Use follower alert")
         obs.obs_properties_add_int(self.props, "follower_alert_time", "Display for seconds", 0, MAX_ALERT_TIME, 1)
+        obs.obs_properties_add_int(self.props, "follower_alert_max_queued", "Maximum queued (0 for no limit)", 0, MAX_QUEUED, 1)
+        follower_overflow_prop = obs.obs_properties_add_list(self.props, "follower_alert_overflow", "When the queue is full", obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING)
+        obs.obs_properties_add_int(self.props, "follower_alert_lane", "Lane (alerts in one lane never overlap)", 1, len(ALERT_NAMES), 1)
+        obs.obs_properties_add_int(self.props, "follower_alert_priority", "Priority (higher shows first)", 0, MAX_PRIORITY, 1)
         follower_scene_prop = obs.obs_properties_add_list(self.props, "follower_alert_scene_source", "Scene source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
         obs.obs_property_set_modified_callback(follower_scene_prop, update_follower_source_lists)
         obs.obs_properties_add_list(self.props, "follower_alert_uname_source", "Username text source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
@@ -317,6 +3267,11 @@ class OBSRumLiveAlerts():
         obs.obs_properties_add_text(self.props, "subscriber_alert_header", "<hr><h2>Subscriber Alert</h2>", obs.OBS_TEXT_INFO)
         obs.obs_properties_add_bool(self.props, "subscriber_alert_use", "Use subscriber alert")
         obs.obs_properties_add_int(self.props, "subscriber_alert_time", "Display for seconds", 0, MAX_ALERT_TIME, 1)
+        obs.obs_properties_add_int(self.props, "subscriber_alert_max_queued", "Maximum queued (0 for no limit)", 0, MAX_QUEUED, 1)
+        subscriber_overflow_prop = obs.obs_properties_add_list(self.props, "subscriber_alert_overflow", "When the queue is full", obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING)
+        obs.obs_properties_add_int(self.props, "subscriber_alert_lane", "Lane (alerts in one lane never overlap)", 1, len(ALERT_NAMES), 1)
+        obs.obs_properties_add_int(self.props, "subscriber_alert_priority", "Priority (higher shows first)", 0, MAX_PRIORITY, 1)
+        obs.obs_properties_add_float(self.props, "subscriber_alert_value_weight", "Extra priority per cent of amount", 0, MAX_PRIORITY, 0.01)
         subscriber_scene_prop = obs.obs_properties_add_list(self.props, "subscriber_alert_scene_source", "Scene source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
         obs.obs_property_set_modified_callback(subscriber_scene_prop, update_subscriber_source_lists)
         obs.obs_properties_add_list(self.props, "subscriber_alert_uname_source", "Username text source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
@@ -327,6 +3282,11 @@ class OBSRumLiveAlerts():
         obs.obs_properties_add_text(self.props, "rant_alert_header", "<hr><h2>Rant Alert</h2>", obs.OBS_TEXT_INFO)
         obs.obs_properties_add_bool(self.props, "rant_alert_use", "Use rant alert")
         obs.obs_properties_add_int(self.props, "rant_alert_time", "Display for seconds", 0, MAX_ALERT_TIME, 1)
+        obs.obs_properties_add_int(self.props, "rant_alert_max_queued", "Maximum queued (0 for no limit)", 0, MAX_QUEUED, 1)
+        rant_overflow_prop = obs.obs_properties_add_list(self.props, "rant_alert_overflow", "When the queue is full", obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING)
+        obs.obs_properties_add_int(self.props, "rant_alert_lane", "Lane (alerts in one lane never overlap)", 1, len(ALERT_NAMES), 1)
+        obs.obs_properties_add_int(self.props, "rant_alert_priority", "Priority (higher shows first)", 0, MAX_PRIORITY, 1)
+        obs.obs_properties_add_float(self.props, "rant_alert_value_weight", "Extra priority per cent of amount", 0, MAX_PRIORITY, 0.01)
         rant_scene_prop = obs.obs_properties_add_list(self.props, "rant_alert_scene_source", "Scene source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
         #obs.obs_property_set_modified_callback(rant_scene_prop, update_rant_source_lists)
         obs.obs_properties_add_list(self.props, "rant_alert_uname_source", "Username text source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
@@ -338,6 +3298,10 @@ class OBSRumLiveAlerts():
         obs.obs_properties_add_text(self.props, "raid_alert_header", "<hr><h2>Raid Alert</h2>", obs.OBS_TEXT_INFO)
         obs.obs_properties_add_bool(self.props, "raid_alert_use", "Use raid alert")
         obs.obs_properties_add_int(self.props, "raid_alert_time", "Display for seconds", 0, MAX_ALERT_TIME, 1)
+        obs.obs_properties_add_int(self.props, "raid_alert_max_queued", "Maximum queued (0 for no limit)", 0, MAX_QUEUED, 1)
+        raid_overflow_prop = obs.obs_properties_add_list(self.props, "raid_alert_overflow", "When the queue is full", obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING)
+        obs.obs_properties_add_int(self.props, "raid_alert_lane", "Lane (alerts in one lane never overlap)", 1, len(ALERT_NAMES), 1)
+        obs.obs_properties_add_int(self.props, "raid_alert_priority", "Priority (higher shows first)", 0, MAX_PRIORITY, 1)
         raid_scene_prop = obs.obs_properties_add_list(self.props, "raid_alert_scene_source", "Scene source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
         #obs.obs_property_set_modified_callback(raid_scene_prop, update_raid_source_lists)
         obs.obs_properties_add_list(self.props, "raid_alert_uname_source", "Username text source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
@@ -347,6 +3311,11 @@ class OBSRumLiveAlerts():
         obs.obs_properties_add_text(self.props, "gift_alert_header", "<hr><h2>Gift Alert</h2>", obs.OBS_TEXT_INFO)
         obs.obs_properties_add_bool(self.props, "gift_alert_use", "Use gift alert")
         obs.obs_properties_add_int(self.props, "gift_alert_time", "Display for seconds", 0, MAX_ALERT_TIME, 1)
+        obs.obs_properties_add_int(self.props, "gift_alert_max_queued", "Maximum queued (0 for no limit)", 0, MAX_QUEUED, 1)
+        gift_overflow_prop = obs.obs_properties_add_list(self.props, "gift_alert_overflow", "When the queue is full", obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING)
+        obs.obs_properties_add_int(self.props, "gift_alert_lane", "Lane (alerts in one lane never overlap)", 1, len(ALERT_NAMES), 1)
+        obs.obs_properties_add_int(self.props, "gift_alert_priority", "Priority (higher shows first)", 0, MAX_PRIORITY, 1)
+        obs.obs_properties_add_float(self.props, "gift_alert_value_weight", "Extra priority per gift", 0, MAX_PRIORITY, 0.01)
         gift_scene_prop = obs.obs_properties_add_list(self.props, "gift_alert_scene_source", "Scene source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
         #obs.obs_property_set_modified_callback(gift_scene_prop, update_gift_source_lists)
         obs.obs_properties_add_list(self.props, "gift_alert_uname_source", "Username text source", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
@@ -361,14 +3330,28 @@ class OBSRumLiveAlerts():
         self.update_raid_source_lists(selected_scene=DefaultSettings.raid_alert_scene_source)
         self.update_gift_source_lists(selected_scene=DefaultSettings.gift_alert_scene_source)
 
+        print("Adding the overflow policies to the overflow policy selectors")
+        for policy, description in OVERFLOW_POLICIES.items():
+            obs.obs_property_list_add_string(follower_overflow_prop, description, policy)
+            obs.obs_property_list_add_string(subscriber_overflow_prop, description, policy)
+            obs.obs_property_list_add_string(rant_overflow_prop, description, policy)
+            obs.obs_property_list_add_string(raid_overflow_prop, description, policy)
+            obs.obs_property_list_add_string(gift_overflow_prop, description, policy)
+
         print("Adding all subscene sources to the subscene source selectors")
-        for subscene_name in self.subscene_names:
+        for subscene_name in self.scene_index.subscene_names:
             obs.obs_property_list_add_string(follower_scene_prop, subscene_name, subscene_name)
             obs.obs_property_list_add_string(subscriber_scene_prop, subscene_name, subscene_name)
             obs.obs_property_list_add_string(rant_scene_prop, subscene_name, subscene_name)
             obs.obs_property_list_add_string(raid_scene_prop, subscene_name, subscene_name)
             obs.obs_property_list_add_string(gift_scene_prop, subscene_name, subscene_name)
 
+        print("Adding all text sources to the metrics source selector")
+        obs.obs_property_list_add_string(metrics_source_prop, "(None)", "")
+        for source_name, source_type in tuple(self.scene_index.source_names_to_types.items()):
+            if source_type in TEXT_SOURCE_TYPES:
+                obs.obs_property_list_add_string(metrics_source_prop, source_name, source_name)
+
         print("Properties initialized.")
         return self.props
 
@@ -377,17 +3360,35 @@ class OBSRumLiveAlerts():
         print("Updating with settings")
         # Base settings
         self.api_url = obs.obs_data_get_string(settings, "api_url")
+        self.extra_api_urls = obs.obs_data_get_string(settings, "extra_api_urls")
         self.refresh_rate = obs.obs_data_get_int(settings, "refresh_rate")
+        self.refresh_adaptive = obs.obs_data_get_bool(settings, "refresh_adaptive")
+        self.refresh_rate_idle = obs.obs_data_get_int(settings, "refresh_rate_idle")
+        self.coalesce_threshold = obs.obs_data_get_int(settings, "coalesce_threshold")
+        self.extra_chat_streams = obs.obs_data_get_string(settings, "extra_chat_streams")
+        self.record_traffic = obs.obs_data_get_bool(settings, "record_traffic")
+        self.metrics_port = obs.obs_data_get_int(settings, "metrics_port")
+        self.metrics_source = obs.obs_data_get_string(settings, "metrics_source")
+        self.profile_duration = obs.obs_data_get_int(settings, "profile_duration")
 
         # Settings for the follower alert
         self.follower_alert_use = obs.obs_data_get_bool(settings, "follower_alert_use")
         self.follower_alert_time = obs.obs_data_get_int(settings, "follower_alert_time")
+        self.follower_alert_max_queued = obs.obs_data_get_int(settings, "follower_alert_max_queued")
+        self.follower_alert_overflow = obs.obs_data_get_string(settings, "follower_alert_overflow")
+        self.follower_alert_lane = obs.obs_data_get_int(settings, "follower_alert_lane")
+        self.follower_alert_priority = obs.obs_data_get_int(settings, "follower_alert_priority")
         self.follower_alert_uname_source = obs.obs_data_get_string(settings, "follower_alert_uname_source")
         self.follower_alert_scene_source = obs.obs_data_get_string(settings, "follower_alert_scene_source")
 
         # Settings for the subscriber alert
         self.subscriber_alert_use = obs.obs_data_get_bool(settings, "subscriber_alert_use")
         self.subscriber_alert_time = obs.obs_data_get_int(settings, "subscriber_alert_time")
+        self.subscriber_alert_max_queued = obs.obs_data_get_int(settings, "subscriber_alert_max_queued")
+        self.subscriber_alert_overflow = obs.obs_data_get_string(settings, "subscriber_alert_overflow")
+        self.subscriber_alert_lane = obs.obs_data_get_int(settings, "subscriber_alert_lane")
+        self.subscriber_alert_priority = obs.obs_data_get_int(settings, "subscriber_alert_priority")
+        self.subscriber_alert_value_weight = obs.obs_data_get_double(settings, "subscriber_alert_value_weight")
         self.subscriber_alert_uname_source = obs.obs_data_get_string(settings, "subscriber_alert_uname_source")
         self.subscriber_alert_amount_source = obs.obs_data_get_string(settings, "subscriber_alert_amount_source")
         self.subscriber_alert_scene_source = obs.obs_data_get_string(settings, "subscriber_alert_scene_source")
@@ -395,6 +3396,11 @@ class OBSRumLiveAlerts():
         # Settings for the rant alert
         self.rant_alert_use = obs.obs_data_get_bool(settings, "rant_alert_use")
         self.rant_alert_time = obs.obs_data_get_int(settings, "rant_alert_time")
+        self.rant_alert_max_queued = obs.obs_data_get_int(settings, "rant_alert_max_queued")
+        self.rant_alert_overflow = obs.obs_data_get_string(settings, "rant_alert_overflow")
+        self.rant_alert_lane = obs.obs_data_get_int(settings, "rant_alert_lane")
+        self.rant_alert_priority = obs.obs_data_get_int(settings, "rant_alert_priority")
+        self.rant_alert_value_weight = obs.obs_data_get_double(settings, "rant_alert_value_weight")
         self.rant_alert_uname_source = obs.obs_data_get_string(settings, "rant_alert_uname_source")
         self.rant_alert_message_source = obs.obs_data_get_string(settings, "rant_alert_message_source")
         self.rant_alert_amount_source = obs.obs_data_get_string(settings, "rant_alert_amount_source")
@@ -403,49 +3409,78 @@ class OBSRumLiveAlerts():
         # Settings for the raid alert
         self.raid_alert_use = obs.obs_data_get_bool(settings, "raid_alert_use")
         self.raid_alert_time = obs.obs_data_get_int(settings, "raid_alert_time")
+        self.raid_alert_max_queued = obs.obs_data_get_int(settings, "raid_alert_max_queued")
+        self.raid_alert_overflow = obs.obs_data_get_string(settings, "raid_alert_overflow")
+        self.raid_alert_lane = obs.obs_data_get_int(settings, "raid_alert_lane")
+        self.raid_alert_priority = obs.obs_data_get_int(settings, "raid_alert_priority")
         self.raid_alert_uname_source = obs.obs_data_get_string(settings, "raid_alert_uname_source")
         self.raid_alert_scene_source = obs.obs_data_get_string(settings, "raid_alert_scene_source")
 
         # Settings for the gift alert
         self.gift_alert_use = obs.obs_data_get_bool(settings, "gift_alert_use")
         self.gift_alert_time = obs.obs_data_get_int(settings, "gift_alert_time")
+        self.gift_alert_max_queued = obs.obs_data_get_int(settings, "gift_alert_max_queued")
+        self.gift_alert_overflow = obs.obs_data_get_string(settings, "gift_alert_overflow")
+        self.gift_alert_lane = obs.obs_data_get_int(settings, "gift_alert_lane")
+        self.gift_alert_priority = obs.obs_data_get_int(settings, "gift_alert_priority")
+        self.gift_alert_value_weight = obs.obs_data_get_double(settings, "gift_alert_value_weight")
         self.gift_alert_uname_source = obs.obs_data_get_string(settings, "gift_alert_uname_source")
         self.gift_alert_count_source = obs.obs_data_get_string(settings, "gift_alert_count_source")
         #self.gift_alert_amount_source = obs.obs_data_get_string(settings, "gift_alert_amount_source")
         self.gift_alert_scene_source = obs.obs_data_get_string(settings, "gift_alert_scene_source")
 
-        # Deactivate timers and remove old livestream reference
+        # Apply the new inbox limits, and show the most valuable alertables of a type first when value adds priority
+        for name in ALERT_NAMES:
+            getattr(self, f"{name}_inbox").configure(
+                getattr(self, f"{name}_alert_max_queued"),
+                getattr(self, f"{name}_alert_overflow"),
+                highest_first=getattr(self, f"{name}_alert_value_weight", 0) > 0,
+                )
+
+        # Bring back alerts that were waiting when we last stopped
+        self.restore_pending_alerts()
+
+        # Start or stop recording before any new pollers fetch anything
+        if self.record_traffic:
+            self.recorder.start()
+        else:
+            self.recorder.stop()
+
+        self.update_metrics_server()
+        self.__metrics_source_found = True
+
+        # Deactivate timers
         self.remove_obs_timers()
-        self.livestream = None
-        self.abandon_chat_alert_receiver()
 
-        # We have an API URL
-        if self.api_url:
-            try:
-                # We had no API before
-                if not self.api:
-                    print("Creating new Cocorum API object")
-                    self.api = cocorum.RumbleAPI(self.api_url, refresh_rate=self.refresh_rate)
-
-                # We do have an API but the URL is outdated
-                elif self.api.api_url != self.api_url:
-                    print("Updating Cocorum API URL")
-                    self.api.api_url = self.api_url
-
-            # The API URL was invalid
-            except (AssertionError, cocorum.requests.exceptions.RequestException) as e:
-                print(f"API connection failed: {e}")
-                self.api_url = ""
-                return
+        # Stop polling API URLs we no longer have
+        api_urls = list(dict.fromkeys(url for url in [self.api_url] + self.extra_api_urls.split() if url))
+        self.stop_rls_api_pollers(keep=api_urls)
 
-            # Reset livestream reference
-            self.livestream = None
-            self.abandon_chat_alert_receiver()
+        for api_url in api_urls:
+            # Keep polling the same API, and keep its chat connection, if only how we poll changed
+            if (rls_api_poller := self.rls_api_pollers.get(api_url)) and rls_api_poller.running:
+                print("Reusing RLS API poller")
+                rls_api_poller.configure(self.refresh_rate, self.refresh_adaptive, self.refresh_rate_idle)
+                continue
+
+            # We have a new API URL, poll it in the background
+            self.rls_api_pollers[api_url] = RLSAPIPoller(
+                api_url,
+                self.refresh_rate,
+                self.queue_alertable,
+                adaptive=self.refresh_adaptive,
+                refresh_rate_idle=self.refresh_rate_idle,
+                http_pool=self.http_pool,
+                seen_alerts=self.seen_alerts,
+                recorder=self.recorder,
+                metrics=self.metrics,
+                )
+            self.rls_api_pollers[api_url].start()
 
-            # Clear these mailboxes
-            print("Stale new followers: ", self.api.new_followers)
-            print("Stale new subscribers: ", self.api.new_subscribers)
+        self.update_chat_ingestor()
 
+        # Alerts can come from the extra chats alone, without any API to poll
+        if self.rls_api_pollers or self.chat_ingestor:
             self.set_obs_timers()
 
         print("Script settings updated.")
@@ -454,8 +3489,8 @@ class OBSRumLiveAlerts():
         """Pull up the records of all text type sources within a scene"""
         return [
                 item_name
-                for item_name in self.scene_names_and_items.get(scene_name, [])
-                if self.source_names_to_types.get(item_name, "NULL_RECORD") in ("text_gdiplus", "text_ft2_source")
+                for item_name in self.scene_index.get_items(scene_name)
+                if self.scene_index.get_type(item_name, "NULL_RECORD") in TEXT_SOURCE_TYPES
                 ]
 
     def set_obs_timers(self):
@@ -465,12 +3500,20 @@ class OBSRumLiveAlerts():
             print("ERROR: Timers already set.")
             return
         self.__obs_timers_set = True
-        obs.timer_add(self.check_main_rls_api, self.refresh_rate * 1000)
-        obs.timer_add(self.next_follower_alert, self.follower_alert_time * 1000)
-        obs.timer_add(self.next_subscriber_alert, self.subscriber_alert_time * 1000)
-        obs.timer_add(self.next_rant_alert, self.rant_alert_time * 1000)
-        obs.timer_add(self.next_raid_alert, self.raid_alert_time * 1000)
-        obs.timer_add(self.next_gift_alert, self.gift_alert_time * 1000)
+        self.__obs_timer_callbacks = [
+            (self.alert_scheduler_tick, ALERT_SCHEDULER_TICK),
+            (self.update_metrics_display, METRICS_DISPLAY_INTERVAL),
+            ]
+
+        # Only time the callbacks while profiling, so they cost nothing extra otherwise
+        if self.profiler.capturing:
+            self.__obs_timer_callbacks = [(self.profiler.timed(callback), interval) for callback, interval in self.__obs_timer_callbacks]
+
+        for callback, interval in self.__obs_timer_callbacks:
+            obs.timer_add(callback, interval)
+
+        # Alerts may have been queued while the timers were off
+        self.wake_alert_scheduler()
 
     def remove_obs_timers(self):
         """Remove all the timers we would set for OBS"""
@@ -479,279 +3522,474 @@ class OBSRumLiveAlerts():
             print("ERROR: Timers were not set.")
             return
         self.__obs_timers_set = False
-        obs.timer_remove(self.check_main_rls_api)
-        obs.timer_remove(self.next_follower_alert)
-        obs.timer_remove(self.next_subscriber_alert)
-        obs.timer_remove(self.next_rant_alert)
-        obs.timer_remove(self.next_raid_alert)
-        obs.timer_remove(self.next_gift_alert)
+        for callback, _ in self.__obs_timer_callbacks:
+            obs.timer_remove(callback)
+        self.__obs_timer_callbacks = []
 
-    def abandon_chat_alert_receiver(self):
-        """If we have a chat alert receiver, tell it to stop, and remove its reference"""
-        if self.chat_alert_receiver:
-            self.chat_alert_receiver.running = False
-            self.chat_alert_receiver = None
+    def get_profiled_threads(self) -> dict[int, str]:
+        """Get the chat threads to sample while profiling (thread-safe)
+
+        Returns:
+            Threads (dict[int, str]): Thread ident: label."""
+
+        threads = {
+            chat_alert_receiver.ident: f"chat {chat_alert_receiver.stream_id}"
+            for rls_api_poller in tuple(self.rls_api_pollers.values())
+            if (chat_alert_receiver := rls_api_poller.chat_alert_receiver) and chat_alert_receiver.ident
+            }
+        if (chat_ingestor := self.chat_ingestor) and chat_ingestor.ident:
+            threads[chat_ingestor.ident] = "extra chats"
+        return threads
+
+    def update_metrics_server(self):
+        """Start, stop, or move the metrics server to match the metrics port setting"""
+        if self.metrics_server and self.metrics_server.port == self.metrics_port:
+            return
+
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+
+        if not self.metrics_port:
+            return
+
+        try:
+            self.metrics_server = MetricsServer(self.metrics_port, self.get_metrics_text)
+        except OSError as e:
+            print(f"ERROR: Could not serve metrics on port {self.metrics_port}: {e}")
+            return
+        self.metrics_server.start()
+        print(f"Serving metrics at http://127.0.0.1:{self.metrics_port}/metrics")
+
+    def update_chat_ingestor(self):
+        """Read the extra chat streams, starting or stopping the chat ingestor as needed"""
+        stream_ids = []
+        for stream_id in self.extra_chat_streams.split(","):
+            if not (stream_id := stream_id.strip()):
+                continue
+            if not is_stream_id(stream_id):
+                print(f"ERROR: Extra chat stream ID {stream_id!r} is not a base 36 stream ID, skipping it.")
+                continue
+            stream_ids.append(stream_id.lower())
+
+        # No valid extra streams anymore
+        if not stream_ids:
+            if self.chat_ingestor:
+                self.chat_ingestor.stop()
+                self.chat_ingestor = None
+            return
+
+        if not self.chat_ingestor:
+            self.chat_ingestor = AsyncChatIngestor(
+                self.queue_alertable,
+                seen_alerts=self.seen_alerts,
+                recorder=self.recorder,
+                metrics=self.metrics,
+                )
+            self.chat_ingestor.start()
+
+        print("Reading extra chat streams:", stream_ids)
+        self.chat_ingestor.set_streams(stream_ids)
+
+    def stop_rls_api_pollers(self, keep: list = (), wait: bool = False):
+        """Tell our RLS API pollers to stop, and remove their references
+
+        Args:
+            keep (list): API URLs to keep polling.
+                Defaults to stopping all of them.
+            wait (bool): Wait up to THREAD_SHUTDOWN_TIMEOUT for each to finish.
+                Defaults to False, they finish shutting down in the background."""
+
+        stopping = [self.rls_api_pollers.pop(api_url) for api_url in tuple(self.rls_api_pollers) if api_url not in keep]
+
+        # Stop them all at once, so that waiting on them overlaps
+        for rls_api_poller in stopping:
+            rls_api_poller.stop()
+        if wait:
+            for rls_api_poller in stopping:
+                rls_api_poller.shutdown()
+
+    def script_load(self, settings):
+        """Perform script setup that needs OBS to be running"""
+        print("Loading script")
+        self.source_handles.connect_signals()
+        self.scene_index.connect_signals()
+        self.scene_resolver.connect_signals()
+        self.restore_pending_alerts()
+
+        # Before anything can check it, and not on the OBS thread
+        self.seen_alerts.load_in_background()
+
+    def restore_pending_alerts(self):
+        """Put alerts that were waiting when we last stopped back in the inboxes, once, in their original order"""
+        if self.alert_journal.opened:
+            return
+
+        restored = self.alert_journal.open()
+        for name, alertable in restored:
+            getattr(self, f"{name}_inbox").put(alertable)
+
+        if restored:
+            print(f"Restored {len(restored)} pending alerts.")
+            self.wake_alert_scheduler()
 
     def script_unload(self):
         """Perform script cleanup"""
         print("Unload triggered. Cleaning up")
 
-        # Deactivate timers and remove old livestream reference
+        # Deactivate timers and stop polling the API
         self.remove_obs_timers()
-        self.livestream = None
-        self.abandon_chat_alert_receiver()
-        if self.alerts_mutex.locked():
-            print("WARNING: Releasing alerts mutex.")
-            self.alerts_mutex.release()
+        self.stop_rls_api_pollers(wait=True)
+        self.http_pool.close()
+        if self.chat_ingestor:
+            self.chat_ingestor.shutdown()
+            self.chat_ingestor = None
+        self.seen_alerts.close()
+        self.recorder.stop()
+        self.profiler.stop()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+        self.alert_journal.close()
+        for name in tuple(self.__shown_alerts):
+            self.__finish_alert(name)
+
+        self.source_handles.disconnect_signals()
+        self.source_handles.clear()
+        self.scene_index.disconnect_signals()
+        self.scene_resolver.disconnect_signals()
+        self.scene_resolver.invalidate()
 
         print("Unloaded.")
 
     def get_scenes_and_sources(self):
-        """Get listing of OBS scenes and scene item sources"""
-        print("Getting scenes and sources...")
-
-        print("Enumerating non-subscene sources")
-        # Sources that are not subscenes
-        sources = obs.obs_enum_sources()
-        if sources:
-            print("Getting non-subscene source names")
-            self.source_names_to_types = {obs.obs_source_get_name(s): obs.obs_source_get_unversioned_id(s) for s in sources}
-            print("Releasing source list")
-            obs.source_list_release(sources)
-        else:
-            print("No sources found.")
-
-        print("Getting all scenes (as sources for some reason)")
-        scene_sources = obs.obs_frontend_get_scenes()
-        if scene_sources:
-            print("Getting scene names")
-            self.scene_names_and_items = {obs.obs_source_get_name(s): [] for s in scene_sources}
-            print("Releasing scene sources list")
-            obs.source_list_release(scene_sources)
-        else:
-            print("No scenes found.")
-
-        print("Evaluating which scenes are subscenes")
-        self.subscene_names = []
-        for scene_name, item_names in self.scene_names_and_items.items():
-            print(scene_name + ":")
-            #print("\t(getting scene items)")
-            scene = obs.obs_get_scene_by_name(scene_name)
-            scene_items = obs.obs_scene_enum_items(scene)
-            if scene_items:
-                for item in scene_items:
-                    # Get scene item as source and name
-                    #print("\t(getting source of scene item)")
-                    # Does not increment the reference, do not independently release
-                    source = obs.obs_sceneitem_get_source(item)
-                    #print("\t(getting source name)")
-                    name = obs.obs_source_get_name(source)
-
-                    # Make record that the item is in this scene
-                    item_names.append(name)
-
-                    # Is this item a subscene source?
-                    #print("\t(identifying source type)")
-                    # If this is not a subscene source, we will have a record of it already
-                    unversioned_id = self.source_names_to_types.get(name) or obs.obs_source_get_unversioned_id(source)
-                    if unversioned_id == "scene":
-                        print(f"\t{unversioned_id}: {name} <--")
-                        self.subscene_names.append(name)
-                    else:
-                        print(f"\t{unversioned_id}: {name}")
-                    #print("\t(releasing that source)\n")
-                    # obs.obs_source_release(source)
-
-                #print("Releasing scene items list")
-                obs.sceneitem_list_release(scene_items)
-            else:
-                print("\t--No items in this scene--")
-            obs.obs_scene_release(scene)
+        """Get listing of OBS scenes and scene item sources, if it is not already current"""
+        self.scene_index.ensure_built()
 
     def set_text_by_source_name(self, source_name: str, new_value: str):
         """Sets the value of a text source"""
+        if not self.source_handles.update_text(source_name, new_value):
+            print(f"ERROR: Could not set text for source '{source_name}': Source not found.")
 
-        source = obs.obs_get_source_by_name(source_name)
-        if not source:
+    def set_texts_by_source_names(self, source_texts: dict[str, str]):
+        """Sets the values of multiple text sources"""
+        for source_name in self.source_handles.update_texts(source_texts):
             print(f"ERROR: Could not set text for source '{source_name}': Source not found.")
-            return
-        setter_data = obs.obs_data_create()
 
-        obs.obs_data_set_string(setter_data, "text", new_value)
-        obs.obs_source_update(source, setter_data)
+    def display_follower_alert(self, follower):
+        """Set the follower alert display for a follower"""
+        self.set_text_by_source_name(
+            self.follower_alert_uname_source,
+            follower.username,
+            )
 
-        obs.obs_data_release(setter_data)
-        obs.obs_source_release(source)
+    def display_follower_alerts(self, followers: list):
+        """Set the follower alert display for several followers at once"""
+        self.set_text_by_source_name(
+            self.follower_alert_uname_source,
+            format_usernames([follower.username for follower in followers]),
+            )
 
-    def set_texts_by_source_names(self, source_texts: dict[str, str]):
-        """Sets the values of multiple text sources"""
-        for source_name, new_value in source_texts.items():
-            self.set_text_by_source_name(source_name, new_value)
+    def display_subscriber_alert(self, subscriber):
+        """Set the subscriber alert display for a subscriber"""
+        self.set_texts_by_source_names({
+            self.subscriber_alert_uname_source: subscriber.username,
+            self.subscriber_alert_amount_source: f"${subscriber.amount_cents / 100:.2f}",
+            })
+
+    def display_subscriber_alerts(self, subscribers: list):
+        """Set the subscriber alert display for several subscribers at once"""
+        self.set_texts_by_source_names({
+            self.subscriber_alert_uname_source: format_usernames([subscriber.username for subscriber in subscribers]),
+            self.subscriber_alert_amount_source: f"${sum(subscriber.amount_cents for subscriber in subscribers) / 100:.2f}",
+            })
+
+    # Rants are never combined, every paid message gets shown on its own
+    def display_rant_alert(self, rant):
+        """Set the rant alert display for a rant"""
+        self.set_texts_by_source_names({
+            self.rant_alert_uname_source: rant.username,
+            self.rant_alert_message_source: rant.text,
+            self.rant_alert_amount_source: f"${rant.amount_cents / 100:.2f}",
+            })
+
+    def display_raid_alert(self, raid):
+        """Set the raid alert display for a raid"""
+        self.set_text_by_source_name(
+            self.raid_alert_uname_source,
+            raid.username,
+            )
 
-    def check_main_rls_api(self):
-        """Check if there are any new alertables in the main RLS API and add them to the inboxes"""
-        print("Checking main RLS API")
-        # We have no API URL or it was invalid
-        if not self.api_url:
+    def display_raid_alerts(self, raids: list):
+        """Set the raid alert display for several raids at once"""
+        self.set_text_by_source_name(
+            self.raid_alert_uname_source,
+            format_usernames([raid.username for raid in raids]),
+            )
+
+    def display_gift_alert(self, gift):
+        """Set the gift alert display for a gift"""
+        self.set_texts_by_source_names({
+            self.gift_alert_uname_source: gift.username,
+            self.gift_alert_count_source: str(gift.count),
+            #self.gift_alert_amount_source: f"${gift.amount_cents / 100:.2f}",
+            })
+
+    def display_gift_alerts(self, gifts: list):
+        """Set the gift alert display for several gifts at once"""
+        self.set_texts_by_source_names({
+            self.gift_alert_uname_source: format_usernames([gift.username for gift in gifts]),
+            self.gift_alert_count_source: str(sum(gift.count for gift in gifts)),
+            })
+
+    def queue_alertable(self, name: str, alertable: AlertRecord):
+        """Put an alertable in the named inbox and wake the alert scheduler, unless we already did before (thread-safe)"""
+        if alertable.alert_id is not None and not self.seen_alerts.add(name, alertable.alert_id):
+            print(f"Already alerted for {name} {alertable}, skipping.")
             return
 
-        for new_follower in self.api.new_followers:
-            self.follower_inbox.put(new_follower)
+        getattr(self, f"{name}_inbox").put(alertable)
+        self.wake_alert_scheduler()
+
+    def get_inbox_stats(self) -> dict[str, dict[str, int]]:
+        """Get how many alertables are waiting in and have been dropped from each inbox"""
+        return {
+            name: {
+                "queued": getattr(self, f"{name}_inbox").qsize(),
+                "dropped": getattr(self, f"{name}_inbox").dropped,
+                }
+            for name in ALERT_NAMES
+            }
 
-        for new_subscriber in self.api.new_subscribers:
-            self.subscriber_inbox.put(new_subscriber)
+    def get_chat_stats(self) -> list[dict]:
+        """Get the connection health of the chat alert receiver of each RLS API poller that has one"""
+        return [
+            {
+                "stream_id": chat_alert_receiver.stream_id,
+                "connected": bool(chat_alert_receiver.chat),
+                "reconnects": chat_alert_receiver.reconnects,
+                "downtime": chat_alert_receiver.downtime,
+                "last_message_id": chat_alert_receiver.last_message_id,
+                "events_received": chat_alert_receiver.events_received,
+                "events_skipped": chat_alert_receiver.events_skipped,
+                }
+            for rls_api_poller in tuple(self.rls_api_pollers.values())
+            if (chat_alert_receiver := rls_api_poller.chat_alert_receiver)
+            ]
+
+    def get_http_pool_stats(self) -> dict:
+        """Get how many API connections are open and how well they are being reused"""
+        return self.http_pool.get_stats()
+
+    def get_metrics_text(self) -> str:
+        """Get the pipeline metrics and inbox depths in the Prometheus text format (thread-safe)"""
+        inbox_stats = self.get_inbox_stats()
+        lines = self.metrics.to_prometheus() + [
+            "# HELP rla_inbox_depth Alerts waiting to be shown.",
+            "# TYPE rla_inbox_depth gauge",
+            *(f'rla_inbox_depth{{alert="{name}"}} {stats["queued"]}' for name, stats in inbox_stats.items()),
+            "# HELP rla_inbox_dropped_total Alerts dropped because their inbox was full.",
+            "# TYPE rla_inbox_dropped_total counter",
+            *(f'rla_inbox_dropped_total{{alert="{name}"}} {stats["dropped"]}' for name, stats in inbox_stats.items()),
+            ]
+        return "\n".join(lines) + "\n"
+
+    def update_metrics_display(self):
+        """Show a summary of the metrics in the metrics text source, if we have one"""
+        if not self.metrics_source:
+            return
 
-        # Livestream change handler
-        # Current stream is no longer live
-        if self.livestream and self.livestream.is_disappeared:
-            print("Livestream shut down.")
-            self.livestream = None
-            self.abandon_chat_alert_receiver()
+        # Chat messages per second since the last update
+        now = time.monotonic()
+        chat_messages = sum(self.metrics.chat_messages.values())
+        last_time, last_chat_messages = self.__last_chat_messages
+        self.__last_chat_messages = (now, chat_messages)
+        chat_rate = (chat_messages - last_chat_messages) / (now - last_time) if now > last_time else 0
+
+        seconds = lambda value: f"{value:g}s" if value != float("inf") else "long"
+        inbox_stats = self.get_inbox_stats()
+        lines = [
+            f"{name.capitalize()}: {stats['queued']} queued, {stats['dropped']} dropped, "
+            f"waited p50 {seconds(latency.quantile(0.5))} p99 {seconds(latency.quantile(0.99))}"
+            for (name, stats), latency in zip(inbox_stats.items(), self.metrics.alert_latency.values())
+            ]
+        lines.append(
+            f"API check p50 {seconds(self.metrics.api_poll_duration.quantile(0.5))}, "
+            f"{self.metrics.api_poll_failures} failed, chat {chat_rate:.1f} messages/s, "
+            f"tick p99 {seconds(self.metrics.tick_duration['busy'].quantile(0.99))} busy, "
+            f"{seconds(self.metrics.tick_duration['idle'].quantile(0.99))} idle"
+            )
 
-        # Other cases
-        """
-        We have a livestream and it is live: Even if there is a new one, stay here.
-        We do not have a livestream and there is no new one. Do nothing.
-        """
+        # Only complain about a missing source once per settings change, this runs every second
+        found = self.source_handles.update_text(self.metrics_source, "\n".join(lines))
+        if not found and self.__metrics_source_found:
+            print(f"ERROR: Could not show metrics in source '{self.metrics_source}': Source not found.")
+        self.__metrics_source_found = found
+
+    def wake_alert_scheduler(self):
+        """Make the alert scheduler run on its next tick (thread-safe, does not touch OBS)"""
+        self.__alert_scheduler_wakeup.set()
+
+    def alert_scheduler_tick(self):
+        """Run the alert scheduler if it was woken or an alert deadline has passed, else sleep"""
+        start = time.perf_counter()
+        if not self.__alert_scheduler_wakeup.is_set() and time.monotonic() < self.__alert_scheduler_deadline:
+            self.metrics.tick_duration["idle"].observe(time.perf_counter() - start)
+            return
 
-        # We have no livestream [anymore] and there is one live
-        if not self.livestream and (new := self.api.latest_livestream):
-            self.livestream = new
-            print("New livestream:", self.livestream.title)
-            self.chat_alert_receiver = ChatAlertReceiver(
-                self.livestream.stream_id,
-                self.rant_inbox,
-                self.raid_inbox,
-                self.gift_inbox,
-                )
-            self.chat_alert_receiver.start()
+        self.__alert_scheduler_wakeup.clear()
+        self.run_alert_scheduler()
+        self.metrics.tick_duration["busy"].observe(time.perf_counter() - start)
+
+    def run_alert_scheduler(self):
+        """Finish alerts that are due, start the next queued alert, and set the next deadline"""
+        now = time.monotonic()
+
+        # Finish up alerts whose display time ran out
+        for name, (_, hide_time) in tuple(self.__shown_alerts.items()):
+            if now >= hide_time:
+                self.__finish_alert(name)
+
+        # Start the most important alert straight away in each lane that is free
+        # Alerts in the same lane must not happen at the same time
+        retry = False
+        busy_lanes = {getattr(self, f"{name}_alert_lane") for name in self.__shown_alerts}
+        for lane, names in self.get_alert_lanes().items():
+            if lane in busy_lanes:
+                continue
 
-        # There is a livestream, so it may have new rants
-        # Handle this in the chat alert receiver instead
-        # for new_rant in self.livestream.chat.new_rants:
-        #     self.rant_inbox.put(new_rant)
+            for name in self.__get_alert_candidates(names):
+                started = self.__start_next_alert(name)
+                if started:
+                    break
+                if started is None:
+                    retry = True
+
+        # Sleep until the next alert is due to be hidden, or indefinitely if there is nothing to do
+        deadlines = [hide_time for _, hide_time in self.__shown_alerts.values()]
+        if retry:
+            deadlines.append(now + ALERT_RETRY_DELAY)
+        self.__alert_scheduler_deadline = min(deadlines, default=float("inf"))
+
+    def get_alert_priority(self, name: str, alertable) -> float:
+        """Get how important an alertable is, from its type's priority and value weight"""
+        inbox = getattr(self, f"{name}_inbox")
+        return getattr(self, f"{name}_alert_priority") + getattr(self, f"{name}_alert_value_weight", 0) * inbox.value_of(alertable)
+
+    def get_alert_lanes(self) -> dict[int, list[str]]:
+        """Get the alert names in each lane"""
+        lanes = {}
+        for name in ALERT_NAMES:
+            lanes.setdefault(getattr(self, f"{name}_alert_lane"), []).append(name)
+        return lanes
+
+    def __get_alert_candidates(self, names: list[str]) -> list[str]:
+        """Get the names of the alert types with something queued, most important first
+
+        Where value adds priority, each inbox puts its most valuable alertable
+        in front, so the front of each inbox is the best it has, and comparing
+        the fronts finds the most important alertable overall. Equal priorities
+        go by order of arrival."""
+
+        candidates = []
+        for name in names:
+            inbox = getattr(self, f"{name}_inbox")
+
+            # We are set to not do these alerts, discard them
+            if not getattr(self, f"{name}_alert_use"):
+                while not inbox.empty():
+                    print(f"New {name}: {inbox.get_nowait()}")
+                    print(f"{name.capitalize()} alerts are disabled.")
+                continue
 
-    def next_follower_alert(self):
-        """Do the next follower alert, finishing up the last one"""
-        self.__next_generic_alert(
-            "follower",
-            self.follower_alert_scene_source,
-            self.follower_inbox,
-            self.follower_alert_use,
-            lambda follower:
-                self.set_text_by_source_name(
-                    self.follower_alert_uname_source,
-                    follower.username,
-                    ),
-                )
+            if not (next_up := inbox.peek()):
+                continue
 
-    def next_subscriber_alert(self):
-        """Do the next subscriber alert, finishing up the last one"""
-        self.__next_generic_alert(
-            "subscriber",
-            self.subscriber_alert_scene_source,
-            self.subscriber_inbox,
-            self.subscriber_alert_use,
-            lambda subscriber:
-                self.set_texts_by_source_names({
-                    self.subscriber_alert_uname_source: subscriber.username,
-                    self.subscriber_alert_amount_source: f"${subscriber.amount_cents / 100:.2f}",
-                    })
-                )
+            arrival, alertable = next_up
+            candidates.append((-self.get_alert_priority(name, alertable), arrival, name))
 
-    def next_rant_alert(self):
-        """Do the next rant alert, finishing up the last one"""
-        self.__next_generic_alert(
-            "rant",
-            self.rant_alert_scene_source,
-            self.rant_inbox,
-            self.rant_alert_use,
-            lambda rant:
-                self.set_texts_by_source_names({
-                    self.rant_alert_uname_source: rant.user.username,
-                    self.rant_alert_message_source: rant.text,
-                    self.rant_alert_amount_source: f"${rant.rant_price_cents / 100:.2f}",
-                    })
-                )
+        return [name for *_, name in sorted(candidates)]
 
-    def next_raid_alert(self):
-        """Do the next raid alert, finishing up the last one"""
-        self.__next_generic_alert(
-            "raid",
-            self.raid_alert_scene_source,
-            self.raid_inbox,
-            self.raid_alert_use,
-            lambda raid:
-                self.set_text_by_source_name(
-                    self.raid_alert_uname_source,
-                    raid.user.username,
-                    ),
-                )
+    def __find_alert_sceneitem(self, alert_scene_source: str):
+        """Find the scene item of an alert scene in the current scene (adds a reference to it)"""
+        subscene_sceneitem = self.scene_resolver.find_sceneitem(alert_scene_source)
+        if not subscene_sceneitem:
+            print(f"Current scene '{self.scene_resolver.current_scene_name}' does not contain scene '{alert_scene_source}'")
+            return None
 
-    def next_gift_alert(self):
-        """Do the next gift alert, finishing up the last one"""
-        self.__next_generic_alert(
-            "gift",
-            self.gift_alert_scene_source,
-            self.gift_inbox,
-            self.gift_alert_use,
-            lambda gift:
-                self.set_texts_by_source_names({
-                    self.gift_alert_uname_source: gift.user.username,
-                    self.gift_alert_count_source: str(gift.gift_purchase_notification.total_gifts),
-                    #self.gift_alert_amount_source: f"${gift.amount_cents / 100:.2f}",
-                    }),
-                )
+        # Keep the scene item even if the current scene changes while the alert shows
+        obs.obs_sceneitem_addref(subscene_sceneitem)
+        return subscene_sceneitem
+
+    def __start_next_alert(self, name: str):
+        """Start the next named alert if one is queued
 
-    def __next_generic_alert(self, name: str, alert_scene_source: str, inbox: Queue, set_to_use: bool, config_alert_display: callable):
-        """Do the next generic alert, finishing up the last one"""
-        print(f"Doing {name} alert tick")
+        Returns:
+            Started (bool | None): True if an alert is now showing, False if
+                there was nothing to show, None if it could not be shown yet."""
 
-        current_scenesource = obs.obs_frontend_get_current_scene()  # returns obs_source_t
+        inbox = getattr(self, f"{name}_inbox")
+        if inbox.empty():
+            return False
 
-        # These do not increase the refcounter, release the above instead
-        current_scene = obs.obs_scene_from_source(current_scenesource)
-        subscene_sceneitem = obs.obs_scene_find_source(current_scene, alert_scene_source)
+        subscene_sceneitem = self.__find_alert_sceneitem(getattr(self, f"{name}_alert_scene_source"))
+        if not subscene_sceneitem:
+            return None
 
         try:
-            if not subscene_sceneitem:
-                print(f"Current scene '{obs.obs_source_get_name(current_scenesource)}' does not contain scene '{alert_scene_source}'")
-                return
+            arrival, alertable = inbox.take_nowait()
+        except Empty:
+            obs.obs_sceneitem_release(subscene_sceneitem)
+            return False
+        print(f"New {name}: {alertable}")
 
-            # Finish up the last gift alert
-            if obs.obs_sceneitem_visible(subscene_sceneitem):
-                obs.obs_sceneitem_set_visible(subscene_sceneitem, False)
-                self.alerts_mutex.release()
-                print(f"Finished {name} alert.")
+        # Set the alert display based on the alertable
+        entries = self.__coalesce(name, (arrival, alertable), inbox)
+        if len(entries) > 1:
+            print(f"Combining {len(entries)} {name} alerts into one.")
+            getattr(self, f"display_{name}_alerts")([alertable for _, alertable in entries])
+        else:
+            getattr(self, f"display_{name}_alert")(alertable)
 
-            # Check for a new gift
-            if inbox.empty():
-                return
+        # Show the alert
+        obs.obs_sceneitem_set_visible(subscene_sceneitem, True)
+        self.__shown_alerts[name] = (subscene_sceneitem, time.monotonic() + getattr(self, f"{name}_alert_time"))
 
-            # We have a gift
-            # Alerts must not happen at the same time
-            lock = self.alerts_mutex.acquire(blocking=False)
-            if not lock:
-                print("Another alert is in progress. Wait.")
-                return
+        # How long everything shown had to wait
+        shown = time.monotonic_ns()
+        for arrival, _ in entries:
+            self.metrics.alert_latency[name].observe((shown - arrival) / 1e9)
+        return True
 
-            alertable = inbox.get()
-            print(f"New {name}: {alertable}")
+    def __coalesce(self, name: str, entry: tuple, inbox: AlertInbox) -> list[tuple]:
+        """If the inbox is backed up, take everything waiting in it to show along with an entry
 
-            # We are set to not do gift alerts
-            if not set_to_use:
-                print(f"{name.capitalize()} alerts are disabled.")
-                self.alerts_mutex.release()
-                return
+        Args:
+            name (str): The alert name.
+            entry (tuple): The arrival time and alertable already taken from the inbox.
+            inbox (AlertInbox): The inbox it came from.
 
-            # Set the alert display based on the alertable
-            config_alert_display(alertable)
+        Returns:
+            Entries (list[tuple]): The arrival times and alertables to show at once."""
 
-            # Show the alert
-            obs.obs_sceneitem_set_visible(subscene_sceneitem, True)
+        entries = [entry]
 
-        finally:
-            obs.obs_source_release(current_scenesource)
+        # Not backed up, or this alert type can't be combined
+        if not self.coalesce_threshold or inbox.qsize() < self.coalesce_threshold or not hasattr(self, f"display_{name}_alerts"):
+            return entries
+
+        while True:
+            try:
+                entries.append(inbox.take_nowait())
+            except Empty:
+                return entries
+
+    def __finish_alert(self, name: str):
+        """Hide a shown alert and free the display slot"""
+        subscene_sceneitem, _ = self.__shown_alerts.pop(name)
+        obs.obs_sceneitem_set_visible(subscene_sceneitem, False)
+        obs.obs_sceneitem_release(subscene_sceneitem)
+        print(f"Finished {name} alert.")
 
     def update_follower_source_lists(self, props=None, prop=None, settings=None, selected_scene: str = None):
         """Filter available sources for follower alert displays"""
@@ -817,7 +4055,7 @@ class OBSRumLiveAlerts():
 
         selected_scene = selected_scene or obs.obs_data_get_string(settings, f"{name}_alert_scene_source")
 
-        if selected_scene not in self.scene_names_and_items:
+        if not self.scene_index.has_scene(selected_scene):
             print(f"ERROR: Have no record of selected {name} scene '{selected_scene}'")
             return False
 
@@ -844,34 +4082,50 @@ class OBSRumLiveAlerts():
     # TODO: Use lambda for these?
     def test_follower_alert(self, props, prop):
         """Test the follower alert button"""
-        self.follower_inbox.put(TestFollower)
+        self.queue_alertable("follower", TestFollower)
         print("Test follower queued.")
         return False
 
     def test_subscriber_alert(self, props, prop):
         """Test the subscriber alert button"""
-        self.subscriber_inbox.put(TestSubscriber)
+        self.queue_alertable("subscriber", TestSubscriber)
         print("Test subscriber queued.")
         return False
 
     def test_rant_alert(self, props, prop):
         """Test the rant alert button"""
-        self.rant_inbox.put(TestRant)
+        self.queue_alertable("rant", TestRant)
         print("Test rant queued.")
         return False
 
     def test_raid_alert(self, props, prop):
         """Test the raid alert button"""
-        self.raid_inbox.put(TestRaid)
+        self.queue_alertable("raid", TestRaid)
         print("Test raid queued.")
         return False
 
     def test_gift_alert(self, props, prop):
         """Test the gift alert button"""
-        self.gift_inbox.put(TestGift)
+        self.queue_alertable("gift", TestGift)
         print("Test gift queued.")
         return False
 
+    def capture_profile(self, props, prop):
+        """Capture profile button, starts a capture or ends the running one early"""
+        # The sampler thread writes the profile, so that the OBS thread does not wait on it
+        if self.profiler.capturing:
+            print("Ending the profile capture early.")
+            self.profiler.stop(wait=False)
+            return False
+
+        self.profiler.start(self.profile_duration, self.get_profiled_threads)
+
+        # Set the timers again, so that they get timed
+        if self.__obs_timers_set:
+            self.remove_obs_timers()
+            self.set_obs_timers()
+        return False
+
 
 rla = OBSRumLiveAlerts()
 print("RLA initialized.")
@@ -912,6 +4166,11 @@ def test_gift_alert(props, prop):
     return rla.test_gift_alert(props, prop)
 
 
+def capture_profile(props, prop):
+    """Capture profile button (global wrapper for RLA instance)"""
+    return rla.capture_profile(props, prop)
+
+
 def script_description():
     return SCRIPT_DESCRIPTION
 
@@ -922,6 +4181,7 @@ if COCORUM_IMPORTED:
     script_properties = rla.script_properties
     script_defaults = rla.script_defaults
     script_update = rla.script_update
+    script_load = rla.script_load
     script_unload = rla.script_unload
 
 # Cocorum failed to import, fall back